@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection
+from account.models import Account
+from account.services import debit_balance
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import logging
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent balance debits on a single account'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=50,
+            help='Number of concurrent users hammering the account (default: 50)'
+        )
+        parser.add_argument(
+            '--debits',
+            type=int,
+            default=20,
+            help='Number of debits performed by each user (default: 20)'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['legacy', 'atomic', 'both'],
+            default='both',
+            help='Debit implementation to benchmark (default: both)'
+        )
+
+    def handle(self, *args, **options):
+        # Per-debit log lines would dominate the measurement
+        logging.getLogger('account').setLevel(logging.WARNING)
+
+        user, created = User.objects.get_or_create(
+            username='bench_debit',
+            defaults={'email': 'bench_debit@example.com'}
+        )
+        modes = ['legacy', 'atomic'] if options['mode'] == 'both' else [options['mode']]
+
+        for mode in modes:
+            self.run_benchmark(user, mode, options['users'], options['debits'])
+
+    def run_benchmark(self, user, mode, users_count, debits_count):
+        amount = Decimal('1.00')
+        total = users_count * debits_count
+        Account.objects.update_or_create(user=user, defaults={'balance': total})
+
+        debit = self.legacy_debit if mode == 'legacy' else debit_balance
+
+        def worker(_):
+            succeeded = 0
+            try:
+                for _ in range(debits_count):
+                    if debit(user, amount):
+                        succeeded += 1
+            finally:
+                connection.close()
+            return succeeded
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users_count) as executor:
+            succeeded = sum(executor.map(worker, range(users_count)))
+        elapsed = time.perf_counter() - start
+
+        balance = Account.objects.get(user=user).balance
+        lost_updates = int(balance) - (total - succeeded)
+        self.stdout.write(
+            f'{mode}: {succeeded}/{total} debits in {elapsed:.2f}s '
+            f'({succeeded / elapsed:.0f} debits/sec), final balance {balance}, '
+            f'lost updates {lost_updates}'
+        )
+        if lost_updates:
+            self.stdout.write(self.style.WARNING(f'{mode}: balance is inconsistent'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{mode}: balance is consistent'))
+
+    @staticmethod
+    def legacy_debit(user, amount):
+        """Read-modify-write debit, as previously done in the views."""
+        account = Account.objects.get(user=user)
+        if account.balance < amount:
+            return False
+        account.balance -= amount
+        account.save()
+        return True
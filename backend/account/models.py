@@ -16,9 +16,8 @@ class Account(models.Model):
         return f"{self.user.username} - Balance: {self.balance}"
 
     def save(self, *args, **kwargs):
-        logger.info(f"Saving account for user {self.user.id}, balance: {self.balance}")
         super().save(*args, **kwargs)
-        logger.info(f"Account for user {self.user.id} saved successfully")
+        logger.info(f"Saved account for user {self.user_id}, balance: {self.balance}")
 
 
 class Transaction(models.Model):
@@ -39,10 +38,16 @@ class Transaction(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Transaction history of a user, newest first, optionally by status
+            models.Index(fields=['user', '-created_at', '-id'], name='transaction_user_created_idx'),
+            models.Index(fields=['user', 'status', '-created_at', '-id'], name='transaction_user_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.transaction_id} - {self.status}"
 
     def save(self, *args, **kwargs):
-        logger.info(f"Saving transaction {self.transaction_id} with status {self.status}")
         super().save(*args, **kwargs)
-        logger.info(f"Transaction {self.transaction_id} saved successfully")
\ No newline at end of file
+        logger.info(f"Saved transaction {self.transaction_id} with status {self.status}")
\ No newline at end of file
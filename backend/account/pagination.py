@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+import base64
+import json
+
+
+class KeysetPagination:
+    """
+    Cursor pagination on (<time field>, id), newest first.
+
+    Each page is fetched with WHERE (time, id) < (cursor time, cursor id)
+    ORDER BY time DESC, id DESC LIMIT page_size + 1, so reaching a deep page
+    costs the same index range scan as the first one, and rows inserted
+    while paging do not shift or repeat items.
+
+    The response body stays a plain list. The cursor of the next page is
+    returned in the X-Next-Cursor header and as a Link: <url>; rel="next"
+    header, and is omitted on the last page.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, time_field):
+        self.time_field = time_field
+        self.next_cursor = None
+        self.request = None
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            return settings.ACCOUNT_PAGE_SIZE
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: 'A positive integer is required'})
+        if page_size < 1:
+            raise ValidationError({self.page_size_query_param: 'A positive integer is required'})
+        return min(page_size, settings.ACCOUNT_MAX_PAGE_SIZE)
+
+    def paginate_queryset(self, queryset, request):
+        """
+        Args:
+            queryset (QuerySet): The rows to paginate, unordered
+            request (Request): The request carrying the cursor and page size
+            
+        Returns:
+            list: The rows of the requested page
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            position, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.time_field}__lt': position}) |
+                Q(**{self.time_field: position, 'id__lt': pk})
+            )
+        
+        rows = list(queryset.order_by(f'-{self.time_field}', '-id')[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, self.time_field), last.id)
+        return rows
+
+    def get_paginated_response(self, data):
+        headers = {}
+        if self.next_cursor:
+            next_url = replace_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor
+            )
+            headers['X-Next-Cursor'] = self.next_cursor
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        return Response(data, headers=headers)
+
+    def encode_cursor(self, position, pk):
+        payload = json.dumps({'t': position.isoformat(), 'id': pk}).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded))
+            position = parse_datetime(payload['t'])
+            pk = int(payload['id'])
+        except (ValueError, KeyError, TypeError):
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor'})
+        if position is None:
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor'})
+        return position, pk
@@ -0,0 +1,55 @@
+from django.db.models import F
+from django.utils import timezone
+from .models import Account
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def debit_balance(user, amount):
+    """
+    Atomically debit an amount from the user's account balance.
+
+    The check and the subtraction happen in a single conditional
+    UPDATE ... SET balance = balance - amount WHERE balance >= amount,
+    so concurrent debits on the same account can never overdraw it.
+
+    Args:
+        user (User): The owner of the account
+        amount (Decimal): The amount to debit
+
+    Returns:
+        bool: True if the account was debited, False if the account does not
+        exist or the balance is insufficient
+    """
+    updated = Account.objects.filter(user=user, balance__gte=amount).update(
+        balance=F('balance') - amount,
+        updated_at=timezone.now()
+    )
+    if updated:
+        logger.info(f"Debited {amount} from user {user.id} account")
+    else:
+        logger.warning(f"Could not debit {amount} from user {user.id} account")
+    return bool(updated)
+
+
+def credit_balance(user, amount):
+    """
+    Atomically credit an amount to the user's account balance.
+    The account is created if it does not exist yet.
+
+    Args:
+        user (User): The owner of the account
+        amount (Decimal): The amount to credit
+    """
+    updated = Account.objects.filter(user=user).update(
+        balance=F('balance') + amount,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        Account.objects.get_or_create(user=user)
+        Account.objects.filter(user=user).update(
+            balance=F('balance') + amount,
+            updated_at=timezone.now()
+        )
+    logger.info(f"Credited {amount} to user {user.id} account")
@@ -5,10 +5,35 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 from .models import Account, Transaction
 from .serializers import AccountSerializer, TransactionSerializer
+from .pagination import KeysetPagination
 from offers.models import UserOffer
 from offers.serializers import UserOfferSerializer
+from config.fastpath import fast_path, dumps
+from functools import cache
 
 
+@cache
+def account_fields():
+    """
+    Fields of AccountSerializer, bound once so the fast path represents
+    values exactly as the serializer does without building it per request.
+    """
+    return AccountSerializer().fields
+
+
+def fast_get_balance(request, user):
+    fields = account_fields()
+    row = Account.objects.filter(user=user).values(*fields).first()
+    if row is None:
+        # The account is created by the DRF view
+        return None
+    return dumps({
+        name: None if row[name] is None else field.to_representation(row[name])
+        for name, field in fields.items()
+    })
+
+
+@fast_path(fast_get_balance)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_balance(request):
@@ -24,27 +49,31 @@ def get_balance(request):
 @permission_classes([IsAuthenticated])
 def get_subscriptions(request):
     """
-    Return the list of currently active offers for the user.
+    Return the list of currently active offers for the user, most recently
+    activated first, one page at a time (see KeysetPagination).
     """
     user_offers = UserOffer.objects.filter(
         user=request.user,
         is_active=True
     ).select_related('offer')
     
-    serializer = UserOfferSerializer(user_offers, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    paginator = KeysetPagination('activation_date')
+    page = paginator.paginate_queryset(user_offers, request)
+    serializer = UserOfferSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def transaction_status(request, transaction_id=None):
     """
-    Check the status of a specific transaction or list all transactions for the user.
+    Check the status of a specific transaction or list the transactions of the
+    user, newest first, one page at a time (see KeysetPagination).
     """
     if transaction_id:
         # Get specific transaction
         transaction = get_object_or_404(
-            Transaction,
+            Transaction.objects.select_related('offer'),
             transaction_id=transaction_id,
             user=request.user
         )
@@ -53,10 +82,12 @@ def transaction_status(request, transaction_id=None):
     else:
         # List all transactions for the user with optional filtering
         status_filter = request.GET.get('status')
-        transactions = Transaction.objects.filter(user=request.user)
+        transactions = Transaction.objects.filter(user=request.user).select_related('offer')
         
         if status_filter:
             transactions = transactions.filter(status=status_filter)
-            
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        
+        paginator = KeysetPagination('created_at')
+        page = paginator.paginate_queryset(transactions, request)
+        serializer = TransactionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
\ No newline at end of file
@@ -0,0 +1,392 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from account.models import Transaction
+from . import tasks
+from .tasks import (
+    begin_activation,
+    complete_activation,
+    fail_activation,
+    build_activation_data,
+    parse_activation_response,
+    validated_activation_result,
+    has_valid_signature,
+    parse_validation_response,
+    parse_bulk_validation_response,
+    acquire_partner_slot,
+    release_partner_slot,
+    should_retry_activation,
+    partner_retry_budget,
+)
+from .retry import backoff_delay
+from config.redis_client import create_async_client
+import aiohttp
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def create_partner_session():
+    """
+    Create the asynchronous HTTP session shared by all the in-flight partner calls
+    of an async worker.
+    """
+    connector = aiohttp.TCPConnector(limit=settings.PARTNER_ASYNC_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=settings.PARTNER_CONNECT_TIMEOUT,
+        sock_read=settings.PARTNER_READ_TIMEOUT
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers={
+            'Content-Type': 'application/json',
+            'User-Agent': 'Offers-API/1.0'
+        }
+    )
+
+
+class BufferedResponse:
+    """
+    Fully read partner response, exposing the attributes the response parsers
+    shared with the synchronous client rely on.
+    """
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+async def partner_request(client, method, url, **kwargs):
+    async with client.request(method, url, **kwargs) as response:
+        return BufferedResponse(response.status, await response.text())
+
+
+async def async_activate_offer_with_partner(client, transaction, batcher=None):
+    """
+    Asynchronous counterpart of activate_offer_with_partner.
+    
+    Args:
+        client (aiohttp.ClientSession): The session used to call the partner system
+        transaction (Transaction): The transaction to activate, with user and offer loaded
+        batcher (ReferenceValidationBatcher): Coalesces validations in 'batch' mode
+        
+    Returns:
+        dict: Response with success status, reference number, and optional error message
+    """
+    try:
+        url = f"{tasks.PARTNER_ACTIVATION_URL}/"
+        logger.info(f"Making async POST request to {url} for transaction {transaction.transaction_id}")
+        response = await partner_request(client, 'POST', url, json=build_activation_data(transaction))
+        
+        result = parse_activation_response(transaction, response)
+        if 'error' in result:
+            return result
+        
+        is_valid = await async_check_partner_reference(client, transaction, result, batcher)
+        return validated_activation_result(transaction, result, is_valid)
+        
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout calling partner system for transaction {transaction.transaction_id}")
+        return {
+            'success': False,
+            'error': 'Timeout calling partner activation system',
+            'partner_unavailable': True
+        }
+    except aiohttp.ClientConnectionError:
+        logger.error(f"Connection error calling partner system for transaction {transaction.transaction_id}")
+        return {
+            'success': False,
+            'error': 'Connection error with partner activation system',
+            'partner_unavailable': True
+        }
+    except aiohttp.ClientError as e:
+        logger.error(f"Request error calling partner system for transaction {transaction.transaction_id}: {str(e)}")
+        return {
+            'success': False,
+            'error': f'Request error: {str(e)}',
+            'partner_unavailable': True
+        }
+    except Exception as e:
+        logger.error(f"Unexpected error calling partner system for transaction {transaction.transaction_id}: {str(e)}", exc_info=True)
+        return {
+            'success': False,
+            'error': f'Unexpected error: {str(e)}'
+        }
+
+
+async def async_check_partner_reference(client, transaction, result, batcher=None):
+    """
+    Asynchronous counterpart of check_partner_reference.
+    In 'batch' mode the reference is validated together with the other
+    references in flight through the batcher.
+    """
+    mode = settings.PARTNER_VALIDATION_MODE
+    if mode == 'signed' and has_valid_signature(transaction, result):
+        logger.info(f"Reference {result['reference']} is signed, skipping validation for transaction {transaction.transaction_id}")
+        return True
+    if mode == 'batch' and batcher is not None:
+        return await batcher.validate(result['reference'])
+    return await async_validate_partner_transaction(client, result['reference'])
+
+
+async def async_validate_partner_transaction(client, reference):
+    """
+    Asynchronous counterpart of validate_partner_transaction.
+    """
+    try:
+        validation_url = f"{tasks.PARTNER_VALIDATION_URL}/{reference}/"
+        logger.info(f"Making async GET request to {validation_url}")
+        response = await partner_request(client, 'GET', validation_url)
+        return parse_validation_response(reference, response)
+    except Exception as e:
+        logger.error(f"Error validating partner transaction {reference}: {str(e)}", exc_info=True)
+        return False
+
+
+async def async_validate_partner_transactions(client, references):
+    """
+    Validate many partner transactions with a single bulk call.
+    
+    Returns:
+        dict: Validation result for each reference
+    """
+    try:
+        response = await partner_request(
+            client, 'POST', f"{tasks.PARTNER_VALIDATION_URL}/bulk/", json={'references': references}
+        )
+        return parse_bulk_validation_response(references, response)
+    except Exception as e:
+        logger.error(f"Error validating {len(references)} partner transactions: {str(e)}", exc_info=True)
+        return {reference: False for reference in references}
+
+
+class ReferenceValidationBatcher:
+    """
+    Coalesce the reference validations requested by concurrent activations
+    into bulk validation calls. A batch is sent when it reaches `max_size`
+    references or `window` seconds after its first reference was queued.
+    """
+
+    def __init__(self, client, max_size=None, window=None):
+        self.client = client
+        self.max_size = max_size or settings.PARTNER_VALIDATION_BATCH_SIZE
+        self.window = settings.PARTNER_VALIDATION_BATCH_WINDOW if window is None else window
+        self.pending = []
+        self.flush_handle = None
+        self.sending = set()
+
+    async def validate(self, reference):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((reference, future))
+        if len(self.pending) >= self.max_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.create_task(self.send(batch))
+            self.sending.add(task)
+            task.add_done_callback(self.sending.discard)
+
+    async def send(self, batch):
+        results = await async_validate_partner_transactions(
+            self.client, [reference for reference, _ in batch]
+        )
+        for reference, future in batch:
+            if not future.done():
+                future.set_result(results.get(reference, False))
+
+
+async def process_activation_async(client, transaction_id, batcher=None):
+    """
+    Process one activation like process_activation, without blocking the event loop
+    on the partner call. Database work runs in Django's sync thread.
+    Transient partner failures are retried after a jittered backoff, within
+    the same retry budget as the Celery task.
+    """
+    try:
+        transaction = await sync_to_async(begin_activation)(transaction_id)
+        if transaction is None:
+            return
+        await asyncio.to_thread(partner_retry_budget.record_attempt)
+        
+        attempt = 1
+        while True:
+            activation_result = await guarded_partner_call(client, transaction, batcher)
+            logger.info(f"Partner system response for transaction {transaction_id}: {activation_result}")
+            if not await asyncio.to_thread(should_retry_activation, activation_result, attempt):
+                break
+            delay = backoff_delay(attempt)
+            logger.warning(f"Retrying transaction {transaction_id} in {delay:.2f}s: {activation_result['error']}")
+            await asyncio.sleep(delay)
+            attempt += 1
+        
+        await sync_to_async(complete_activation)(transaction, activation_result)
+    except Transaction.DoesNotExist:
+        logger.error(f"Transaction {transaction_id} not found")
+        await sync_to_async(fail_activation)(transaction_id, 'Transaction not found')
+    except Exception as e:
+        logger.error(f"Error processing activation {transaction_id}: {str(e)}", exc_info=True)
+        await sync_to_async(fail_activation)(transaction_id, str(e))
+
+
+async def guarded_partner_call(client, transaction, batcher=None):
+    """
+    Call the partner system under the circuit breaker and the concurrency limit.
+    While the circuit is open or the limit is reached, the call waits, which in
+    turn stops the worker from pulling new activations. Like the Celery task,
+    it gives up after PARTNER_MAX_DEFERRALS waits and the activation fails.
+    """
+    deferrals = 0
+    while (slot := await asyncio.to_thread(acquire_partner_slot)) is None:
+        if deferrals >= settings.PARTNER_MAX_DEFERRALS:
+            logger.error(f"Partner system unavailable, giving up on transaction {transaction.transaction_id}")
+            return {
+                'success': False,
+                'error': 'Partner activation system unavailable'
+            }
+        deferrals += 1
+        await asyncio.sleep(settings.PARTNER_DEFER_COUNTDOWN)
+    
+    activation_result = None
+    started = time.monotonic()
+    try:
+        activation_result = await async_activate_offer_with_partner(client, transaction, batcher)
+        return activation_result
+    finally:
+        await asyncio.to_thread(release_partner_slot, slot, activation_result, time.monotonic() - started)
+
+
+class AsyncActivationWorker:
+    """
+    Pull transaction ids from the async activation queue in Redis and keep up
+    to `concurrency` activations in flight on a single event loop.
+    
+    Each id is moved with BLMOVE to the processing list of the worker and
+    removed once its activation completed, so the ids of a worker that dies
+    are not lost: workers refresh a heartbeat key, and the processing lists of
+    the workers whose heartbeat expired are moved back to the queue on startup
+    and every heartbeat. The heartbeat runs on its own task, so activations
+    holding every slot never let it lapse.
+    """
+
+    def __init__(self, concurrency=None, queue=None, worker_id=None):
+        self.concurrency = concurrency or settings.PARTNER_ASYNC_CONCURRENCY
+        self.queue = queue or settings.ACTIVATION_ASYNC_QUEUE
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.processing = self.processing_key(self.worker_id)
+        self.stopping = False
+        self.in_flight = set()
+        self.redis_client = None
+
+    def processing_key(self, worker_id):
+        return f"{self.queue}:processing:{worker_id}"
+
+    def heartbeat_key(self, worker_id):
+        return f"{self.queue}:heartbeat:{worker_id}"
+
+    @property
+    def workers_key(self):
+        return f"{self.queue}:workers"
+
+    def stop(self):
+        logger.info("Async activation worker stopping, waiting for in-flight activations")
+        self.stopping = True
+
+    async def run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        self.redis_client = create_async_client()
+        logger.info(f"Async activation worker {self.worker_id} listening on {self.queue} with concurrency {self.concurrency}")
+        keep_alive = None
+
+        try:
+            # A restarted worker picks up the ids it held before dying
+            await self.recover(self.worker_id)
+            await self.heartbeat()
+            # Beats on its own task, so busy slots never let the heartbeat lapse
+            keep_alive = asyncio.create_task(self.keep_alive())
+            async with create_partner_session() as client:
+                batcher = ReferenceValidationBatcher(client)
+                while not self.stopping:
+                    await slots.acquire()
+                    transaction_id = await self.redis_client.blmove(
+                        self.queue, self.processing, timeout=1, src='LEFT', dest='RIGHT'
+                    )
+                    if transaction_id is None:
+                        slots.release()
+                        continue
+
+                    task = asyncio.create_task(self.handle(client, batcher, transaction_id, slots))
+                    self.in_flight.add(task)
+                    task.add_done_callback(self.in_flight.discard)
+
+                if self.in_flight:
+                    await asyncio.gather(*self.in_flight)
+            
+            keep_alive.cancel()
+            await self.redis_client.delete(self.heartbeat_key(self.worker_id))
+            await self.redis_client.srem(self.workers_key, self.worker_id)
+        finally:
+            if keep_alive is not None:
+                keep_alive.cancel()
+            await self.redis_client.aclose()
+
+    async def handle(self, client, batcher, transaction_id, slots):
+        try:
+            await process_activation_async(client, transaction_id, batcher)
+            await self.redis_client.lrem(self.processing, 1, transaction_id)
+        finally:
+            slots.release()
+
+    async def keep_alive(self):
+        while True:
+            await asyncio.sleep(settings.ACTIVATION_ASYNC_HEARTBEAT_INTERVAL)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"Async worker {self.worker_id} heartbeat failed: {str(e)}", exc_info=True)
+
+    async def heartbeat(self):
+        """
+        Mark the worker alive for ACTIVATION_ASYNC_HEARTBEAT_TTL seconds and
+        recover the activations held by the workers that are not.
+        """
+        async with self.redis_client.pipeline() as pipe:
+            pipe.set(self.heartbeat_key(self.worker_id), 1, ex=settings.ACTIVATION_ASYNC_HEARTBEAT_TTL)
+            pipe.sadd(self.workers_key, self.worker_id)
+            await pipe.execute()
+        
+        for worker_id in await self.redis_client.smembers(self.workers_key):
+            if worker_id != self.worker_id and not await self.redis_client.exists(self.heartbeat_key(worker_id)):
+                await self.recover(worker_id)
+                await self.redis_client.srem(self.workers_key, worker_id)
+
+    async def recover(self, worker_id):
+        """
+        Move the ids left in the processing list of a worker back to the head
+        of the queue, in their original order.
+        
+        Returns:
+            int: Number of activations recovered
+        """
+        recovered = 0
+        while await self.redis_client.lmove(self.processing_key(worker_id), self.queue, 'RIGHT', 'LEFT'):
+            recovered += 1
+        if recovered:
+            logger.warning(f"Recovered {recovered} activations held by async worker {worker_id}")
+        return recovered
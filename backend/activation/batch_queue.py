@@ -0,0 +1,120 @@
+import time
+import uuid
+
+
+class BatchQueue:
+    """
+    Redis list consumed in batches that stay claimed until acknowledged.
+
+    claim() moves up to `size` items with LMOVE from the queue to the
+    processing list of a new batch, tracked in a sorted set scored by its
+    deadline. ack() deletes the batch once it was handled; batches whose
+    deadline passed, left by a crashed worker, are put back at the head of the
+    queue by recover(). Delivery is at least once.
+
+    Keys: `queue_key`, `<prefix>:batches` and `<prefix>:processing:<batch id>`.
+    """
+
+    # KEYS: processing list of the batch, queue, batches
+    # ARGV: batch id, now
+    RECOVER_SCRIPT = """
+    local deadline = redis.call('ZSCORE', KEYS[3], ARGV[1])
+    if not deadline or tonumber(deadline) > tonumber(ARGV[2]) then
+        return 0
+    end
+    local count = 0
+    while redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT') do
+        count = count + 1
+    end
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    return count
+    """
+
+    def __init__(self, client, queue_key, prefix):
+        """
+        Args:
+            client (Redis): Client returning decoded strings
+            queue_key (str): The list items are pushed to
+            prefix (str): Prefix of the batch keys
+        """
+        self.client = client
+        self.queue_key = queue_key
+        self.prefix = prefix
+        self.batches_key = f"{prefix}:batches"
+        self.recover_script = client.register_script(self.RECOVER_SCRIPT)
+
+    def processing_key(self, batch_id):
+        return f"{self.prefix}:processing:{batch_id}"
+
+    def claim(self, size, timeout):
+        """
+        Claim up to `size` items in one MULTI/EXEC.
+
+        Args:
+            size (int): Maximum number of items in the batch
+            timeout (float): Seconds before the batch may be recovered
+
+        Returns:
+            str: Id of the batch, None when the queue is empty
+        """
+        batch_id = uuid.uuid4().hex
+        pipe = self.client.pipeline()
+        for _ in range(size):
+            pipe.lmove(self.queue_key, self.processing_key(batch_id), 'LEFT', 'RIGHT')
+        pipe.zadd(self.batches_key, {batch_id: time.time() + timeout})
+        moved = pipe.execute()[:-1]
+        if moved[0] is None:
+            self.client.zrem(self.batches_key, batch_id)
+            return None
+        return batch_id
+
+    def items(self, batch_id):
+        """
+        Returns:
+            list: The items of a batch, empty once it was acknowledged or recovered
+        """
+        return self.client.lrange(self.processing_key(batch_id), 0, -1)
+
+    def hold(self, batch_id, timeout):
+        """
+        Push back the deadline of a batch, handled again in less than `timeout` seconds.
+        """
+        self.client.zadd(self.batches_key, {batch_id: time.time() + timeout})
+
+    def ack(self, batch_id, pipe=None):
+        """
+        Delete a handled batch, in `pipe` when given.
+        """
+        target = pipe if pipe is not None else self.client.pipeline()
+        target.delete(self.processing_key(batch_id))
+        target.zrem(self.batches_key, batch_id)
+        if pipe is None:
+            target.execute()
+
+    def recover(self):
+        """
+        Put the items of the batches whose deadline passed back at the head of
+        the queue, in their original order.
+
+        Returns:
+            int: Number of items recovered
+        """
+        now = time.time()
+        recovered = 0
+        for batch_id in self.client.zrangebyscore(self.batches_key, '-inf', now):
+            recovered += self.recover_script(
+                keys=[self.processing_key(batch_id), self.queue_key, self.batches_key],
+                args=[batch_id, now]
+            )
+        return recovered
+
+    def drop(self):
+        """
+        Delete the queue and every batch.
+        """
+        batch_ids = self.client.zrange(self.batches_key, 0, -1)
+        self.client.delete(
+            self.queue_key,
+            self.batches_key,
+            *[self.processing_key(batch_id) for batch_id in batch_ids]
+        )
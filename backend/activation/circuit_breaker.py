@@ -0,0 +1,275 @@
+from django.conf import settings
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker shared by every worker through Redis.
+
+    Calls are counted in tumbling windows of PARTNER_BREAKER_WINDOW seconds.
+    Once a window holds at least PARTNER_BREAKER_MIN_CALLS calls and the
+    share of failed or slow ones reaches PARTNER_BREAKER_ERROR_RATE, the
+    circuit opens and calls fail fast for PARTNER_BREAKER_COOLDOWN seconds.
+    It then lets a single probe call through (half-open): a healthy probe
+    closes the circuit, an unhealthy one opens it again. Only the outcome of
+    the probe decides; calls already in flight when the circuit opened are
+    ignored.
+    """
+
+    # KEYS: probe. ARGV: token of the caller
+    # Returns 1 and frees the probe if the caller holds it
+    CLAIM_PROBE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+        return 0
+    end
+    redis.call('DEL', KEYS[1])
+    return 1
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.prefix = f"circuit:{name}"
+        self.claim_probe = client.register_script(self.CLAIM_PROBE_SCRIPT)
+
+    def key(self, suffix):
+        return f"{self.prefix}:{suffix}"
+
+    def window_key(self, now=None):
+        window = int((now or time.time()) // settings.PARTNER_BREAKER_WINDOW)
+        return self.key(f"window:{window}")
+
+    def allow_request(self):
+        """
+        Returns:
+            The permission to call, False if the call must not be made now:
+            True while the circuit is closed, or the token of the probe while
+            it is half-open, to pass back to record()
+        """
+        pipe = self.client.pipeline()
+        pipe.exists(self.key('open'))
+        pipe.exists(self.key('half_open'))
+        is_open, half_open = pipe.execute()
+        if is_open:
+            return False
+        if half_open:
+            # Only one probe at a time while half-open
+            token = uuid.uuid4().hex
+            if self.client.set(self.key('probe'), token, nx=True, ex=int(settings.PARTNER_READ_TIMEOUT) + 1):
+                return token
+            return False
+        return True
+
+    def record(self, healthy, permit=True):
+        """
+        Record the outcome of a call.
+
+        Args:
+            healthy (bool): False if the call failed because of the partner
+            system or was slower than PARTNER_SLOW_CALL_THRESHOLD, None if
+            the call was not made after all
+            permit: The value allow_request() returned for the call
+        """
+        pipe = self.client.pipeline()
+        pipe.exists(self.key('open'))
+        pipe.exists(self.key('half_open'))
+        is_open, half_open = pipe.execute()
+
+        if half_open and not is_open and isinstance(permit, str):
+            if not self.claim_probe(keys=[self.key('probe')], args=[permit]):
+                return
+            if healthy is None:
+                # The probe slot is free for the next call
+                return
+            if healthy:
+                self.close()
+            else:
+                self.trip('probe call failed')
+            return
+        if half_open or is_open or healthy is None:
+            # Calls started before the circuit opened do not count
+            return
+
+        window_key = self.window_key()
+        pipe = self.client.pipeline()
+        pipe.hincrby(window_key, 'calls', 1)
+        pipe.hincrby(window_key, 'failures', 0 if healthy else 1)
+        pipe.expire(window_key, settings.PARTNER_BREAKER_WINDOW * 2)
+        calls, failures, _ = pipe.execute()
+
+        if calls >= settings.PARTNER_BREAKER_MIN_CALLS and failures / calls >= settings.PARTNER_BREAKER_ERROR_RATE:
+            self.trip(f"{failures}/{calls} failed calls")
+
+    def trip(self, reason):
+        logger.warning(f"Opening circuit {self.prefix} for {settings.PARTNER_BREAKER_COOLDOWN}s: {reason}")
+        pipe = self.client.pipeline()
+        pipe.set(self.key('open'), time.time() + settings.PARTNER_BREAKER_COOLDOWN, ex=settings.PARTNER_BREAKER_COOLDOWN)
+        pipe.set(self.key('half_open'), 1)
+        pipe.delete(self.key('probe'), self.window_key())
+        pipe.incr(self.key('trips'))
+        pipe.execute()
+
+    def close(self):
+        logger.info(f"Closing circuit {self.prefix}")
+        self.client.delete(self.key('open'), self.key('half_open'), self.key('probe'))
+
+    def get_state(self):
+        pipe = self.client.pipeline()
+        pipe.get(self.key('open'))
+        pipe.exists(self.key('half_open'))
+        pipe.hgetall(self.window_key())
+        pipe.get(self.key('trips'))
+        open_until, half_open, window, trips = pipe.execute()
+
+        if open_until:
+            state = 'open'
+        elif half_open:
+            state = 'half_open'
+        else:
+            state = 'closed'
+        return {
+            'state': state,
+            'open_until': float(open_until) if open_until else None,
+            'window_calls': int(window.get('calls', 0)),
+            'window_failures': int(window.get('failures', 0)),
+            'trips': int(trips or 0),
+        }
+
+
+class ConcurrencyLeases:
+    """
+    Cluster-wide bound on concurrent calls, as leases in a Redis sorted set
+    scored by their deadline. Expired leases, left by crashed workers, are
+    pruned on every acquire, and releasing a lease twice or after it expired
+    is harmless, so the count can neither leak nor go negative.
+    """
+
+    # KEYS: leases, limit (optional)
+    # ARGV: now, lease deadline, lease id, limit used without a limit key, key TTL in ms
+    ACQUIRE_SCRIPT = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    local limit = tonumber(ARGV[4])
+    if KEYS[2] then
+        limit = math.floor(tonumber(redis.call('GET', KEYS[2]) or ARGV[4]))
+    end
+    if redis.call('ZCARD', KEYS[1]) >= limit then
+        return 0
+    end
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], ARGV[5])
+    return 1
+    """
+
+    def __init__(self, client, key, ttl):
+        """
+        Args:
+            client (Redis): Client returning decoded strings
+            key (str): The sorted set of leases
+            ttl (float): Seconds after which a lease that was not released expires
+        """
+        self.client = client
+        self.key = key
+        self.ttl = ttl
+        self.acquire_script = client.register_script(self.ACQUIRE_SCRIPT)
+
+    def acquire(self, limit, limit_key=None):
+        """
+        Args:
+            limit (int): Maximum number of leases, or the default of limit_key
+            limit_key (str): Key holding the current limit, read in the same script
+
+        Returns:
+            str: The lease id to pass to release(), None if the limit is reached
+        """
+        lease = uuid.uuid4().hex
+        now = time.time()
+        keys = [self.key, limit_key] if limit_key else [self.key]
+        granted = self.acquire_script(
+            keys=keys,
+            args=[now, now + self.ttl, lease, limit, int(self.ttl * 1000)]
+        )
+        return lease if granted else None
+
+    def release(self, lease):
+        self.client.zrem(self.key, lease)
+
+    def count(self):
+        """
+        Returns:
+            int: Number of leases that have not expired
+        """
+        return self.client.zcount(self.key, time.time(), '+inf')
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Cluster-wide AIMD limit on the number of calls in flight, stored in Redis.
+
+    Every healthy call raises the limit by 1/limit, i.e. by about one slot per
+    limit's worth of calls (additive increase); every unhealthy call
+    multiplies it by PARTNER_LIMITER_DECREASE (multiplicative decrease).
+    Slots are ConcurrencyLeases, expiring after twice PARTNER_READ_TIMEOUT.
+    """
+
+    ADJUST_SCRIPT = """
+    local limit = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+    if ARGV[2] == '1' then
+        limit = math.min(tonumber(ARGV[4]), limit + 1 / limit)
+    else
+        limit = math.max(tonumber(ARGV[3]), limit * tonumber(ARGV[5]))
+    end
+    redis.call('SET', KEYS[1], limit)
+    return tostring(limit)
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.limit_key = f"limiter:{name}:limit"
+        self.in_flight_key = f"limiter:{name}:in_flight"
+        # A guarded call is the activation POST then the validation GET, each up
+        # to the connect and read timeouts; leases must not expire mid-call
+        call_timeout = 2 * (settings.PARTNER_CONNECT_TIMEOUT + settings.PARTNER_READ_TIMEOUT)
+        self.leases = ConcurrencyLeases(client, self.in_flight_key, call_timeout + 10)
+        self.adjust = client.register_script(self.ADJUST_SCRIPT)
+
+    def get_limit(self):
+        limit = self.client.get(self.limit_key)
+        return float(limit) if limit else float(settings.PARTNER_LIMITER_INITIAL)
+
+    def acquire(self):
+        """
+        Reserve a slot for a call.
+
+        Returns:
+            str: The lease of the slot, None if the limit is reached;
+            release() must be called with it
+        """
+        return self.leases.acquire(settings.PARTNER_LIMITER_INITIAL, self.limit_key)
+
+    def release(self, lease, healthy=None):
+        """
+        Free a slot and adapt the limit to the outcome of the call.
+        The limit is left untouched when healthy is None (no call was made).
+        """
+        self.leases.release(lease)
+        if healthy is None:
+            return
+        self.adjust(
+            keys=[self.limit_key],
+            args=[
+                settings.PARTNER_LIMITER_INITIAL,
+                '1' if healthy else '0',
+                settings.PARTNER_LIMITER_MIN,
+                settings.PARTNER_LIMITER_MAX,
+                settings.PARTNER_LIMITER_DECREASE,
+            ]
+        )
+
+    def get_state(self):
+        return {
+            'limit': round(self.get_limit(), 2),
+            'in_flight': self.leases.count(),
+        }
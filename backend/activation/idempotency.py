@@ -0,0 +1,171 @@
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+from config.redis_client import redis_client
+from datetime import timedelta
+from functools import wraps
+import hashlib
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# KEYS: lock
+# ARGV: token of the holder
+# Deletes the lock only if it is still held by the caller, not by a request
+# that took it after it expired
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+release_lock_script = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+
+
+def idempotent(view):
+    """
+    Make a POST view safe to retry with an Idempotency-Key header.
+    
+    The first successful (2xx) response for a key is stored in Redis and in
+    the database for IDEMPOTENCY_KEY_TTL seconds. Repeats of the request with
+    the same key get the stored response back from a single Redis GET, without
+    running the view again. While the first request is still running, repeats
+    get a 409. Reusing a key with a different body is rejected with a 422.
+    Requests without the header are processed as usual.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        user = request.user
+        endpoint = request.path
+        request_hash = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        cache_key = f"idempotency:{user.id}:{endpoint}:{key}"
+        
+        stored = get_stored_response(cache_key, user, endpoint, key)
+        if stored is not None:
+            return replay_response(stored, request_hash, key)
+        
+        # Only one request per key may run the view at a time
+        lock_key = f"{cache_key}:lock"
+        lock_token = uuid.uuid4().hex
+        if not redis_client.set(lock_key, lock_token, nx=True, ex=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            logger.warning(f"Request with {IDEMPOTENCY_HEADER} {key} from user {user.id} is already in progress")
+            return Response(
+                {'error': f'A request with this {IDEMPOTENCY_HEADER} is already in progress'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        try:
+            # The first request may have stored its response and released the
+            # lock between the lookup above and this lock
+            stored = get_stored_response(cache_key, user, endpoint, key)
+            if stored is not None:
+                return replay_response(stored, request_hash, key)
+            response = view(request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                store_response(cache_key, user, endpoint, key, request_hash, response)
+            return response
+        finally:
+            release_lock_script(keys=[lock_key], args=[lock_token])
+    
+    return wrapper
+
+
+def get_stored_response(cache_key, user, endpoint, key):
+    """
+    Look up the response stored for a key, in Redis first and then in the database.
+    
+    Returns:
+        dict: The stored request hash, status code and body, or None
+    """
+    cached = redis_client.get(cache_key)
+    if cached:
+        return json.loads(cached)
+    
+    record = IdempotencyKey.objects.filter(
+        user=user,
+        endpoint=endpoint,
+        key=key,
+        created_at__gte=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    ).first()
+    if record is None:
+        return None
+    
+    stored = {
+        'request_hash': record.request_hash,
+        'status_code': record.status_code,
+        'body': record.response_body,
+    }
+    remaining = settings.IDEMPOTENCY_KEY_TTL - (timezone.now() - record.created_at).total_seconds()
+    redis_client.set(cache_key, json.dumps(stored), ex=max(int(remaining), 1))
+    return stored
+
+
+def store_response(cache_key, user, endpoint, key, request_hash, response):
+    """
+    Store a successful response so that retries of the request replay it.
+    """
+    stored = {
+        'request_hash': request_hash,
+        'status_code': response.status_code,
+        'body': json.loads(json.dumps(response.data, default=str)),
+    }
+    # Replaces an expired record left in the table for the same key
+    IdempotencyKey.objects.update_or_create(
+        user=user,
+        endpoint=endpoint,
+        key=key,
+        defaults={
+            'request_hash': request_hash,
+            'status_code': response.status_code,
+            'response_body': stored['body'],
+            'created_at': timezone.now(),
+        }
+    )
+    redis_client.set(cache_key, json.dumps(stored), ex=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def replay_response(stored, request_hash, key):
+    """
+    Build the response to a repeated request.
+    """
+    if stored['request_hash'] != request_hash:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} was already used with a different request body'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    logger.info(f"Replaying stored response for {IDEMPOTENCY_HEADER} {key}")
+    return Response(
+        stored['body'],
+        status=stored['status_code'],
+        headers={'Idempotent-Replayed': 'true'}
+    )
+
+
+def purge_expired_keys():
+    """
+    Delete the database records of keys older than IDEMPOTENCY_KEY_TTL.
+    
+    Returns:
+        int: The number of records deleted
+    """
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    ).delete()
+    return deleted
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from activation.notifications import send_notification_batch
+import logging
+import time
+
+
+class SlowEmailBackend(EmailBackend):
+    """
+    In-memory backend paying a fixed cost per connection, standing in for
+    the SMTP handshake (connect, EHLO, STARTTLS, AUTH).
+    """
+
+    connect_latency = 0.0
+
+    def open(self):
+        time.sleep(self.connect_latency)
+        return True
+
+
+class Command(BaseCommand):
+    help = 'Measure notification throughput in messages/sec, one connection per message against batched delivery'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=500,
+            help='Number of notifications sent per mode (default: 500)'
+        )
+        parser.add_argument(
+            '--connect-latency',
+            type=float,
+            default=0.02,
+            help='Simulated cost of opening a mail connection, in seconds (default: 0.02)'
+        )
+        parser.add_argument(
+            '--sms-ratio',
+            type=float,
+            default=0.0,
+            help='Share of the notifications also sent by SMS (default: 0)'
+        )
+
+    def handle(self, *args, **options):
+        logging.getLogger('activation').setLevel(logging.WARNING)
+        SlowEmailBackend.connect_latency = options['connect_latency']
+        count = options['messages']
+        sms_every = round(1 / options['sms_ratio']) if options['sms_ratio'] else 0
+        notifications = [
+            {
+                'email': f'bench{i}@example.com',
+                'subject': 'Offer Activation Successful',
+                'body': f'Your offer Bench has been successfully activated. Reference: REF-{i}',
+                **({'phone': f'+2613400{i:05d}'} if sms_every and i % sms_every == 0 else {}),
+            }
+            for i in range(count)
+        ]
+        batch_size = settings.NOTIFICATION_BATCH_SIZE
+
+        with override_settings(
+            EMAIL_BACKEND=f'{__name__}.SlowEmailBackend',
+            SMS_BACKEND='activation.sms.LocMemSMSBackend'
+        ):
+            rates = {
+                'inline': self.measure(notifications, 1),
+                'batched': self.measure(notifications, batch_size),
+            }
+
+        self.stdout.write(f"one connection per message   {rates['inline']:>8.0f} messages/sec")
+        self.stdout.write(f"batches of {batch_size:<5}             {rates['batched']:>8.0f} messages/sec")
+        self.stdout.write(self.style.SUCCESS(f"{rates['batched'] / rates['inline']:.1f}x"))
+
+    def measure(self, notifications, batch_size):
+        sent = 0
+        start = time.perf_counter()
+        for i in range(0, len(notifications), batch_size):
+            sent += send_notification_batch(notifications[i:i + batch_size])[0]
+        return sent / (time.perf_counter() - start)
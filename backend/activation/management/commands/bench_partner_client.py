@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from activation import partner_client
+from activation.stub_partner import start_stub_partner
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import requests
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark partner calls with a fresh connection per call against the pooled session'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Number of activate + validate round trips (default: 2000)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Number of concurrent callers (default: 8)'
+        )
+        parser.add_argument(
+            '--url',
+            help='Partner base URL, a local stub partner is started when omitted'
+        )
+
+    def handle(self, *args, **options):
+        logging.getLogger('activation').setLevel(logging.WARNING)
+        logging.getLogger('urllib3').setLevel(logging.WARNING)
+
+        server = None
+        base_url = options['url']
+        if not base_url:
+            server = start_stub_partner()
+            base_url = server.base_url
+            self.stdout.write(f'Started stub partner at {base_url}')
+
+        try:
+            unpooled = self.run(self.unpooled_round_trip, base_url, options)
+            partner_client.close_session()
+            pooled = self.run(self.pooled_round_trip, base_url, options)
+        finally:
+            if server:
+                server.shutdown()
+
+        self.stdout.write(f'requests.post/get: {unpooled:.0f} round trips/sec')
+        self.stdout.write(f'pooled session:    {pooled:.0f} round trips/sec')
+        self.stdout.write(f'pool stats:        {partner_client.get_pool_stats()}')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {pooled / unpooled:.2f}x'))
+
+    def run(self, round_trip, base_url, options):
+        count = options['requests']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(lambda _: round_trip(base_url), range(count)))
+        return count / (time.perf_counter() - start)
+
+    @staticmethod
+    def unpooled_round_trip(base_url):
+        """Activation and validation as previously done, one connection per call."""
+        timeout = partner_client.get_timeout()
+        response = requests.post(f"{base_url}/activate/", json={'user_id': 1, 'offer_id': 1, 'amount': 10.0}, timeout=timeout)
+        requests.get(f"{base_url}/validate/{response.json()['reference']}/", timeout=timeout)
+
+    @staticmethod
+    def pooled_round_trip(base_url):
+        response = partner_client.post(f"{base_url}/activate/", json={'user_id': 1, 'offer_id': 1, 'amount': 10.0})
+        partner_client.get(f"{base_url}/validate/{response.json()['reference']}/")
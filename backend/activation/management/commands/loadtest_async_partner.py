@@ -0,0 +1,116 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.test.utils import override_settings
+from activation import partner_client
+from activation.tasks import activate_offer_with_partner
+from activation.async_worker import (
+    create_partner_session,
+    async_activate_offer_with_partner,
+    ReferenceValidationBatcher,
+)
+from activation.stub_partner import StubPartnerProcess, use_stub_partner
+from types import SimpleNamespace
+import asyncio
+import logging
+import time
+
+
+class Command(BaseCommand):
+    help = 'Load test the asyncio partner calls against a local stub partner with injected latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--activations',
+            type=int,
+            default=2000,
+            help='Number of activations to run through the async client (default: 2000)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.PARTNER_ASYNC_CONCURRENCY,
+            help=f'Activations in flight (default: {settings.PARTNER_ASYNC_CONCURRENCY})'
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.2,
+            help='Latency in seconds injected by the stub partner per call (default: 0.2)'
+        )
+        parser.add_argument(
+            '--sync-activations',
+            type=int,
+            default=20,
+            help='Number of blocking activations used to measure one Celery worker process (default: 20)'
+        )
+        parser.add_argument(
+            '--validation-mode',
+            action='append',
+            choices=['each', 'batch', 'signed'],
+            help='Validation mode(s) of the async run, may be repeated (default: all of them)'
+        )
+
+    def handle(self, *args, **options):
+        logging.getLogger('activation').setLevel(logging.WARNING)
+        modes = options['validation_mode'] or ['each', 'batch', 'signed']
+
+        # Signed mode needs a secret shared with the stub partner process
+        with override_settings(PARTNER_SIGNING_SECRET=settings.PARTNER_SIGNING_SECRET or 'loadtest-secret'):
+            server = StubPartnerProcess(latency=options['latency'])
+            try:
+                with use_stub_partner(server):
+                    sync_rate = self.run_sync(options['sync_activations'])
+                    self.stdout.write(f'blocking worker process: {sync_rate:.1f} activations/sec')
+                    for mode in modes:
+                        with override_settings(PARTNER_VALIDATION_MODE=mode):
+                            async_rate, peak = asyncio.run(
+                                self.run_async(options['activations'], options['concurrency'])
+                            )
+                        self.stdout.write(
+                            f'asyncio worker process ({mode} validation): {async_rate:.1f} activations/sec, '
+                            f'peak {peak} in flight, {async_rate / sync_rate:.1f}x'
+                        )
+            finally:
+                server.shutdown()
+                partner_client.close_session()
+
+    @staticmethod
+    def fake_transaction(index):
+        return SimpleNamespace(
+            transaction_id=f'loadtest-{index}',
+            user=SimpleNamespace(id=1),
+            offer=SimpleNamespace(id=1),
+            amount=10
+        )
+
+    def run_sync(self, count):
+        start = time.perf_counter()
+        for index in range(count):
+            activate_offer_with_partner(self.fake_transaction(index))
+        return count / (time.perf_counter() - start)
+
+    async def run_async(self, count, concurrency):
+        slots = asyncio.Semaphore(concurrency)
+        in_flight = 0
+        peak = 0
+        failures = 0
+
+        async def activate(client, batcher, index):
+            nonlocal in_flight, peak, failures
+            async with slots:
+                in_flight += 1
+                peak = max(peak, in_flight)
+                result = await async_activate_offer_with_partner(client, self.fake_transaction(index), batcher)
+                in_flight -= 1
+                if not result['success']:
+                    failures += 1
+
+        start = time.perf_counter()
+        async with create_partner_session() as client:
+            batcher = ReferenceValidationBatcher(client)
+            await asyncio.gather(*(activate(client, batcher, index) for index in range(count)))
+        elapsed = time.perf_counter() - start
+
+        if failures:
+            self.stdout.write(self.style.WARNING(f'{failures} async activations failed'))
+        return count / elapsed, peak
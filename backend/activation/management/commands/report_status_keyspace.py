@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from activation.status_store import StatusStore
+from config.redis_client import redis_client, pipeline
+from redis.exceptions import ResponseError
+import time
+import uuid
+
+
+class Command(BaseCommand):
+    help = 'Report the size and memory of the transaction status keyspace, optionally under simulated load'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simulate',
+            type=int,
+            default=0,
+            help='Transactions taken through PENDING, PROCESSING and SUCCESS per round (default: 0)'
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=10,
+            help='Number of simulated rounds (default: 10)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds between simulated rounds (default: 1)'
+        )
+        parser.add_argument(
+            '--final-ttl',
+            type=int,
+            default=3,
+            help='TTL of the final statuses written by the simulation, in seconds (default: 3)'
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=200,
+            help='Number of keys sampled to estimate memory (default: 200)'
+        )
+        parser.add_argument(
+            '--expire-untracked',
+            action='store_true',
+            help='Apply ACTIVATION_STATUS_TTL to status keys written without a TTL'
+        )
+
+    def handle(self, *args, **options):
+        if options['simulate']:
+            self.simulate(options)
+            return
+
+        keys = list(self.scan('transaction:*'))
+        untracked = self.untracked(keys)
+        self.stdout.write(f'status keys:        {len(keys)}')
+        self.stdout.write(f'keys without TTL:   {len(untracked)}')
+        self.report_memory(keys, options['sample'])
+
+        if untracked and options['expire_untracked']:
+            with pipeline() as pipe:
+                for key in untracked:
+                    pipe.expire(key, settings.ACTIVATION_STATUS_TTL)
+            self.stdout.write(self.style.SUCCESS(f'Applied a TTL of {settings.ACTIVATION_STATUS_TTL}s to {len(untracked)} keys'))
+        elif untracked:
+            self.stdout.write(self.style.WARNING('Run with --expire-untracked to bound the keys written before status TTLs'))
+
+    def simulate(self, options):
+        """
+        Write --simulate complete lifecycles per round, then count the
+        simulated keys still alive. The count levels off around the write
+        rate times the final TTL instead of growing with every round.
+        """
+        store = StatusStore(redis_client, final_ttl=options['final_ttl'])
+        prefix = f'keyspace-sim-{uuid.uuid4().hex[:8]}'
+        count = options['simulate']
+        rate = count / options['interval']
+        self.stdout.write(f'Writing {count} transactions every {options["interval"]}s, final TTL {options["final_ttl"]}s')
+
+        for round_number in range(1, options['rounds'] + 1):
+            start = time.perf_counter()
+            with pipeline() as pipe:
+                for i in range(count):
+                    transaction_id = f'{prefix}-{round_number}-{i}'
+                    store.transition(transaction_id, {'status': 'PENDING', 'updated_at': start}, pipe=pipe)
+                    store.transition(transaction_id, {'status': 'PROCESSING', 'updated_at': start}, pipe=pipe)
+                    store.transition(transaction_id, {'status': 'SUCCESS', 'updated_at': start, 'reference': 'SIM'}, pipe=pipe)
+            alive = sum(1 for _ in self.scan(f'transaction:{prefix}-*'))
+            self.stdout.write(f'round {round_number:>3}: {count * round_number:>8} written, {alive:>8} alive')
+            time.sleep(max(0.0, options['interval'] - (time.perf_counter() - start)))
+
+        keys = list(self.scan(f'transaction:{prefix}-*'))
+        self.report_memory(keys, options['sample'])
+        bound = rate * (options['final_ttl'] + options['interval'])
+        if len(keys) <= bound:
+            self.stdout.write(self.style.SUCCESS(f'Keyspace bounded: {len(keys)} keys alive, at most {bound:.0f} expected'))
+        else:
+            self.stdout.write(self.style.ERROR(f'Keyspace not bounded: {len(keys)} keys alive, at most {bound:.0f} expected'))
+
+    def scan(self, pattern):
+        return redis_client.scan_iter(match=pattern, count=1000, _type='hash')
+
+    def untracked(self, keys):
+        with pipeline() as pipe:
+            for key in keys:
+                pipe.ttl(key)
+        return [key for key, ttl in zip(keys, pipe.results) if ttl == -1]
+
+    def report_memory(self, keys, sample):
+        """
+        Estimate the memory of the keys from a sample: the size of the stored
+        fields, and the server-side footprint when MEMORY USAGE is supported.
+        """
+        sampled = keys[:sample]
+        if not sampled:
+            return
+        with pipeline() as pipe:
+            for key in sampled:
+                pipe.hgetall(key)
+        sizes = [
+            len(key) + sum(len(field) + len(value) for field, value in fields.items())
+            for key, fields in zip(sampled, pipe.results)
+        ]
+        self.report_sizes('payload', sizes, len(keys))
+
+        try:
+            # Probed outside the pipeline, some servers lack the command
+            redis_client.memory_usage(sampled[0])
+        except ResponseError:
+            return
+        with pipeline() as pipe:
+            for key in sampled:
+                pipe.memory_usage(key)
+        self.report_sizes('MEMORY USAGE', [size or 0 for size in pipe.results], len(keys))
+        self.stdout.write(f'redis used_memory:  {redis_client.info("memory")["used_memory_human"]}')
+
+    def report_sizes(self, source, sizes, total_keys):
+        average = sum(sizes) / len(sizes)
+        self.stdout.write(
+            f'{source}: {average:.0f} bytes per key ({len(sizes)} sampled), '
+            f'{average * total_keys / 1024:.1f} KiB estimated in total'
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from activation.async_worker import AsyncActivationWorker
+import asyncio
+import signal
+
+
+class Command(BaseCommand):
+    help = 'Run the asyncio activation worker (PARTNER_EXECUTION_MODE=async)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.PARTNER_ASYNC_CONCURRENCY,
+            help=f'Maximum partner activations in flight (default: {settings.PARTNER_ASYNC_CONCURRENCY})'
+        )
+
+    def handle(self, *args, **options):
+        worker = AsyncActivationWorker(concurrency=options['concurrency'])
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, worker.stop)
+            await worker.run()
+
+        if settings.PARTNER_EXECUTION_MODE != 'async':
+            self.stdout.write(self.style.WARNING(
+                'PARTNER_EXECUTION_MODE is not "async", activations are still dispatched to Celery'
+            ))
+        asyncio.run(main())
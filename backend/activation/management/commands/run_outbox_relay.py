@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from activation.outbox import OutboxRelay
+import signal
+
+
+class Command(BaseCommand):
+    help = 'Run the outbox relay, dispatching committed activations to Redis and Celery'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.OUTBOX_RELAY_BATCH_SIZE,
+            help=f'Outbox events dispatched per database transaction (default: {settings.OUTBOX_RELAY_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        relay = OutboxRelay(batch_size=options['batch_size'])
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: relay.stop())
+        relay.run()
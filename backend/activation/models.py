@@ -0,0 +1,64 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response returned for a request carrying an Idempotency-Key header,
+    replayed when the client retries the same request
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} - {self.endpoint}"
+
+
+class WebhookEndpoint(models.Model):
+    """
+    URL notified when the activations of its owner complete (SUCCESS or FAILED)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='webhook_endpoints')
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.url}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Pending activation to dispatch, written in the database transaction that
+    creates it and relayed to Redis and Celery by the outbox relay
+    (manage.py run_outbox_relay), then deleted
+    """
+    ACTIVATION = 'activation'
+    BATCH_ACTIVATION = 'batch_activation'
+    EVENT_TYPES = [
+        (ACTIVATION, 'Activation'),
+        (BATCH_ACTIVATION, 'Batch activation'),
+    ]
+
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
+    transaction_id = models.CharField(max_length=100)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.event_type} - {self.transaction_id}"
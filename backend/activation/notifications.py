@@ -0,0 +1,177 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import get_connection, EmailMessage
+from django.utils import timezone
+from .batch_queue import BatchQueue
+from .sms import get_sms_backend
+from config.redis_client import redis_client, pipeline
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'notifications:queue'
+SCHEDULED_KEY = 'notifications:scheduled'
+STATS_KEY = 'notifications:stats'
+
+notification_queue = BatchQueue(redis_client, QUEUE_KEY, 'notifications')
+
+
+def enqueue_notification(email, subject, body, phone=None):
+    """
+    Queue a notification for deliver_notifications, so the caller never
+    waits on the mail server. A delivery is scheduled in
+    NOTIFICATION_BATCH_WINDOW seconds unless one is already, so notifications
+    close in time share one mail connection.
+
+    Args:
+        email (str): Address of the recipient
+        subject (str): Subject of the email
+        body (str): Text of the email, also sent by SMS
+        phone (str): Number of the recipient, None to only send the email
+    """
+    message = {'email': email, 'subject': subject, 'body': body}
+    if phone:
+        message['phone'] = phone
+    with pipeline() as pipe:
+        pipe.rpush(QUEUE_KEY, json.dumps(message))
+        pipe.set(SCHEDULED_KEY, 1, nx=True, ex=settings.NOTIFICATION_BATCH_WINDOW + 60)
+    if pipe.results[1]:
+        deliver_notifications.apply_async(countdown=settings.NOTIFICATION_BATCH_WINDOW)
+
+
+@shared_task
+def deliver_notifications():
+    """
+    Send the queued notifications, NOTIFICATION_BATCH_SIZE at a time: the
+    emails of a batch over one mail connection and its SMS in one call to
+    the SMS backend.
+    
+    A batch stays claimed until it was sent, so a crash never loses it: it is
+    queued again once NOTIFICATION_BATCH_TIMEOUT passes. When nothing of a
+    batch could be sent (mail server down), it is queued again and delivery
+    resumes in NOTIFICATION_RETRY_DELAY seconds.
+
+    Returns:
+        dict: Messages sent and failed, and the throughput in messages/sec
+    """
+    # Notifications queued from now on schedule a new delivery
+    redis_client.delete(SCHEDULED_KEY)
+
+    recover_notifications()
+    start = time.monotonic()
+    sent = failed = 0
+    while True:
+        batch_id = notification_queue.claim(settings.NOTIFICATION_BATCH_SIZE, settings.NOTIFICATION_BATCH_TIMEOUT)
+        if batch_id is None:
+            break
+        batch = notification_queue.items(batch_id)
+        batch_sent, batch_failed = send_notification_batch([json.loads(message) for message in batch])
+        if not batch_sent and batch_failed:
+            logger.warning(f"Could not send any of {len(batch)} notifications, retrying in {settings.NOTIFICATION_RETRY_DELAY}s")
+            notification_queue.hold(batch_id, 0)
+            deliver_notifications.apply_async(countdown=settings.NOTIFICATION_RETRY_DELAY)
+            break
+        notification_queue.ack(batch_id)
+        sent += batch_sent
+        failed += batch_failed
+
+    duration = time.monotonic() - start
+    stats = {
+        'sent': sent,
+        'failed': failed,
+        'messages_per_sec': round(sent / duration, 1) if duration else 0.0,
+    }
+    if sent or failed:
+        with pipeline() as pipe:
+            pipe.hincrby(STATS_KEY, 'sent', sent)
+            pipe.hincrby(STATS_KEY, 'failed', failed)
+            pipe.hset(STATS_KEY, mapping={
+                'last_delivery_at': str(timezone.now()),
+                'messages_per_sec': stats['messages_per_sec'],
+            })
+        logger.info(f"Sent {sent} notifications ({failed} failed) at {stats['messages_per_sec']} messages/sec")
+    return stats
+
+
+def recover_notifications():
+    """
+    Put the batches whose timeout passed back at the head of the queue.
+    
+    Returns:
+        int: Number of notifications recovered
+    """
+    recovered = notification_queue.recover()
+    if recovered:
+        logger.warning(f"Recovered {recovered} notifications of stalled batches")
+    return recovered
+
+
+@shared_task
+def recover_notification_batches():
+    """
+    Queue again the batches of crashed workers and schedule their delivery.
+    """
+    if recover_notifications():
+        deliver_notifications.apply_async()
+
+
+def send_notification_batch(notifications):
+    """
+    Args:
+        notifications (list): Queued {'email', 'subject', 'body', 'phone'} messages
+
+    Returns:
+        tuple: Number of messages sent and failed, emails and SMS together
+    """
+    emails = [
+        EmailMessage(
+            notification['subject'],
+            notification['body'],
+            settings.DEFAULT_FROM_EMAIL or 'noreply@offersapi.com',
+            [notification['email']]
+        )
+        for notification in notifications
+    ]
+    sms = [(notification['phone'], notification['body']) for notification in notifications if notification.get('phone')]
+
+    sent = send_email_batch(emails)
+    if sms:
+        try:
+            sent_sms = get_sms_backend(fail_silently=True).send_messages(sms) or 0
+        except Exception as e:
+            logger.error(f"Failed to send {len(sms)} SMS: {str(e)}", exc_info=True)
+            sent_sms = 0
+        sent += sent_sms
+    return sent, len(emails) + len(sms) - sent
+
+
+def send_email_batch(messages):
+    """
+    Send emails over a single mail connection.
+
+    Args:
+        messages (list): The EmailMessage instances
+
+    Returns:
+        int: Number of messages sent
+    """
+    try:
+        with get_connection(fail_silently=True) as connection:
+            return connection.send_messages(messages) or 0
+    except Exception as e:
+        logger.error(f"Failed to send {len(messages)} emails: {str(e)}", exc_info=True)
+        return 0
+
+
+def get_notification_stats():
+    """
+    Returns:
+        dict: Notifications sent and failed since the counters were created,
+        and the throughput of the last delivery
+    """
+    stats = redis_client.hgetall(STATS_KEY)
+    stats['queued'] = redis_client.llen(QUEUE_KEY)
+    stats['batches_in_flight'] = redis_client.zcard(notification_queue.batches_key)
+    return stats
@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from .models import OutboxEvent
+from .tasks import process_activation, publish_status
+from config.redis_client import pipeline
+import logging
+import select
+import time
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel the relay LISTENs on; NOTIFY is delivered on commit
+OUTBOX_CHANNEL = 'activation_outbox'
+
+
+def notify_relay():
+    """
+    Wake the relay once the current database transaction commits, so events
+    are dispatched without waiting for the next poll. No-op on databases
+    without LISTEN/NOTIFY.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, '')", [OUTBOX_CHANNEL])
+
+
+def relay_batch(batch_size=None):
+    """
+    Dispatch up to OUTBOX_RELAY_BATCH_SIZE outbox events, oldest first, and
+    delete them in the same database transaction. Rows locked by another
+    relay are skipped, so relays can run side by side.
+
+    When Redis or the broker fails the transaction rolls back and the events
+    are dispatched again by the next batch: delivery is at least once, and
+    begin_activation lets only one of the duplicates claim the transaction.
+
+    Returns:
+        int: Number of events dispatched
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    with db_transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+        dispatch_events(events)
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).delete()
+    logger.info(f"Relayed {len(events)} outbox events")
+    return len(events)
+
+
+def dispatch_events(events):
+    """
+    Publish the pending statuses with one Redis pipeline, then queue the
+    activations on the async worker queue or as Celery tasks over one broker
+    connection. Batch activations go behind single ones (see CELERY_TASK_ROUTES).
+
+    Args:
+        events (list): The OutboxEvent instances to dispatch
+    """
+    transaction_ids = [event.transaction_id for event in events]
+    with pipeline() as pipe:
+        for event in events:
+            publish_status(event.transaction_id, event.payload, pipe=pipe)
+        if settings.PARTNER_EXECUTION_MODE == 'async':
+            pipe.rpush(settings.ACTIVATION_ASYNC_QUEUE, *transaction_ids)
+
+    if settings.PARTNER_EXECUTION_MODE != 'async':
+        with process_activation.app.producer_or_acquire() as producer:
+            for event in events:
+                options = {'producer': producer}
+                if event.event_type == OutboxEvent.BATCH_ACTIVATION:
+                    options['priority'] = settings.ACTIVATION_BATCH_PRIORITY
+                process_activation.apply_async((event.transaction_id,), **options)
+
+
+def get_outbox_stats():
+    """
+    Returns:
+        dict: Number of events waiting for the relay and the age in seconds
+        of the oldest one
+    """
+    stats = OutboxEvent.objects.aggregate(pending=Count('id'), oldest=Min('created_at'))
+    oldest = stats.pop('oldest')
+    stats['lag'] = round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0.0
+    return stats
+
+
+class OutboxRelay:
+    """
+    Drain the outbox until stopped. The relay LISTENs for the NOTIFY sent by
+    each committed activation, polls every OUTBOX_RELAY_POLL_INTERVAL seconds
+    in case one is missed, and keeps draining while batches come back full.
+    """
+
+    def __init__(self, batch_size=None, poll_interval=None):
+        self.batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.OUTBOX_RELAY_POLL_INTERVAL
+        self.listening = False
+        self.running = False
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        self.running = True
+        while self.running:
+            try:
+                self.listen()
+                relayed = relay_batch(self.batch_size)
+            except Exception as e:
+                logger.error(f"Outbox relay failed, retrying in {settings.OUTBOX_RELAY_ERROR_BACKOFF}s: {str(e)}", exc_info=True)
+                # The next batch reconnects and listens again
+                connection.close()
+                self.listening = False
+                time.sleep(settings.OUTBOX_RELAY_ERROR_BACKOFF)
+                continue
+            if relayed < self.batch_size:
+                self.wait()
+
+    def listen(self):
+        if self.listening or connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {OUTBOX_CHANNEL}')
+        self.listening = True
+
+    def wait(self):
+        """
+        Sleep until a NOTIFY arrives or the poll interval elapses.
+        """
+        if not self.listening:
+            time.sleep(self.poll_interval)
+            return
+        raw = connection.connection
+        # Notifications received while the last batch ran are already buffered
+        raw.poll()
+        if not raw.notifies and select.select([raw], [], [], self.poll_interval)[0]:
+            raw.poll()
+        raw.notifies.clear()
@@ -0,0 +1,111 @@
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+import requests
+import threading
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_requests_count = 0
+_requests_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the pooled HTTP session of the current process.
+
+    The session keeps connections to the partner system alive between calls.
+    It is rebuilt after a fork so that Celery prefork children never share
+    sockets inherited from their parent.
+    """
+    global _session, _session_pid, _requests_count
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.PARTNER_POOL_CONNECTIONS,
+                    pool_maxsize=settings.PARTNER_POOL_MAXSIZE
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update({
+                    'Content-Type': 'application/json',
+                    'User-Agent': 'Offers-API/1.0',
+                    'Connection': 'keep-alive'
+                })
+                _session = session
+                _session_pid = pid
+                with _requests_lock:
+                    _requests_count = 0
+                logger.info(f"Created partner HTTP session for process {pid}")
+    return _session
+
+
+def get_timeout():
+    """
+    Return the (connect, read) timeout used for partner calls.
+    """
+    return (settings.PARTNER_CONNECT_TIMEOUT, settings.PARTNER_READ_TIMEOUT)
+
+
+def request(method, url, **kwargs):
+    """
+    Send a request to the partner system through the pooled session.
+    """
+    global _requests_count
+    kwargs.setdefault('timeout', get_timeout())
+    session = get_session()
+    # Partner calls run on many threads (async worker, threaded servers)
+    with _requests_lock:
+        _requests_count += 1
+    return session.request(method, url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def get_pool_stats():
+    """
+    Return connection reuse metrics for the current process.
+
+    Returns:
+        dict: Number of requests sent, connections opened and the share of
+        requests that were served over an already open connection
+    """
+    with _requests_lock:
+        requests_count = _requests_count
+    connections = 0
+    if _session is not None and _session_pid == os.getpid():
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                connections += pools[key].num_connections
+    return {
+        'pid': os.getpid(),
+        'requests': requests_count,
+        'connections_opened': connections,
+        'connection_reuse_ratio': round(1 - connections / requests_count, 4) if requests_count else 0.0,
+    }
+
+
+def close_session():
+    """
+    Close the pooled session and its connections.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
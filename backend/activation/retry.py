@@ -0,0 +1,99 @@
+from django.conf import settings
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def is_retryable(activation_result):
+    """
+    Tell whether a failed partner call is worth retrying.
+    
+    Timeouts, connection errors, 5xx and 429 responses are transient and
+    flagged as partner_unavailable. Rejected requests, invalid references and
+    unexpected errors would fail the same way again.
+    
+    Args:
+        activation_result (dict): Result of activate_offer_with_partner
+        
+    Returns:
+        bool: True if the activation should be attempted again
+    """
+    return not activation_result.get('success', False) and activation_result.get('partner_unavailable', False)
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """
+    Exponential backoff with full jitter: a random delay between 0 and
+    min(cap, base * 2 ** attempt), so activations that failed together do
+    not retry together.
+    
+    Args:
+        attempt (int): Number of attempts made so far, starting at 1
+        base (float): Defaults to PARTNER_RETRY_BACKOFF_BASE
+        cap (float): Defaults to PARTNER_RETRY_BACKOFF_CAP
+        
+    Returns:
+        float: Delay in seconds before the next attempt
+    """
+    base = settings.PARTNER_RETRY_BACKOFF_BASE if base is None else base
+    cap = settings.PARTNER_RETRY_BACKOFF_CAP if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RetryBudget:
+    """
+    Cluster-wide cap on retries, stored in Redis.
+
+    Within each window of PARTNER_RETRY_BUDGET_WINDOW seconds, retries are
+    allowed up to PARTNER_RETRY_BUDGET_RATIO of the first attempts made (and
+    at least PARTNER_RETRY_BUDGET_MIN), so an outage of the partner system
+    cannot multiply the load on it.
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.prefix = f"retry_budget:{name}"
+
+    def window_key(self, now=None):
+        window = int((now or time.time()) // settings.PARTNER_RETRY_BUDGET_WINDOW)
+        return f"{self.prefix}:{window}"
+
+    def record_attempt(self):
+        """
+        Record a first attempt, which earns the budget a fraction of a retry.
+        """
+        window_key = self.window_key()
+        pipe = self.client.pipeline()
+        pipe.hincrby(window_key, 'attempts', 1)
+        pipe.expire(window_key, settings.PARTNER_RETRY_BUDGET_WINDOW * 2)
+        pipe.execute()
+
+    def try_spend(self):
+        """
+        Take one retry from the budget.
+        
+        Returns:
+            bool: True if the retry may be made
+        """
+        window_key = self.window_key()
+        pipe = self.client.pipeline()
+        pipe.hincrby(window_key, 'retries', 1)
+        pipe.hget(window_key, 'attempts')
+        pipe.expire(window_key, settings.PARTNER_RETRY_BUDGET_WINDOW * 2)
+        retries, attempts, _ = pipe.execute()
+
+        allowed = max(settings.PARTNER_RETRY_BUDGET_MIN, int(attempts or 0) * settings.PARTNER_RETRY_BUDGET_RATIO)
+        if retries > allowed:
+            self.client.hincrby(window_key, 'retries', -1)
+            logger.warning(f"Retry budget {self.prefix} exhausted: {retries - 1}/{int(attempts or 0)} retries")
+            return False
+        return True
+
+    def get_state(self):
+        window = self.client.hgetall(self.window_key())
+        return {
+            'window_attempts': int(window.get('attempts', 0)),
+            'window_retries': int(window.get('retries', 0)),
+        }
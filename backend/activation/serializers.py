@@ -0,0 +1,33 @@
+from rest_framework import serializers
+from django.conf import settings
+from .models import WebhookEndpoint
+from .webhooks import check_webhook_url
+
+
+class BatchActivationItemSerializer(serializers.Serializer):
+    """Serializer for a single (user, offer) pair of a batch activation"""
+    user_id = serializers.IntegerField()
+    offer_id = serializers.IntegerField()
+
+
+class BatchActivationSerializer(serializers.Serializer):
+    """Serializer for a batch activation request"""
+    items = serializers.ListField(
+        child=BatchActivationItemSerializer(),
+        allow_empty=False,
+        max_length=settings.ACTIVATION_BATCH_MAX_ITEMS
+    )
+
+
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    """Serializer for WebhookEndpoint model, the secret is only returned on creation"""
+    class Meta:
+        model = WebhookEndpoint
+        fields = ['id', 'url', 'is_active', 'created_at', 'updated_at']
+
+    def validate_url(self, value):
+        try:
+            check_webhook_url(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
@@ -0,0 +1,187 @@
+from django.db import transaction as db_transaction
+from django.db.models import Case, When, F, DecimalField
+from django.utils import timezone
+from datetime import timedelta
+from .models import OutboxEvent
+from .outbox import notify_relay
+from offers.models import Offer, UserOffer
+from account.models import Account, Transaction
+from account.services import debit_balance
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def start_activation(user, offer, renew=False):
+    """
+    Debit the offer price and record a pending activation as a single unit of work.
+
+    The balance debit, the Transaction, the UserOffer and the outbox event are
+    written in one database transaction. The outbox relay then publishes the
+    Redis status entry and queues the Celery task, so the request only waits
+    on the database commit and a rolled back activation never reaches the
+    worker.
+
+    Args:
+        user (User): The user activating the offer
+        offer (Offer): The offer to activate
+        renew (bool): Whether an existing UserOffer for this offer should be reused
+
+    Returns:
+        Transaction: The pending transaction, or None if the balance is insufficient
+    """
+    transaction_id = str(uuid.uuid4())
+    expiration_date = timezone.now() + timedelta(days=offer.duration_days)
+
+    with db_transaction.atomic():
+        if not debit_balance(user, offer.price):
+            return None
+
+        transaction = Transaction.objects.create(
+            user=user,
+            offer=offer,
+            transaction_id=transaction_id,
+            amount=offer.price,
+            status='PENDING'
+        )
+
+        if renew:
+            UserOffer.objects.update_or_create(
+                user=user,
+                offer=offer,
+                defaults={
+                    'transaction_id': transaction_id,
+                    'is_active': False,
+                    'expiration_date': expiration_date
+                }
+            )
+        else:
+            UserOffer.objects.create(
+                user=user,
+                offer=offer,
+                expiration_date=expiration_date,
+                transaction_id=transaction_id,
+                is_active=False  # Will be activated after processing
+            )
+
+        OutboxEvent.objects.create(
+            event_type=OutboxEvent.ACTIVATION,
+            transaction_id=transaction_id,
+            payload=pending_status(transaction)
+        )
+        notify_relay()
+
+    logger.info(f"Created pending transaction {transaction_id} for user {user.id} and offer {offer.id}")
+    return transaction
+
+
+def start_batch_activation(items):
+    """
+    Activate offers for many users at once.
+
+    Balances of all the users involved are locked and validated with a single
+    query, debited with a single UPDATE, and the Transaction, UserOffer and
+    outbox event rows are inserted with bulk_create, all in one database
+    transaction. Items are
+    applied in order, so a user whose balance runs out only has the later
+    items rejected.
+
+    Args:
+        items (list): (user_id, offer_id) pairs
+
+    Returns:
+        list: One result dict per item, in the same order, holding either the
+        transaction_id of the pending activation or an error message
+    """
+    offers = Offer.objects.filter(
+        id__in={offer_id for _, offer_id in items},
+        is_active=True
+    ).in_bulk()
+    now = timezone.now()
+    results = []
+    transactions = []
+    user_offers = []
+
+    with db_transaction.atomic():
+        # Lock in a fixed order so overlapping batches cannot deadlock
+        balances = dict(
+            Account.objects.select_for_update()
+            .filter(user_id__in={user_id for user_id, _ in items})
+            .order_by('user_id')
+            .values_list('user_id', 'balance')
+        )
+        debits = {}
+
+        for user_id, offer_id in items:
+            result = {'user_id': user_id, 'offer_id': offer_id}
+            results.append(result)
+            offer = offers.get(offer_id)
+
+            if offer is None:
+                result['error'] = 'Offer not found'
+                continue
+            if user_id not in balances:
+                result['error'] = 'Account not found'
+                continue
+            if balances[user_id] - debits.get(user_id, 0) < offer.price:
+                result['error'] = 'Insufficient balance'
+                continue
+
+            debits[user_id] = debits.get(user_id, 0) + offer.price
+            transaction_id = str(uuid.uuid4())
+            transactions.append(Transaction(
+                user_id=user_id,
+                offer=offer,
+                transaction_id=transaction_id,
+                amount=offer.price,
+                status='PENDING'
+            ))
+            user_offers.append(UserOffer(
+                user_id=user_id,
+                offer=offer,
+                expiration_date=now + timedelta(days=offer.duration_days),
+                transaction_id=transaction_id,
+                is_active=False  # Will be activated after processing
+            ))
+            result['transaction_id'] = transaction_id
+            result['status'] = 'PENDING'
+
+        if transactions:
+            Account.objects.filter(user_id__in=debits).update(
+                balance=Case(
+                    *[When(user_id=user_id, then=F('balance') - amount) for user_id, amount in debits.items()],
+                    output_field=DecimalField()
+                ),
+                updated_at=now
+            )
+            Transaction.objects.bulk_create(transactions)
+            UserOffer.objects.bulk_create(user_offers)
+            OutboxEvent.objects.bulk_create([
+                OutboxEvent(
+                    event_type=OutboxEvent.BATCH_ACTIVATION,
+                    transaction_id=transaction.transaction_id,
+                    payload=pending_status(transaction)
+                )
+                for transaction in transactions
+            ])
+            notify_relay()
+
+    logger.info(f"Created {len(transactions)} pending transactions out of {len(items)} batch items")
+    return results
+
+
+def pending_status(transaction):
+    """
+    Build the Redis hash stored for a newly created transaction.
+    """
+    now = str(timezone.now())
+    return {
+        'transaction_id': transaction.transaction_id,
+        'user_id': str(transaction.user_id),
+        'offer_id': str(transaction.offer_id),
+        'amount': str(transaction.amount),
+        'status': 'PENDING',
+        'created_at': now,
+        'updated_at': now
+    }
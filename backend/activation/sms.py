@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BaseSMSBackend:
+    """
+    Base class of the SMS channel, selected with SMS_BACKEND. A provider
+    backend implements send_messages, sending a whole batch over one client
+    session like the mail backends do.
+    """
+
+    def __init__(self, fail_silently=False):
+        self.fail_silently = fail_silently
+
+    def send_messages(self, messages):
+        """
+        Args:
+            messages (list): (phone number, text) pairs
+
+        Returns:
+            int: Number of messages sent
+        """
+        raise NotImplementedError('SMS backends must implement send_messages()')
+
+
+class ConsoleSMSBackend(BaseSMSBackend):
+    """
+    Local stub: logs the messages instead of sending them.
+    """
+
+    def send_messages(self, messages):
+        for phone, text in messages:
+            logger.info(f"SMS to {phone}: {text}")
+        return len(messages)
+
+
+class LocMemSMSBackend(BaseSMSBackend):
+    """
+    Keeps the messages in LocMemSMSBackend.outbox, for tests.
+    """
+
+    outbox = []
+
+    def send_messages(self, messages):
+        self.outbox.extend(messages)
+        return len(messages)
+
+
+def get_sms_backend(fail_silently=False):
+    """
+    Returns:
+        BaseSMSBackend: An instance of the SMS_BACKEND class
+    """
+    return import_string(settings.SMS_BACKEND)(fail_silently=fail_silently)
@@ -0,0 +1,118 @@
+from django.conf import settings
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ('SUCCESS', 'FAILED')
+
+# Statuses a transaction may move to from each status ('' when no status is
+# stored yet, or it expired). PROCESSING repeats on every partner retry.
+TRANSITIONS = {
+    '': ('PENDING', 'PROCESSING', 'SUCCESS', 'FAILED'),
+    'PENDING': ('PROCESSING', 'SUCCESS', 'FAILED'),
+    'PROCESSING': ('PROCESSING', 'SUCCESS', 'FAILED'),
+    'SUCCESS': (),
+    'FAILED': (),
+}
+
+
+class StatusStore:
+    """
+    Status of each transaction kept in a Redis hash, as a state machine.
+
+    A transition is a compare-and-set run server-side: the fields are only
+    written when the stored status allows the new one, so a late or
+    duplicate update can never overwrite SUCCESS with FAILED. The TTL is
+    refreshed and the new status published in the same round trip, so
+    hashes of finished transactions expire after ACTIVATION_FINAL_STATUS_TTL
+    and the status endpoint falls back to the database.
+    """
+
+    # KEYS: hash, channel
+    # ARGV: ttl, message, number of allowed previous statuses, the allowed
+    # previous statuses, then the field/value pairs to write
+    TRANSITION_SCRIPT = """
+    local current = redis.call('HGET', KEYS[1], 'status') or ''
+    local count = tonumber(ARGV[3])
+    local allowed = false
+    for i = 4, 3 + count do
+        if ARGV[i] == current then
+            allowed = true
+            break
+        end
+    end
+    if not allowed then
+        return {0, current}
+    end
+    redis.call('HSET', KEYS[1], unpack(ARGV, 4 + count))
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    redis.call('PUBLISH', KEYS[2], ARGV[2])
+    return {1, current}
+    """
+
+    def __init__(self, client, ttl=None, final_ttl=None):
+        """
+        Args:
+            client (Redis): Client returning decoded strings
+            ttl (int): TTL of pending and processing statuses, ACTIVATION_STATUS_TTL by default
+            final_ttl (int): TTL of final statuses, ACTIVATION_FINAL_STATUS_TTL by default
+        """
+        self.client = client
+        self._ttl = ttl
+        self._final_ttl = final_ttl
+        self.transition_script = client.register_script(self.TRANSITION_SCRIPT)
+
+    def key(self, transaction_id):
+        return f"transaction:{transaction_id}"
+
+    def channel(self, transaction_id):
+        """
+        Returns:
+            str: The pub/sub channel the status transitions of a transaction are published on
+        """
+        return f"transaction:{transaction_id}:status"
+
+    def ttl(self, status):
+        if status in FINAL_STATUSES:
+            return self._final_ttl or settings.ACTIVATION_FINAL_STATUS_TTL
+        return self._ttl or settings.ACTIVATION_STATUS_TTL
+
+    def transition(self, transaction_id, mapping, pipe=None):
+        """
+        Move a transaction to the status of mapping, store the fields and
+        publish them to the clients streaming it.
+
+        Args:
+            transaction_id (str): The transaction whose status changes
+            mapping (dict): The status fields to store, with the new 'status'
+            pipe (Pipeline): Pipeline to queue the script on instead of running it
+
+        Returns:
+            bool: True if the transition was applied, None when pipelined
+            (the reply is then [applied, previous status] in the results)
+        """
+        new_status = mapping['status']
+        sources = [source for source, targets in TRANSITIONS.items() if new_status in targets]
+        fields = [str(item) for pair in mapping.items() for item in pair]
+        reply = self.transition_script(
+            keys=[self.key(transaction_id), self.channel(transaction_id)],
+            args=[self.ttl(new_status), json.dumps(mapping), len(sources), *sources, *fields],
+            client=pipe or self.client
+        )
+        if pipe is not None:
+            return None
+        applied, current = reply
+        if not applied:
+            logger.warning(
+                f"Rejected status transition of transaction {transaction_id} from "
+                f"{current or 'none'} to {new_status}"
+            )
+        return bool(applied)
+
+    def get(self, transaction_id):
+        """
+        Returns:
+            dict: The stored status fields, empty if there are none
+        """
+        return self.client.hgetall(self.key(transaction_id))
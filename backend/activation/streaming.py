@@ -0,0 +1,61 @@
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+import json
+import logging
+import time
+from .status_store import FINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views accept `Accept: text/event-stream`. Successful streams are
+    returned as StreamingHttpResponse; this only renders error responses,
+    as a single `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event('error', data).encode()
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def status_events(pubsub, current):
+    """
+    Yield the current status of a transaction, then each status published
+    on the channel `pubsub` is subscribed to, until a final status is reached
+    or ACTIVATION_STREAM_TIMEOUT expires. Comments are sent every
+    ACTIVATION_STREAM_KEEPALIVE seconds so proxies keep the connection open.
+    Once the stream ends, EventSource clients reconnect on their own.
+    
+    Args:
+        pubsub (PubSub): Subscription to the status channel of the transaction
+        current (dict): The status of the transaction when the stream was opened
+    """
+    try:
+        yield f"retry: {settings.ACTIVATION_STREAM_RETRY_MS}\n" + sse_event('status', current)
+        if current.get('status') in FINAL_STATUSES:
+            return
+        
+        deadline = time.monotonic() + settings.ACTIVATION_STREAM_TIMEOUT
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            message = pubsub.get_message(timeout=min(remaining, settings.ACTIVATION_STREAM_KEEPALIVE))
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            
+            data = json.loads(message['data'])
+            yield sse_event('status', data)
+            if data.get('status') in FINAL_STATUSES:
+                return
+    finally:
+        pubsub.close()
@@ -0,0 +1,142 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
+from partner.signing import activation_signature
+import multiprocessing
+import threading
+import json
+import time
+import uuid
+
+
+class StubPartnerHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for the partner system, used by benchmarks and load tests.
+    Speaks HTTP/1.1 so that clients can keep connections alive.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        self.server.simulate_latency()
+
+        if self.path.rstrip('/').endswith('/validate/bulk'):
+            self.send_json(200, {
+                'results': {reference: True for reference in data.get('references', [])}
+            })
+            return
+
+        reference = f"REF-{uuid.uuid4().hex[:12].upper()}"
+        payload = {
+            'reference': reference,
+            'transaction_id': str(uuid.uuid4()),
+            'status': 'PENDING',
+            'message': 'Activation request received'
+        }
+        signature = activation_signature(
+            reference, data.get('user_id'), data.get('offer_id'), data.get('amount', 0)
+        )
+        if signature:
+            payload['signature'] = signature
+        self.send_json(201, payload)
+
+    def do_GET(self):
+        self.server.simulate_latency()
+        reference = self.path.rstrip('/').rsplit('/', 1)[-1]
+        self.send_json(200, {'reference': reference, 'is_valid': True})
+
+    def send_json(self, status_code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubPartnerServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, StubPartnerHandler)
+        self.latency = latency
+
+    def simulate_latency(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v1/partner"
+
+
+def start_stub_partner(latency=0.0, host='127.0.0.1', port=0):
+    """
+    Start a stub partner server in a background thread.
+
+    Args:
+        latency (float): Delay in seconds injected before every response
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+
+    Returns:
+        StubPartnerServer: The running server, stop it with shutdown()
+    """
+    server = StubPartnerServer((host, port), latency=latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class StubPartnerProcess:
+    """
+    Stub partner server running in a child process, so that load tests do not
+    share the GIL with the server threads.
+    """
+
+    def __init__(self, latency=0.0, host='127.0.0.1'):
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=self.serve,
+            args=(latency, host, ready),
+            daemon=True
+        )
+        self.process.start()
+        self.server_address = ready.get(timeout=10)
+
+    @staticmethod
+    def serve(latency, host, ready):
+        server = StubPartnerServer((host, 0), latency=latency)
+        ready.put(server.server_address[:2])
+        server.serve_forever()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}/api/v1/partner"
+
+    def shutdown(self):
+        self.process.terminate()
+        self.process.join()
+
+
+@contextmanager
+def use_stub_partner(server):
+    """
+    Point the activation tasks at a stub partner server for the duration of the block.
+    """
+    from . import tasks
+
+    previous = (tasks.PARTNER_ACTIVATION_URL, tasks.PARTNER_VALIDATION_URL)
+    tasks.PARTNER_ACTIVATION_URL = f"{server.base_url}/activate"
+    tasks.PARTNER_VALIDATION_URL = f"{server.base_url}/validate"
+    try:
+        yield server
+    finally:
+        tasks.PARTNER_ACTIVATION_URL, tasks.PARTNER_VALIDATION_URL = previous
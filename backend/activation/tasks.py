@@ -1,136 +1,112 @@
 from celery import shared_task
+from celery.exceptions import Retry
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
 from account.models import Transaction
+from account.services import credit_balance
 from offers.models import UserOffer
 from partner.models import PartnerTransaction
+from partner.signing import verify_activation_signature
+from django.db.models import Max, Q
+from config.redis_client import redis_client, pipeline
 import logging
-import redis
 import os
-import requests
 from requests.exceptions import RequestException, Timeout, ConnectionError
+from . import partner_client
+from .circuit_breaker import CircuitBreaker, AdaptiveConcurrencyLimiter
+from .retry import RetryBudget, backoff_delay, is_retryable
+from .status_store import StatusStore
+from .webhooks import enqueue_activation_event
+from .notifications import enqueue_notification, send_email_batch
+from .idempotency import purge_expired_keys
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
 import json
+import time
 
-# Redis connection
-redis_client = redis.Redis(
-    host=os.environ.get('REDIS_HOST', 'localhost'),
-    port=os.environ.get('REDIS_PORT', '6379'),
-    db=int(os.environ.get('REDIS_DB', '0')),
-    decode_responses=True
-)
 
 logger = logging.getLogger(__name__)
 
+# Shared protection of the partner system across all workers
+partner_circuit = CircuitBreaker(redis_client, 'partner')
+partner_limiter = AdaptiveConcurrencyLimiter(redis_client, 'partner')
+partner_retry_budget = RetryBudget(redis_client, 'partner')
+
+# Status of each transaction, read by the status endpoints
+status_store = StatusStore(redis_client)
+
 # Partner system configuration
 PARTNER_ACTIVATION_URL = os.environ.get('EXTERNAL_ACTIVATION_URL', 'http://web:8000/api/v1/partner/activate')
 PARTNER_VALIDATION_URL = os.environ.get('PARTNER_VALIDATION_URL', 'http://web:8000/api/v1/partner/validate')
 PARTNER_API_KEY = os.environ.get('PARTNER_API_KEY', 'partner-api-key')
-PARTNER_SYSTEM_TIMEOUT = int(os.environ.get('PARTNER_SYSTEM_TIMEOUT', '30'))  # seconds
 
 
-@shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3})
-def process_activation(self, transaction_id):
+@shared_task(bind=True, max_retries=None)
+def process_activation(self, transaction_id, attempt=1, deferrals=0):
     """
     Process the activation of an offer in the background by calling the partner API.
-    Implements retry mechanism with exponential backoff for failed requests.
+    Transient partner failures are retried with jittered exponential backoff,
+    within the cluster-wide retry budget; other failures are final.
+    While the partner circuit is open or the concurrency limit is reached, the
+    task is deferred instead of waiting on the partner system.
+    
+    Args:
+        transaction_id (str): The transaction to activate
+        attempt (int): Number of the partner call about to be made
+        deferrals (int): Number of times the task was deferred
     """
     try:
-        logger.info(f"Starting activation process for transaction {transaction_id}")
-        
-        # Get the transaction
-        transaction = Transaction.objects.get(transaction_id=transaction_id)
-        logger.info(f"Retrieved transaction {transaction_id} for user {transaction.user.id}, offer {transaction.offer.id}")
-        
-        # Update status to PROCESSING
-        transaction.status = 'PROCESSING'
-        transaction.save()
-        logger.info(f"Updated transaction {transaction_id} status to PROCESSING")
-        
-        # Update Redis with PROCESSING status
-        redis_client.hset(f"transaction:{transaction_id}", mapping={
-            'status': 'PROCESSING',
-            'updated_at': str(timezone.now())
-        })
-        logger.info(f"Updated Redis status for transaction {transaction_id} to PROCESSING")
-        
-        # Call partner system for activation
-        logger.info(f"Calling partner system for transaction {transaction_id}")
-        activation_result = activate_offer_with_partner(transaction)
-        logger.info(f"Partner system response for transaction {transaction_id}: {activation_result}")
-        
-        if activation_result.get('success', False):
-            logger.info(f"Activation successful for transaction {transaction_id}")
-            # Success case
-            transaction.status = 'SUCCESS'
-            transaction.completed_at = timezone.now()
-            transaction.save()
-            logger.info(f"Updated transaction {transaction_id} status to SUCCESS in database")
-            
-            # Update Redis with SUCCESS status
-            redis_client.hset(f"transaction:{transaction_id}", mapping={
-                'status': 'SUCCESS',
-                'updated_at': str(timezone.now()),
-                'reference': activation_result.get('reference', '')
-            })
-            logger.info(f"Updated Redis status for transaction {transaction_id} to SUCCESS")
-            
-            # Activate the user offer
-            try:
-                user_offer = UserOffer.objects.get(transaction_id=transaction_id)
-                user_offer.is_active = True
-                user_offer.save()
-                logger.info(f"Activated user offer for transaction {transaction_id}")
-            except UserOffer.DoesNotExist:
-                logger.error(f"UserOffer not found for transaction {transaction_id}")
-            
-            # Send notification to user
-            send_notification(
-                transaction.user.email,
-                "Offer Activation Successful",
-                f"Your offer {transaction.offer.name} has been successfully activated. "
-                f"Reference: {activation_result.get('reference', 'N/A')}"
+        slot = acquire_partner_slot()
+        if slot is None:
+            if deferrals >= settings.PARTNER_MAX_DEFERRALS:
+                logger.error(f"Partner system unavailable, giving up on transaction {transaction_id}")
+                transaction = Transaction.objects.select_related('user', 'offer').get(transaction_id=transaction_id)
+                complete_activation(transaction, {
+                    'success': False,
+                    'error': 'Partner activation system unavailable'
+                })
+                return f"Activation processed with status: {transaction.status}"
+            logger.warning(f"Partner system unavailable or saturated, deferring transaction {transaction_id}")
+            raise self.retry(
+                countdown=settings.PARTNER_DEFER_COUNTDOWN,
+                kwargs={'attempt': attempt, 'deferrals': deferrals + 1}
             )
-            logger.info(f"Sent success notification for transaction {transaction_id}")
-        else:
-            logger.warning(f"Activation failed for transaction {transaction_id}: {activation_result.get('error', 'Unknown error')}")
-            # Failure case
-            transaction.status = 'FAILED'
-            transaction.completed_at = timezone.now()
-            transaction.save()
-            logger.info(f"Updated transaction {transaction_id} status to FAILED in database")
-            
-            # Update Redis with FAILED status
-            redis_client.hset(f"transaction:{transaction_id}", mapping={
-                'status': 'FAILED',
-                'updated_at': str(timezone.now()),
-                'error_message': activation_result.get('error', 'Unknown error')
-            })
-            logger.info(f"Updated Redis status for transaction {transaction_id} to FAILED")
-            
-            # Refund the user
-            from account.models import Account
-            account, created = Account.objects.get_or_create(user=transaction.user)
-            account.balance += transaction.amount
-            account.save()
-            logger.info(f"Refunded {transaction.amount} to user {transaction.user.id} for failed transaction {transaction_id}")
+        
+        activation_result = None
+        started = time.monotonic()
+        try:
+            transaction = begin_activation(transaction_id, resume=attempt > 1)
+            if transaction is None:
+                return f"Transaction {transaction_id} already processed"
+            if attempt == 1:
+                partner_retry_budget.record_attempt()
             
-            # Send notification to user
-            send_notification(
-                transaction.user.email,
-                "Offer Activation Failed",
-                f"Your offer {transaction.offer.name} activation failed. Amount has been refunded. "
-                f"Error: {activation_result.get('error', 'Unknown error')}"
+            # Call partner system for activation
+            logger.info(f"Calling partner system for transaction {transaction_id} (attempt {attempt})")
+            activation_result = activate_offer_with_partner(transaction)
+            logger.info(f"Partner system response for transaction {transaction_id}: {activation_result}")
+        finally:
+            release_partner_slot(slot, activation_result, time.monotonic() - started)
+        
+        if should_retry_activation(activation_result, attempt):
+            countdown = backoff_delay(attempt)
+            logger.warning(f"Retrying transaction {transaction_id} in {countdown:.2f}s: {activation_result['error']}")
+            raise self.retry(
+                countdown=countdown,
+                kwargs={'attempt': attempt + 1, 'deferrals': deferrals}
             )
-            logger.info(f"Sent failure notification for transaction {transaction_id}")
-            
-        logger.info(f"Completed activation process for transaction {transaction_id} with status: {transaction.status}")
+        
+        complete_activation(transaction, activation_result)
         return f"Activation processed with status: {transaction.status}"
         
+    except Retry:
+        raise
     except Transaction.DoesNotExist:
         logger.error(f"Transaction {transaction_id} not found")
         # Update Redis with FAILED status
-        redis_client.hset(f"transaction:{transaction_id}", mapping={
+        publish_status(transaction_id, {
             'status': 'FAILED',
             'updated_at': str(timezone.now()),
             'error_message': 'Transaction not found'
@@ -139,25 +115,267 @@ def process_activation(self, transaction_id):
         return f"Transaction {transaction_id} not found"
     except Exception as e:
         logger.error(f"Error processing activation {transaction_id}: {str(e)}", exc_info=True)
+        fail_activation(transaction_id, str(e))
+        return f"Error processing activation: {str(e)}"
+
+
+def should_retry_activation(activation_result, attempt):
+    """
+    Decide whether a partner call that was just made should be attempted again.
+    
+    Args:
+        activation_result (dict): Result of the partner call
+        attempt (int): Number of the call that was just made
+        
+    Returns:
+        bool: True if the failure is transient, attempts are left and the
+        retry budget allows it
+    """
+    if not is_retryable(activation_result):
+        return False
+    if attempt > settings.PARTNER_RETRY_MAX:
+        return False
+    return partner_retry_budget.try_spend()
+
+
+def status_channel(transaction_id):
+    """
+    Returns:
+        str: The pub/sub channel the status transitions of a transaction are published on
+    """
+    return status_store.channel(transaction_id)
+
+
+def publish_status(transaction_id, mapping, pipe=None):
+    """
+    Store the status of a transaction in Redis and publish it to the clients
+    streaming it, in a single round trip. Transitions out of a final status
+    are rejected (see StatusStore).
+    
+    Args:
+        transaction_id (str): The transaction whose status changed
+        mapping (dict): The status fields to store
+        pipe (Pipeline): Pipeline to queue the transition on instead of running it
+        
+    Returns:
+        bool: True if the transition was applied, None when pipelined
+    """
+    return status_store.transition(transaction_id, mapping, pipe=pipe)
+
+
+def acquire_partner_slot():
+    """
+    Check the partner circuit breaker and reserve a slot under the adaptive
+    concurrency limit.
+    
+    Returns:
+        dict: The slot ('permit' of the circuit breaker and 'lease' of the
+        limiter) if the partner system may be called now, None otherwise;
+        release_partner_slot must be called with it once the call is over
+    """
+    permit = partner_circuit.allow_request()
+    if not permit:
+        return None
+    lease = partner_limiter.acquire()
+    if lease is None:
+        partner_circuit.record(None, permit)
+        return None
+    return {'permit': permit, 'lease': lease}
+
+
+def release_partner_slot(slot, activation_result, latency):
+    """
+    Free the slot reserved by acquire_partner_slot and feed the outcome of the
+    call to the circuit breaker and the concurrency limiter.
+    
+    Args:
+        slot (dict): The slot returned by acquire_partner_slot
+        activation_result (dict): Result of the partner call, None if it was not made
+        latency (float): Duration of the call in seconds
+    """
+    if activation_result is None:
+        partner_limiter.release(slot['lease'])
+        partner_circuit.record(None, slot['permit'])
+        return
+    healthy = (
+        not activation_result.get('partner_unavailable', False)
+        and latency < settings.PARTNER_SLOW_CALL_THRESHOLD
+    )
+    partner_limiter.release(slot['lease'], healthy)
+    partner_circuit.record(healthy, slot['permit'])
+
+
+def begin_activation(transaction_id, resume=False):
+    """
+    Claim a pending transaction and mark it as PROCESSING in the database and Redis.
+    
+    The claim is a conditional UPDATE, so of duplicate dispatches (the outbox
+    relay delivers at least once, the async worker re-queues the ids of dead
+    workers) only one processes the transaction. A PROCESSING transaction is
+    claimed again once ACTIVATION_PROCESSING_LEASE seconds passed without an
+    update, when its worker died mid-activation.
+    
+    Args:
+        transaction_id (str): The transaction to process
+        resume (bool): True when the task that claimed the transaction retries it
+        
+    Returns:
+        Transaction: The transaction being processed, None if it already
+        completed or another worker is processing it
+    """
+    logger.info(f"Starting activation process for transaction {transaction_id}")
+    
+    now = timezone.now()
+    claimable = Q(status='PENDING')
+    if resume:
+        claimable |= Q(status='PROCESSING')
+    else:
+        claimable |= Q(status='PROCESSING', updated_at__lt=now - timedelta(seconds=settings.ACTIVATION_PROCESSING_LEASE))
+    claimed = Transaction.objects.filter(claimable, transaction_id=transaction_id).update(
+        status='PROCESSING',
+        updated_at=now
+    )
+    
+    # User and offer are needed for the partner call and the notification
+    transaction = Transaction.objects.select_related('user', 'offer').get(transaction_id=transaction_id)
+    if not claimed:
+        logger.warning(f"Transaction {transaction_id} is {transaction.status} and not claimable, skipping duplicate activation")
+        return None
+    logger.info(f"Updated transaction {transaction_id} status to PROCESSING for user {transaction.user_id}, offer {transaction.offer_id}")
+    
+    # Update Redis with PROCESSING status
+    publish_status(transaction_id, {
+        'status': 'PROCESSING',
+        'updated_at': str(now)
+    })
+    logger.info(f"Updated Redis status for transaction {transaction_id} to PROCESSING")
+    return transaction
+
+
+def finish_transaction(transaction, status):
+    """
+    Move a transaction that is still PENDING or PROCESSING to a final status,
+    with a conditional UPDATE so that only one of concurrent or duplicate
+    tasks finishes it.
+    
+    Args:
+        transaction (Transaction): The transaction being processed
+        status (str): SUCCESS or FAILED
+        
+    Returns:
+        bool: True if this call finished the transaction, False if it
+        already was final
+    """
+    now = timezone.now()
+    finished = Transaction.objects.filter(
+        pk=transaction.pk,
+        status__in=('PENDING', 'PROCESSING')
+    ).update(status=status, completed_at=now, updated_at=now)
+    if finished:
+        transaction.status = status
+        transaction.completed_at = now
+    return bool(finished)
+
+
+def complete_activation(transaction, activation_result):
+    """
+    Record the outcome of the partner activation: activate the user offer on
+    success, refund the user on failure, and notify the user in both cases.
+    A transaction that is already final is left as it is, without refund,
+    notification or webhook, so duplicate tasks are harmless.
+    
+    Args:
+        transaction (Transaction): The transaction being processed
+        activation_result (dict): Result returned by activate_offer_with_partner
+    """
+    transaction_id = transaction.transaction_id
+    status = 'SUCCESS' if activation_result.get('success', False) else 'FAILED'
+    if not finish_transaction(transaction, status):
+        logger.warning(f"Transaction {transaction_id} is already final, ignoring {status} outcome")
+        return
+    
+    if status == 'SUCCESS':
+        logger.info(f"Activation successful for transaction {transaction_id}")
+        logger.info(f"Updated transaction {transaction_id} status to SUCCESS in database")
+        
+        # Update Redis with SUCCESS status
+        publish_status(transaction_id, {
+            'status': 'SUCCESS',
+            'updated_at': str(timezone.now()),
+            'reference': activation_result.get('reference', '')
+        })
+        logger.info(f"Updated Redis status for transaction {transaction_id} to SUCCESS")
+        
+        # Activate the user offer
+        if UserOffer.objects.filter(transaction_id=transaction_id).update(is_active=True):
+            logger.info(f"Activated user offer for transaction {transaction_id}")
+        else:
+            logger.error(f"UserOffer not found for transaction {transaction_id}")
+        
+        # Notify the user, sent in the background by deliver_notifications
+        enqueue_notification(
+            transaction.user.email,
+            "Offer Activation Successful",
+            f"Your offer {transaction.offer.name} has been successfully activated. "
+            f"Reference: {activation_result.get('reference', 'N/A')}"
+        )
+        logger.info(f"Queued success notification for transaction {transaction_id}")
+    else:
+        logger.warning(f"Activation failed for transaction {transaction_id}: {activation_result.get('error', 'Unknown error')}")
+        logger.info(f"Updated transaction {transaction_id} status to FAILED in database")
+        
         # Update Redis with FAILED status
-        redis_client.hset(f"transaction:{transaction_id}", mapping={
+        publish_status(transaction_id, {
             'status': 'FAILED',
             'updated_at': str(timezone.now()),
-            'error_message': str(e)
+            'error_message': activation_result.get('error', 'Unknown error')
         })
-        logger.info(f"Updated Redis status for transaction {transaction_id} to FAILED due to exception")
+        logger.info(f"Updated Redis status for transaction {transaction_id} to FAILED")
         
-        # Update transaction status to FAILED in case of exception
-        try:
-            transaction = Transaction.objects.get(transaction_id=transaction_id)
-            transaction.status = 'FAILED'
-            transaction.completed_at = timezone.now()
-            transaction.save()
-            logger.info(f"Updated transaction {transaction_id} status to FAILED in database due to exception")
-        except Transaction.DoesNotExist:
-            logger.error(f"Transaction {transaction_id} not found during exception handling")
-            pass
-        return f"Error processing activation: {str(e)}"
+        # Refund the user
+        credit_balance(transaction.user, transaction.amount)
+        logger.info(f"Refunded {transaction.amount} to user {transaction.user.id} for failed transaction {transaction_id}")
+        
+        # Notify the user, sent in the background by deliver_notifications
+        enqueue_notification(
+            transaction.user.email,
+            "Offer Activation Failed",
+            f"Your offer {transaction.offer.name} activation failed. Amount has been refunded. "
+            f"Error: {activation_result.get('error', 'Unknown error')}"
+        )
+        logger.info(f"Queued failure notification for transaction {transaction_id}")
+        
+    enqueue_activation_event(transaction, activation_result)
+    logger.info(f"Completed activation process for transaction {transaction_id} with status: {transaction.status}")
+
+
+def fail_activation(transaction_id, error_message):
+    """
+    Mark a transaction as FAILED in Redis and the database after an unexpected error.
+    """
+    # Update Redis with FAILED status
+    publish_status(transaction_id, {
+        'status': 'FAILED',
+        'updated_at': str(timezone.now()),
+        'error_message': error_message
+    })
+    logger.info(f"Updated Redis status for transaction {transaction_id} to FAILED due to exception")
+    
+    # Update transaction status to FAILED in case of exception, unless it already is final
+    updated = Transaction.objects.filter(
+        transaction_id=transaction_id,
+        status__in=('PENDING', 'PROCESSING')
+    ).update(
+        status='FAILED',
+        completed_at=timezone.now(),
+        updated_at=timezone.now()
+    )
+    if updated:
+        logger.info(f"Updated transaction {transaction_id} status to FAILED in database due to exception")
+        transaction = Transaction.objects.get(transaction_id=transaction_id)
+        enqueue_activation_event(transaction, {'success': False, 'error': error_message})
+    else:
+        logger.error(f"Transaction {transaction_id} not found or already final during exception handling")
 
 
 def activate_offer_with_partner(transaction):
@@ -172,98 +390,44 @@ def activate_offer_with_partner(transaction):
     """
     try:
         logger.info(f"Preparing to call partner system for transaction {transaction.transaction_id}")
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'Offers-API/1.0'
-        }
         
         # Prepare data for partner system
-        activation_data = {
-            'user_id': transaction.user.id,
-            'offer_id': transaction.offer.id,
-            'amount': float(transaction.amount),
-        }
+        activation_data = build_activation_data(transaction)
         logger.info(f"Prepared activation data for transaction {transaction.transaction_id}: {activation_data}")
         
         # Make request to partner system
         url = f"{PARTNER_ACTIVATION_URL}/"
         logger.info(f"Making POST request to {url} for transaction {transaction.transaction_id}")
-        # logger.info(f"Full URL: {url}")
-        # logger.info(f"PARTNER_ACTIVATION_URL: {PARTNER_ACTIVATION_URL}")
-        # logger.info(f"Activation data: {activation_data}")
-        # logger.info(f"Headers: {headers}")
-        response = requests.post(
-            url,
-            headers=headers,
-            json=activation_data,
-            timeout=PARTNER_SYSTEM_TIMEOUT
-        )
-        logger.info(f"Received response with status {response.status_code} for transaction {transaction.transaction_id}")
-        if response.status_code != 201:
-            logger.error(f"Error response content: {response.text}")
+        response = partner_client.post(url, json=activation_data)
         
-        # Check if request was successful
-        if response.status_code == 201:
-            try:
-                result = response.json()
-                logger.info(f"Successfully parsed JSON response for transaction {transaction.transaction_id}: {result}")
-                reference = result.get('reference')
-                
-                # Validate the reference
-                if reference and validate_partner_transaction(reference):
-                    logger.info(f"Reference {reference} validated successfully for transaction {transaction.transaction_id}")
-                    return {
-                        'success': True,
-                        'reference': reference,
-                        'data': result
-                    }
-                else:
-                    logger.warning(f"Invalid reference received from partner system for transaction {transaction.transaction_id}")
-                    return {
-                        'success': False,
-                        'error': 'Invalid reference received from partner system'
-                    }
-            except json.JSONDecodeError:
-                # Handle case where response is not JSON
-                logger.error(f"Invalid JSON response from partner system for transaction {transaction.transaction_id}")
-                return {
-                    'success': False,
-                    'error': 'Invalid response format from partner system'
-                }
-        else:
-            # Handle HTTP error responses
-            try:
-                error_data = response.json()
-                logger.error(f"Partner system error for transaction {transaction.transaction_id}: {response.status_code} - {error_data}")
-                return {
-                    'success': False,
-                    'error': f"Partner system error: {response.status_code} - {error_data.get('error', 'Unknown error')}"
-                }
-            except json.JSONDecodeError:
-                # Handle case where error response is not JSON
-                logger.error(f"Partner system error with non-JSON response for transaction {transaction.transaction_id}: {response.status_code} - {response.text}")
-                return {
-                    'success': False,
-                    'error': f"Partner system error: {response.status_code} - {response.text}"
-                }
+        result = parse_activation_response(transaction, response)
+        if 'error' in result:
+            return result
+        
+        # Validate the reference
+        is_valid = check_partner_reference(transaction, result)
+        return validated_activation_result(transaction, result, is_valid)
                 
     except Timeout:
         logger.error(f"Timeout calling partner system for transaction {transaction.transaction_id}")
         return {
             'success': False,
-            'error': 'Timeout calling partner activation system'
+            'error': 'Timeout calling partner activation system',
+            'partner_unavailable': True
         }
     except ConnectionError:
         logger.error(f"Connection error calling partner system for transaction {transaction.transaction_id}")
         return {
             'success': False,
-            'error': 'Connection error with partner activation system'
+            'error': 'Connection error with partner activation system',
+            'partner_unavailable': True
         }
     except RequestException as e:
         logger.error(f"Request error calling partner system for transaction {transaction.transaction_id}: {str(e)}")
         return {
             'success': False,
-            'error': f'Request error: {str(e)}'
+            'error': f'Request error: {str(e)}',
+            'partner_unavailable': True
         }
     except Exception as e:
         logger.error(f"Unexpected error calling partner system for transaction {transaction.transaction_id}: {str(e)}", exc_info=True)
@@ -273,6 +437,128 @@ def activate_offer_with_partner(transaction):
         }
 
 
+def build_activation_data(transaction):
+    """
+    Build the payload sent to the partner system to activate a transaction.
+    """
+    return {
+        'user_id': transaction.user.id,
+        'offer_id': transaction.offer.id,
+        'amount': float(transaction.amount),
+    }
+
+
+def parse_activation_response(transaction, response):
+    """
+    Interpret the partner response to an activation request.
+    
+    Args:
+        transaction (Transaction): The transaction being activated
+        response: The HTTP response of the partner system
+        
+    Returns:
+        dict: The reference to validate and the partner data, or a failed
+        activation result holding an error message
+    """
+    logger.info(f"Received response with status {response.status_code} for transaction {transaction.transaction_id}")
+    if response.status_code != 201:
+        logger.error(f"Error response content: {response.text}")
+    
+    # Check if request was successful
+    if response.status_code == 201:
+        try:
+            result = response.json()
+            logger.info(f"Successfully parsed JSON response for transaction {transaction.transaction_id}: {result}")
+        except json.JSONDecodeError:
+            # Handle case where response is not JSON
+            logger.error(f"Invalid JSON response from partner system for transaction {transaction.transaction_id}")
+            return {
+                'success': False,
+                'error': 'Invalid response format from partner system'
+            }
+        
+        reference = result.get('reference')
+        if not reference:
+            return validated_activation_result(transaction, result, False)
+        return {
+            'reference': reference,
+            'data': result
+        }
+    else:
+        # Handle HTTP error responses
+        try:
+            error_data = response.json()
+            logger.error(f"Partner system error for transaction {transaction.transaction_id}: {response.status_code} - {error_data}")
+            result = {
+                'success': False,
+                'error': f"Partner system error: {response.status_code} - {error_data.get('error', 'Unknown error')}"
+            }
+        except json.JSONDecodeError:
+            # Handle case where error response is not JSON
+            logger.error(f"Partner system error with non-JSON response for transaction {transaction.transaction_id}: {response.status_code} - {response.text}")
+            result = {
+                'success': False,
+                'error': f"Partner system error: {response.status_code} - {response.text}"
+            }
+        # Server errors and rate limiting are transient
+        if response.status_code >= 500 or response.status_code == 429:
+            result['partner_unavailable'] = True
+        return result
+
+
+def validated_activation_result(transaction, result, is_valid):
+    """
+    Build the final activation result once the partner reference has been validated.
+    """
+    if is_valid:
+        logger.info(f"Reference {result['reference']} validated successfully for transaction {transaction.transaction_id}")
+        return {
+            'success': True,
+            'reference': result['reference'],
+            'data': result.get('data', result)
+        }
+    logger.warning(f"Invalid reference received from partner system for transaction {transaction.transaction_id}")
+    return {
+        'success': False,
+        'error': 'Invalid reference received from partner system'
+    }
+
+
+def check_partner_reference(transaction, result):
+    """
+    Decide whether the reference returned by the partner system is valid.
+    In 'signed' mode a correctly signed activation response is trusted as is,
+    otherwise the reference is validated with the partner system. A Celery
+    task activates one transaction at a time, so 'batch' mode validates each
+    reference here; only the async worker coalesces them into bulk calls.
+    
+    Args:
+        transaction (Transaction): The transaction being activated
+        result (dict): The reference and partner data from parse_activation_response
+        
+    Returns:
+        bool: True if the reference is valid
+    """
+    if settings.PARTNER_VALIDATION_MODE == 'signed' and has_valid_signature(transaction, result):
+        logger.info(f"Reference {result['reference']} is signed, skipping validation for transaction {transaction.transaction_id}")
+        return True
+    return validate_partner_transaction(result['reference'])
+
+
+def has_valid_signature(transaction, result):
+    """
+    Check the partner signature of an activation response against the request sent.
+    """
+    activation_data = build_activation_data(transaction)
+    return verify_activation_signature(
+        result['data'].get('signature'),
+        result['reference'],
+        activation_data['user_id'],
+        activation_data['offer_id'],
+        activation_data['amount']
+    )
+
+
 def validate_partner_transaction(reference):
     """
     Validate a partner transaction by reference number.
@@ -285,96 +571,209 @@ def validate_partner_transaction(reference):
     """
     try:
         logger.info(f"Validating partner transaction with reference {reference}")
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'Offers-API/1.0'
-        }
         
         # Make request to validate the reference
         validation_url = f"{PARTNER_VALIDATION_URL}/{reference}/"
         logger.info(f"Making GET request to {validation_url}")
-        # logger.info(f"Full validation URL: {validation_url}")
-        # logger.info(f"PARTNER_VALIDATION_URL: {PARTNER_VALIDATION_URL}")
-        # logger.info(f"Reference: {reference}")
-        # logger.info(f"Headers: {headers}")
-        response = requests.get(
-            validation_url,
-            headers=headers,
-            timeout=PARTNER_SYSTEM_TIMEOUT
-        )
-        logger.info(f"Received validation response with status {response.status_code} for reference {reference}")
-        logger.info(f"Response content: {response.text}")
-        if response.status_code != 200:
-            logger.error(f"Error validating response content: {response.text}")
-        
-        # Check if request was successful
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                logger.info(f"Validation response for reference {reference}: {result}")
-                is_valid = result.get('is_valid', False)
-                logger.info(f"Reference {reference} validation result: {is_valid}")
-                return is_valid
-            except json.JSONDecodeError:
-                logger.error(f"Invalid JSON response when validating reference {reference}")
-                return False
-        else:
-            logger.error(f"Error validating reference {reference}: {response.status_code}")
-            return False
+        response = partner_client.get(validation_url)
+        return parse_validation_response(reference, response)
                 
     except Exception as e:
         logger.error(f"Error validating partner transaction {reference}: {str(e)}", exc_info=True)
         return False
 
 
-def send_notification(email, subject, message):
+def parse_validation_response(reference, response):
     """
-    Send notification email to user.
-    In a real implementation, this would also send SMS.
+    Interpret the partner response to a validation request.
+    
+    Returns:
+        bool: True if the partner reports the reference as valid
     """
+    logger.info(f"Received validation response with status {response.status_code} for reference {reference}")
+    logger.info(f"Response content: {response.text}")
+    if response.status_code != 200:
+        logger.error(f"Error validating reference {reference}: {response.status_code}")
+        return False
+    
     try:
-        logger.info(f"Sending notification to {email} with subject '{subject}'")
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL or 'noreply@offersapi.com',
-            [email],
-            fail_silently=True,
-        )
-        logger.info(f"Successfully sent notification to {email}")
-    except Exception as e:
-        logger.error(f"Failed to send notification to {email}: {str(e)}", exc_info=True)
+        result = response.json()
+    except json.JSONDecodeError:
+        logger.error(f"Invalid JSON response when validating reference {reference}")
+        return False
+    
+    is_valid = result.get('is_valid', False)
+    logger.info(f"Reference {reference} validation result: {is_valid}")
+    return is_valid
+
+
+def parse_bulk_validation_response(references, response):
+    """
+    Interpret the partner response to a bulk validation request, sent by the
+    async worker in 'batch' mode.
+    
+    Returns:
+        dict: Validation result for each reference, False when unknown
+    """
+    logger.info(f"Received bulk validation response with status {response.status_code} for {len(references)} references")
+    results = {}
+    if response.status_code == 200:
+        try:
+            results = response.json().get('results', {})
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON response when validating {len(references)} references")
+    else:
+        logger.error(f"Error validating {len(references)} references: {response.status_code} - {response.text}")
+    return {reference: bool(results.get(reference, False)) for reference in references}
+
+
+def expiry_checkpoint_key(run_id):
+    return f"expiring_offers:{run_id}"
 
 
 @shared_task
-def check_expiring_offers():
+def check_expiring_offers(run_id=None):
     """
-    Task to check for expiring offers and notify users.
+    Notify users whose offers expire within EXPIRY_NOTICE_DAYS, with one
+    message per user listing all of their expiring offers.
     This would be scheduled to run daily.
+    
+    Expiring offers are streamed in keyset ranges of EXPIRY_SCAN_RANGE user
+    ids, grouped per user and handed to send_expiry_notifications tasks in
+    batches of EXPIRY_NOTIFY_BATCH_SIZE users. The last user handed over is
+    recorded in Redis after every batch: started again with the same run_id,
+    a run that crashed resumes from there, and a completed run does nothing.
+    
+    Args:
+        run_id (str): Identifies the run, today's date by default
     """
-    logger.info("Starting check for expiring offers")
-    from datetime import datetime, timedelta
-    from django.contrib.auth.models import User
+    run_id = run_id or str(timezone.localdate())
+    key = expiry_checkpoint_key(run_id)
+    checkpoint = redis_client.hgetall(key)
+    if checkpoint.get('done'):
+        logger.info(f"Expiring offers run {run_id} already completed")
+        return f"Expiring offers run {run_id} already completed"
     
-    # Get offers that will expire in the next 3 days
-    threshold_date = datetime.now() + timedelta(days=3)
+    if checkpoint:
+        # Same window as the interrupted run, so resumed users are not skipped
+        window_start = datetime.fromisoformat(checkpoint['window_start'])
+        window_end = datetime.fromisoformat(checkpoint['window_end'])
+        cursor = int(checkpoint['cursor'])
+        logger.info(f"Resuming expiring offers run {run_id} after user {cursor}")
+    else:
+        window_start = timezone.now()
+        window_end = window_start + timedelta(days=settings.EXPIRY_NOTICE_DAYS)
+        cursor = 0
+        with pipeline() as pipe:
+            pipe.hset(key, mapping={
+                'window_start': window_start.isoformat(),
+                'window_end': window_end.isoformat(),
+                'cursor': cursor,
+                'users': 0
+            })
+            pipe.expire(key, settings.EXPIRY_CHECKPOINT_TTL)
+        logger.info(f"Starting expiring offers run {run_id}")
     
     expiring_offers = UserOffer.objects.filter(
         is_active=True,
-        expiration_date__lte=threshold_date,
-        expiration_date__gte=datetime.now()
-    ).select_related('user', 'offer')
-    
-    logger.info(f"Found {expiring_offers.count()} expiring offers")
-    
-    for user_offer in expiring_offers:
-        logger.info(f"Sending expiration notification to user {user_offer.user.id} for offer {user_offer.offer.id}")
-        send_notification(
-            user_offer.user.email,
-            "Offer Expiring Soon",
-            f"Your offer {user_offer.offer.name} will expire on {user_offer.expiration_date}. "
-            f"Renew it now to continue enjoying the service."
-        )
+        expiration_date__gte=window_start,
+        expiration_date__lte=window_end
+    )
+    last_user_id = expiring_offers.aggregate(last=Max('user_id'))['last'] or 0
     
-    logger.info(f"Completed check for expiring offers. Notified {expiring_offers.count()} users")
-    return f"Notified {expiring_offers.count()} users about expiring offers"
\ No newline at end of file
+    users = 0
+    while cursor < last_user_id:
+        range_end = min(cursor + settings.EXPIRY_SCAN_RANGE, last_user_id)
+        rows = expiring_offers.filter(
+            user_id__gt=cursor,
+            user_id__lte=range_end
+        ).order_by('user_id', 'expiration_date').values_list(
+            'user_id', 'user__email', 'offer__name', 'expiration_date'
+        ).iterator(chunk_size=settings.EXPIRY_SCAN_CHUNK_SIZE)
+        
+        batch = []
+        for user_id, user_rows in groupby(rows, key=itemgetter(0)):
+            user_rows = list(user_rows)
+            batch.append({
+                'email': user_rows[0][1],
+                'offers': [[name, str(expiration_date)] for _, _, name, expiration_date in user_rows]
+            })
+            if len(batch) >= settings.EXPIRY_NOTIFY_BATCH_SIZE:
+                users += dispatch_expiry_notifications(key, batch, cursor=user_id)
+                batch = []
+        # Rest of the range, every user up to range_end is then handed over
+        users += dispatch_expiry_notifications(key, batch, cursor=range_end)
+        cursor = range_end
+    
+    redis_client.hset(key, 'done', 1)
+    logger.info(f"Completed expiring offers run {run_id}. Notified {users} users")
+    return f"Notified {users} users about expiring offers"
+
+
+def dispatch_expiry_notifications(key, batch, cursor):
+    """
+    Queue the notifications of a batch of users, then move the checkpoint.
+    A crash in between sends the batch again on resume (at least once).
+    
+    Args:
+        key (str): The checkpoint of the run
+        batch (list): Notifications built by check_expiring_offers
+        cursor (int): Id of the last user of the batch
+        
+    Returns:
+        int: Number of users in the batch
+    """
+    if batch:
+        send_expiry_notifications.delay(batch)
+    with pipeline() as pipe:
+        pipe.hset(key, 'cursor', cursor)
+        pipe.hincrby(key, 'users', len(batch))
+    return len(batch)
+
+
+@shared_task
+def send_expiry_notifications(notifications):
+    """
+    Send the expiration notices of a batch of users over a single mail
+    connection.
+    
+    Args:
+        notifications (list): One {'email', 'offers': [[name, expiration_date]]} per user
+        
+    Returns:
+        int: Number of messages sent
+    """
+    messages = []
+    for notification in notifications:
+        offers = notification['offers']
+        if len(offers) == 1:
+            subject = "Offer Expiring Soon"
+            body = (
+                f"Your offer {offers[0][0]} will expire on {offers[0][1]}. "
+                f"Renew it now to continue enjoying the service."
+            )
+        else:
+            subject = f"{len(offers)} Offers Expiring Soon"
+            lines = "\n".join(f"- {name} will expire on {expiration_date}" for name, expiration_date in offers)
+            body = f"Your offers are about to expire:\n{lines}\nRenew them now to continue enjoying the service."
+        messages.append(EmailMessage(
+            subject,
+            body,
+            settings.DEFAULT_FROM_EMAIL or 'noreply@offersapi.com',
+            [notification['email']]
+        ))
+    
+    sent = send_email_batch(messages)
+    logger.info(f"Sent {sent} of {len(messages)} expiration notices")
+    return sent
+
+
+@shared_task
+def purge_idempotency_keys():
+    """
+    Delete the idempotency keys older than IDEMPOTENCY_KEY_TTL, scheduled daily.
+    
+    Returns:
+        int: Number of keys deleted
+    """
+    return purge_expired_keys()
@@ -3,5 +3,10 @@ from . import views
 
 urlpatterns = [
     path('', views.activate_offer, name='activate_offer'),
+    path('batch/', views.batch_activate_offers, name='batch_activate_offers'),
+    path('metrics/', views.activation_metrics, name='activation_metrics'),
+    path('webhooks/', views.webhook_endpoints, name='webhook_endpoints'),
+    path('webhooks/<int:endpoint_id>/', views.delete_webhook_endpoint, name='delete_webhook_endpoint'),
     path('status/<str:transaction_id>/', views.activation_status, name='activation_status'),
+    path('status/<str:transaction_id>/stream/', views.activation_status_stream, name='activation_status_stream'),
 ]
\ No newline at end of file
@@ -1,33 +1,38 @@
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
-import uuid
-from datetime import datetime, timedelta
-from celery import current_task
-from .tasks import process_activation
-from offers.models import Offer, UserOffer
-from account.models import Account, Transaction
+from django.http import StreamingHttpResponse
+from django.core.cache import cache
+from django.conf import settings
+from .services import start_activation, start_batch_activation
+from .serializers import BatchActivationSerializer, WebhookEndpointSerializer
+from .models import WebhookEndpoint
+from .webhooks import generate_secret
+from .notifications import get_notification_stats
+from .outbox import get_outbox_stats
+from .idempotency import idempotent
+from . import partner_client
+from .tasks import partner_circuit, partner_limiter, partner_retry_budget, status_store
+from .streaming import EventStreamRenderer, status_events
+from offers.models import Offer
+from offers.tasks import get_sweeper_stats
+from account.models import Transaction
 from account.serializers import TransactionSerializer
-import redis
-import os
+from config.redis_client import redis_client, get_pool_stats, get_stream_client
+from redis.exceptions import ConnectionError as RedisConnectionError
+from config.fastpath import fast_path, dumps
 import logging
 
-# Redis connection
-redis_client = redis.Redis(
-    host=os.environ.get('REDIS_HOST', 'localhost'),
-    port=os.environ.get('REDIS_PORT', '6379'),
-    db=int(os.environ.get('REDIS_DB', '0')),
-    decode_responses=True
-)
 
 logger = logging.getLogger(__name__)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def activate_offer(request):
     """
     Starts the offer activation process for the connected user.
@@ -46,65 +51,18 @@ def activate_offer(request):
     offer = get_object_or_404(Offer, id=offer_id, is_active=True)
     logger.info(f"Found offer {offer_id} for user {request.user.id}")
     
-    # User balance verification
-    account, created = Account.objects.get_or_create(user=request.user)
-    logger.info(f"User {request.user.id} account balance: {account.balance}, offer price: {offer.price}")
+    # Balance debit, transaction and pending user offer in a single unit of work;
+    # the Celery task is queued once it has committed
+    transaction = start_activation(request.user, offer)
     
-    if account.balance < offer.price:
+    if transaction is None:
         logger.warning(f"User {request.user.id} has insufficient balance for offer {offer_id}")
         return Response(
             {'error': 'Insufficient balance'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Deduction of offer cost from balance
-    account.balance -= offer.price
-    account.save()
-    logger.info(f"Deducted {offer.price} from user {request.user.id} account. New balance: {account.balance}")
-    
-    # Generation of a unique transaction_id
-    transaction_id = str(uuid.uuid4())
-    logger.info(f"Generated transaction ID {transaction_id} for user {request.user.id} and offer {offer_id}")
-    
-    # Create transaction with PENDING status
-    transaction = Transaction.objects.create(
-        user=request.user,
-        offer=offer,
-        transaction_id=transaction_id,
-        amount=offer.price,
-        status='PENDING'
-    )
-    logger.info(f"Created transaction record {transaction_id} with PENDING status")
-    
-    # Create a pending user offer
-    expiration_date = datetime.now() + timedelta(days=offer.duration_days)
-    
-    user_offer = UserOffer.objects.create(
-        user=request.user,
-        offer=offer,
-        expiration_date=expiration_date,
-        transaction_id=transaction_id,
-        is_active=False  # Will be activated after processing
-    )
-    logger.info(f"Created user offer record for transaction {transaction_id}")
-    
-    # Store transaction data in Redis using HSET
-    transaction_data = {
-        'transaction_id': transaction_id,
-        'user_id': str(request.user.id),
-        'offer_id': str(offer.id),
-        'amount': str(offer.price),
-        'status': 'PENDING',
-        'created_at': str(timezone.now()),
-        'updated_at': str(timezone.now())
-    }
-    
-    redis_client.hset(f"transaction:{transaction_id}", mapping=transaction_data)
-    logger.info(f"Stored transaction data in Redis for transaction {transaction_id}")
-    
-    # Sending a task to a Celery worker via Redis for background processing
-    process_activation.delay(transaction_id)
-    logger.info(f"Queued activation task for transaction {transaction_id}")
+    transaction_id = transaction.transaction_id
     
     # Return an immediate response (202 Accepted) with the transaction_id for tracking
     logger.info(f"Returning 202 Accepted response for transaction {transaction_id}")
@@ -118,6 +76,53 @@ def activate_offer(request):
     )
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def batch_activate_offers(request):
+    """
+    Starts the activation of many offers at once, for bulk provisioning.
+    Accepts a list of (user_id, offer_id) items and returns, per item, the
+    transaction_id to track or the reason it was rejected.
+    """
+    serializer = BatchActivationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = [(item['user_id'], item['offer_id']) for item in serializer.validated_data['items']]
+    logger.info(f"User {request.user.id} requested a batch activation of {len(items)} items")
+    
+    results = start_batch_activation(items)
+    accepted = sum(1 for result in results if 'transaction_id' in result)
+    logger.info(f"Batch activation accepted {accepted} of {len(items)} items")
+    
+    return Response(
+        {
+            'accepted': accepted,
+            'rejected': len(items) - accepted,
+            'results': results
+        },
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+def fast_activation_status(request, user, transaction_id):
+    transaction_data = status_store.get(transaction_id)
+    if not owned_by(transaction_data, user):
+        # The DRF view reads the database
+        return None
+    logger.info(f"User {user.id} requested status for transaction {transaction_id}, found in Redis")
+    return dumps(transaction_data)
+
+
+def owned_by(transaction_data, user):
+    """
+    Tell whether a cached status belongs to the user. Hashes without a
+    user_id, or of another user, are checked against the database instead.
+    """
+    return bool(transaction_data) and transaction_data.get('user_id') == str(user.id)
+
+
+@fast_path(fast_activation_status)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def activation_status(request, transaction_id):
@@ -127,21 +132,122 @@ def activation_status(request, transaction_id):
     logger.info(f"User {request.user.id} requested status for transaction {transaction_id}")
     
     # First try to get status from Redis
-    transaction_data = redis_client.hgetall(f"transaction:{transaction_id}")
+    transaction_data = status_store.get(transaction_id)
     
-    if transaction_data:
+    if owned_by(transaction_data, request.user):
         # Return data from Redis
         logger.info(f"Found transaction {transaction_id} in Redis")
         return Response(transaction_data, status=status.HTTP_200_OK)
     else:
-        # Fallback to database if not found in Redis
+        # Fallback to database if not found in Redis, or not cached for this user
         logger.info(f"Transaction {transaction_id} not found in Redis, checking database")
         transaction = get_object_or_404(
-            Transaction,
+            Transaction.objects.select_related('offer'),
             transaction_id=transaction_id,
             user=request.user
         )
         
         serializer = TransactionSerializer(transaction)
         logger.info(f"Found transaction {transaction_id} in database")
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def activation_status_stream(request, transaction_id):
+    """
+    Stream the status of an activation as Server-Sent Events.
+    
+    The current status is sent right away, then every transition published by
+    the activation worker, until the transaction is SUCCESS or FAILED. One
+    connection replaces the polling of activation_status. Streams hold
+    connections of their own Redis pool; once ACTIVATION_STREAM_MAX_CONNECTIONS
+    are open, the client gets a 503 and polls activation_status instead.
+    """
+    transaction = get_object_or_404(
+        Transaction.objects.select_related('offer'),
+        transaction_id=transaction_id,
+        user=request.user
+    )
+    logger.info(f"User {request.user.id} opened the status stream of transaction {transaction_id}")
+    
+    # Subscribe before reading the current status, so that no transition is missed
+    pubsub = get_stream_client().pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(status_store.channel(transaction_id))
+    except RedisConnectionError as e:
+        pubsub.close()
+        logger.warning(f"Cannot open the status stream of transaction {transaction_id}: {str(e)}")
+        return Response(
+            {'error': 'Too many open status streams, poll the status endpoint instead'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': str(max(1, settings.ACTIVATION_STREAM_RETRY_MS // 1000))}
+        )
+    current = status_store.get(transaction_id) or TransactionSerializer(transaction).data
+    
+    response = StreamingHttpResponse(status_events(pubsub, current), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def webhook_endpoints(request):
+    """
+    List the webhook endpoints of the user, or register a new one. Endpoints
+    receive batched, signed POSTs when the user's activations complete. Only
+    public https URLs are accepted, and the signing secret is only returned
+    when the endpoint is registered.
+    """
+    if request.method == 'POST':
+        serializer = WebhookEndpointSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        endpoint = serializer.save(user=request.user, secret=generate_secret())
+        logger.info(f"User {request.user.id} registered webhook endpoint {endpoint.id}")
+        # The secret is shown once, receivers keep it to check signatures
+        return Response({**serializer.data, 'secret': endpoint.secret}, status=status.HTTP_201_CREATED)
+    
+    endpoints = WebhookEndpoint.objects.filter(user=request.user).order_by('id')
+    serializer = WebhookEndpointSerializer(endpoints, many=True)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def delete_webhook_endpoint(request, endpoint_id):
+    """
+    Unregister a webhook endpoint of the user.
+    """
+    endpoint = get_object_or_404(WebhookEndpoint, pk=endpoint_id, user=request.user)
+    endpoint.delete()
+    logger.info(f"User {request.user.id} deleted webhook endpoint {endpoint_id}")
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def activation_metrics(request):
+    """
+    Report the state of the partner circuit breaker, concurrency limiter,
+    retry budget and HTTP connection pool, the Redis pool and cache tier
+    statistics of the serving process, the last run of the expired offers
+    sweeper, the notification throughput and the backlog of the outbox relay.
+    """
+    return Response(
+        {
+            'partner': {
+                'circuit': partner_circuit.get_state(),
+                'limiter': partner_limiter.get_state(),
+                'retry_budget': partner_retry_budget.get_state(),
+                'pool': partner_client.get_pool_stats()
+            },
+            'redis': get_pool_stats(),
+            'cache': cache.get_stats() if hasattr(cache, 'get_stats') else None,
+            'expiry_sweeper': get_sweeper_stats(),
+            'notifications': get_notification_stats(),
+            'outbox': get_outbox_stats()
+        },
+        status=status.HTTP_200_OK
+    )
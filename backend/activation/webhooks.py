@@ -0,0 +1,347 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from .models import WebhookEndpoint
+from .batch_queue import BatchQueue
+from .circuit_breaker import ConcurrencyLeases
+from .retry import backoff_delay
+from config.redis_client import redis_client, pipeline
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import requests
+import secrets
+import socket
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+def generate_secret():
+    return secrets.token_hex(32)
+
+
+def queue_key(endpoint_id):
+    return f"webhooks:{endpoint_id}:queue"
+
+
+def scheduled_key(endpoint_id):
+    return f"webhooks:{endpoint_id}:scheduled"
+
+
+def in_flight_key(endpoint_id):
+    return f"webhooks:{endpoint_id}:in_flight"
+
+
+def dead_letter_key(endpoint_id):
+    return f"webhooks:{endpoint_id}:dead"
+
+
+def processing_key(endpoint_id, batch_id):
+    return endpoint_queue(endpoint_id).processing_key(batch_id)
+
+
+def batches_key(endpoint_id):
+    """
+    Sorted set of the batches being delivered, scored by the time after
+    which they are considered stalled.
+    """
+    return endpoint_queue(endpoint_id).batches_key
+
+
+def build_event(transaction, activation_result):
+    """
+    Build the webhook event of a completed activation. The event id is stable,
+    so receivers can drop the duplicates of a retried delivery.
+    """
+    data = {
+        'transaction_id': transaction.transaction_id,
+        'status': transaction.status,
+        'offer_id': transaction.offer_id,
+        'amount': str(transaction.amount),
+        'completed_at': transaction.completed_at.isoformat() if transaction.completed_at else None,
+    }
+    if activation_result.get('reference'):
+        data['reference'] = activation_result['reference']
+    if activation_result.get('error'):
+        data['error'] = activation_result['error']
+    return {
+        'id': f"{transaction.transaction_id}:{transaction.status}",
+        'type': f"activation.{transaction.status.lower()}",
+        'created_at': timezone.now().isoformat(),
+        'data': data,
+    }
+
+
+def enqueue_activation_event(transaction, activation_result):
+    """
+    Queue the completion of an activation for the webhook endpoints of its
+    owner. Events are buffered per endpoint in Redis and delivered in batches
+    by deliver_webhooks, so the activation worker never waits on a receiver.
+    
+    Args:
+        transaction (Transaction): The completed transaction
+        activation_result (dict): The outcome of the activation
+    """
+    endpoint_ids = list(
+        WebhookEndpoint.objects.filter(user_id=transaction.user_id, is_active=True).values_list('id', flat=True)
+    )
+    if not endpoint_ids:
+        return
+    
+    payload = json.dumps(build_event(transaction, activation_result))
+    with pipeline() as pipe:
+        for endpoint_id in endpoint_ids:
+            pipe.rpush(queue_key(endpoint_id), payload)
+    
+    for endpoint_id in endpoint_ids:
+        schedule_delivery(endpoint_id)
+    logger.info(f"Queued webhook event for transaction {transaction.transaction_id} to {len(endpoint_ids)} endpoints")
+
+
+def schedule_delivery(endpoint_id):
+    """
+    Schedule a delivery of the queued events of an endpoint in
+    WEBHOOK_BATCH_WINDOW seconds, unless one is already scheduled, so that
+    completions close in time share one POST.
+    """
+    if redis_client.set(scheduled_key(endpoint_id), 1, nx=True, ex=settings.WEBHOOK_BATCH_WINDOW + 60):
+        deliver_webhooks.apply_async((endpoint_id,), countdown=settings.WEBHOOK_BATCH_WINDOW)
+
+
+def endpoint_queue(endpoint_id):
+    """
+    Returns:
+        BatchQueue: The events queued for an endpoint and its batches being delivered
+    """
+    return BatchQueue(redis_client, queue_key(endpoint_id), f"webhooks:{endpoint_id}")
+
+
+def endpoint_leases(endpoint_id):
+    """
+    Returns:
+        ConcurrencyLeases: The POSTs in flight to an endpoint
+    """
+    return ConcurrencyLeases(redis_client, in_flight_key(endpoint_id), settings.WEBHOOK_TIMEOUT * 2 + 10)
+
+
+@shared_task
+def deliver_webhooks(endpoint_id):
+    """
+    Send the queued events of an endpoint, WEBHOOK_BATCH_SIZE events per POST.
+    Draining stops at the first failed batch, which is retried on its own.
+    """
+    # Events queued from now on schedule a new delivery
+    redis_client.delete(scheduled_key(endpoint_id))
+    
+    endpoint = WebhookEndpoint.objects.filter(pk=endpoint_id, is_active=True).first()
+    if endpoint is None:
+        logger.warning(f"Webhook endpoint {endpoint_id} is gone, dropping its queued events")
+        drop_endpoint_events(endpoint_id)
+        return
+    
+    recover_batches(endpoint_id)
+    while True:
+        batch_id = claim_batch(endpoint_id)
+        if batch_id is None:
+            return
+        if not send_webhook_batch(endpoint, batch_id):
+            return
+
+
+@shared_task
+def retry_webhook_batch(endpoint_id, batch_id, attempt):
+    """
+    Send again a batch whose delivery failed or was deferred.
+    """
+    endpoint = WebhookEndpoint.objects.filter(pk=endpoint_id, is_active=True).first()
+    if endpoint is None:
+        logger.warning(f"Webhook endpoint {endpoint_id} is gone, dropping its events")
+        drop_endpoint_events(endpoint_id)
+        return
+    if send_webhook_batch(endpoint, batch_id, attempt) and redis_client.llen(queue_key(endpoint_id)):
+        # The receiver is back, deliver what was queued in the meantime
+        schedule_delivery(endpoint_id)
+
+
+def claim_batch(endpoint_id):
+    """
+    Claim up to WEBHOOK_BATCH_SIZE events of an endpoint. The events stay
+    claimed until the batch is delivered or dead-lettered; a batch whose
+    deadline passes (its worker crashed) is put back in the queue by
+    recover_batches.
+    
+    Returns:
+        str: Id of the batch, None when the queue is empty
+    """
+    return endpoint_queue(endpoint_id).claim(settings.WEBHOOK_BATCH_SIZE, batch_deadline())
+
+
+def batch_deadline(countdown=0):
+    """
+    Returns:
+        float: Seconds a batch may stay in processing before it is recovered
+    """
+    return countdown + settings.WEBHOOK_TIMEOUT * 2 + 60
+
+
+def hold_batch(endpoint_id, batch_id, countdown):
+    """
+    Push back the deadline of a batch that is retried in countdown seconds.
+    """
+    endpoint_queue(endpoint_id).hold(batch_id, batch_deadline(countdown))
+
+
+def recover_batches(endpoint_id):
+    """
+    Put the events of the batches whose deadline passed back at the head of
+    the queue of an endpoint.
+    
+    Returns:
+        int: Number of events recovered
+    """
+    recovered = endpoint_queue(endpoint_id).recover()
+    if recovered:
+        logger.warning(f"Recovered {recovered} webhook events of stalled batches for endpoint {endpoint_id}")
+    return recovered
+
+
+@shared_task
+def recover_webhook_batches():
+    """
+    Put the stalled batches of every endpoint back in its queue and schedule
+    their delivery, so a crashed worker never strands events.
+    """
+    for endpoint_id in WebhookEndpoint.objects.filter(is_active=True).values_list('id', flat=True):
+        if recover_batches(endpoint_id):
+            schedule_delivery(endpoint_id)
+
+
+def drop_endpoint_events(endpoint_id):
+    endpoint_queue(endpoint_id).drop()
+
+
+def send_webhook_batch(endpoint, batch_id, attempt=1):
+    """
+    POST a batch of events to an endpoint, signed with its secret.
+    
+    At most WEBHOOK_MAX_CONCURRENCY batches are sent to an endpoint at a time;
+    batches over the limit are deferred. Failed batches are retried with
+    jittered exponential backoff, then dead-lettered after WEBHOOK_MAX_ATTEMPTS.
+    
+    Args:
+        endpoint (WebhookEndpoint): The receiver
+        batch_id (str): The batch claimed by claim_batch
+        attempt (int): Number of this delivery attempt
+        
+    Returns:
+        bool: True if the receiver accepted the batch
+    """
+    payloads = endpoint_queue(endpoint.id).items(batch_id)
+    if not payloads:
+        logger.warning(f"Webhook batch {batch_id} of endpoint {endpoint.id} was recovered, skipping it")
+        return False
+    
+    # The host may resolve elsewhere than when the endpoint was registered
+    try:
+        check_webhook_url(endpoint.url)
+    except ValueError as e:
+        logger.error(f"Refusing to deliver {len(payloads)} webhook events to endpoint {endpoint.id}: {str(e)}")
+        dead_letter_batch(endpoint.id, batch_id, payloads, str(e))
+        return False
+    
+    leases = endpoint_leases(endpoint.id)
+    lease = leases.acquire(settings.WEBHOOK_MAX_CONCURRENCY)
+    if lease is None:
+        logger.info(f"Webhook endpoint {endpoint.id} is busy, deferring {len(payloads)} events")
+        hold_batch(endpoint.id, batch_id, settings.WEBHOOK_DEFER_COUNTDOWN)
+        retry_webhook_batch.apply_async((endpoint.id, batch_id, attempt), countdown=settings.WEBHOOK_DEFER_COUNTDOWN)
+        return False
+    
+    body = json.dumps({'events': [json.loads(payload) for payload in payloads]})
+    timestamp = str(int(time.time()))
+    try:
+        response = requests.post(
+            endpoint.url,
+            data=body,
+            headers={
+                'Content-Type': 'application/json',
+                'X-Webhook-Signature': f"t={timestamp},v1={webhook_signature(endpoint.secret, timestamp, body)}",
+            },
+            timeout=(settings.PARTNER_CONNECT_TIMEOUT, settings.WEBHOOK_TIMEOUT),
+            # A redirect could point to a host check_webhook_url rejects
+            allow_redirects=False
+        )
+        delivered = 200 <= response.status_code < 300
+        error = f"HTTP {response.status_code}"
+    except requests.RequestException as e:
+        delivered = False
+        error = str(e)
+    finally:
+        leases.release(lease)
+    
+    if delivered:
+        endpoint_queue(endpoint.id).ack(batch_id)
+        logger.info(f"Delivered {len(payloads)} webhook events to endpoint {endpoint.id}")
+        return True
+    
+    if attempt >= settings.WEBHOOK_MAX_ATTEMPTS:
+        logger.error(f"Giving up on {len(payloads)} webhook events for endpoint {endpoint.id} after {attempt} attempts: {error}")
+        dead_letter_batch(endpoint.id, batch_id, payloads, error)
+        return False
+    
+    countdown = backoff_delay(attempt, base=settings.WEBHOOK_RETRY_BACKOFF_BASE, cap=settings.WEBHOOK_RETRY_BACKOFF_CAP)
+    logger.warning(f"Webhook delivery to endpoint {endpoint.id} failed ({error}), retrying in {countdown:.1f}s")
+    hold_batch(endpoint.id, batch_id, countdown)
+    retry_webhook_batch.apply_async((endpoint.id, batch_id, attempt + 1), countdown=countdown)
+    return False
+
+
+def dead_letter_batch(endpoint_id, batch_id, payloads, error):
+    with pipeline() as pipe:
+        pipe.rpush(
+            dead_letter_key(endpoint_id),
+            *[json.dumps({'event': json.loads(payload), 'error': error}) for payload in payloads]
+        )
+        pipe.ltrim(dead_letter_key(endpoint_id), -settings.WEBHOOK_DEAD_LETTER_MAX, -1)
+        endpoint_queue(endpoint_id).ack(batch_id, pipe)
+
+
+def check_webhook_url(url):
+    """
+    Reject webhook URLs the workers must not POST to: anything but https, and
+    hosts resolving to loopback, private, link-local or other non-public
+    addresses (Redis, Postgres, cloud metadata).
+    
+    Raises:
+        ValueError: If the URL is not a public https URL
+    """
+    parsed = urlsplit(url)
+    if parsed.scheme != 'https' or not parsed.hostname:
+        raise ValueError('Webhook URLs must use https')
+    try:
+        addresses = resolve_host(parsed.hostname, parsed.port or 443)
+    except OSError:
+        raise ValueError(f'Cannot resolve {parsed.hostname}')
+    for address in addresses:
+        if not ipaddress.ip_address(address).is_global:
+            raise ValueError(f'{parsed.hostname} resolves to the non-public address {address}')
+
+
+def resolve_host(host, port):
+    """
+    Returns:
+        set: The IP addresses of a host
+    """
+    return {info[4][0].split('%')[0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+
+
+def webhook_signature(secret, timestamp, body):
+    """
+    HMAC-SHA256 of "<timestamp>.<body>" with the endpoint secret, sent as
+    X-Webhook-Signature: t=<timestamp>,v1=<signature>.
+    """
+    return hmac.new(secret.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256).hexdigest()
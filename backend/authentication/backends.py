@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Redis only: a deactivated user must be rejected by every worker at once,
+# which the per-process tier of the default cache would delay
+user_cache = caches['shared']
+
+# Fields kept in the cached record. The password hash is left out, reading
+# it from a cached user loads it from the database.
+CACHED_USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'is_active',
+    'is_staff', 'is_superuser', 'last_login', 'date_joined',
+)
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def cache_user(user):
+    """
+    Store the compact record of a user.
+
+    Args:
+        user (User): The user loaded from the database
+    """
+    record = {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields
+        if field.attname in CACHED_USER_FIELDS
+    }
+    user_cache.set(
+        user_cache_key(getattr(user, api_settings.USER_ID_FIELD)),
+        record,
+        settings.AUTH_USER_CACHE_TTL
+    )
+
+
+def invalidate_user(user):
+    """
+    Drop the cached record of a user, the next request reloads it.
+
+    Args:
+        user (User): The changed user
+    """
+    user_cache.delete(user_cache_key(getattr(user, api_settings.USER_ID_FIELD)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication resolving the user from a record cached in Redis
+    instead of querying auth_user on every request.
+
+    The record is dropped whenever the user is saved or deleted and on
+    logout. The user built from it has the other fields deferred, so saving
+    it only writes the cached fields.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        # Revocation checks compare the password hash, which is not cached
+        if user_id is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        record = user_cache.get(user_cache_key(user_id))
+        if record is None:
+            user = super().get_user(validated_token)
+            cache_user(user)
+            return user
+
+        user = self.user_model.from_db(DEFAULT_DB_ALIAS, list(record), list(record.values()))
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
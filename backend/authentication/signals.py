@@ -0,0 +1,20 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .backends import invalidate_user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the cached record of a user when it changes.
+    
+    The record is dropped right away and again once the change is committed,
+    so a request that cached the old row in between is not served for long.
+    Queryset update() does not send signals and must call
+    backends.invalidate_user() itself.
+    """
+    invalidate_user(instance)
+    transaction.on_commit(lambda: invalidate_user(instance))
@@ -5,8 +5,7 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.core.cache import cache
-import json
+from .backends import cache_user, invalidate_user
 
 
 @api_view(['POST'])
@@ -14,7 +13,6 @@ import json
 def login_view(request):
     """
     Authenticate user by credentials, generate and return a JWT.
-    The token is cached in Redis.
     """
     username = request.data.get('username')
     password = request.data.get('password')
@@ -35,19 +33,13 @@ def login_view(request):
     
     # Generate tokens
     refresh = RefreshToken.for_user(user)
-    access_token = str(refresh.access_token)
     
-    # Cache the token in Redis with user info for 24 hours
-    user_data = {
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-    }
-    cache.set(f"token_{access_token}", json.dumps(user_data), 86400)
+    # Warm the user record read by CachedJWTAuthentication
+    cache_user(user)
     
     return Response({
         'refresh': str(refresh),
-        'access': access_token,
+        'access': str(refresh.access_token),
     }, status=status.HTTP_200_OK)
 
 
@@ -72,7 +64,7 @@ def profile_view(request):
 @permission_classes([IsAuthenticated])
 def logout_view(request):
     """
-    Invalidate the token.
+    Invalidate the token and the cached user record.
     """
     try:
         refresh_token = request.data["refresh"]
@@ -80,7 +72,7 @@ def logout_view(request):
         token.blacklist()
         
         # Remove from cache
-        cache.delete(f"token_{request.META.get('HTTP_AUTHORIZATION', '').split(' ')[1]}")
+        invalidate_user(request.user)
         
         return Response(
             {'message': 'Successfully logged out'}, 
@@ -4,6 +4,8 @@ Django settings for Offers API project.
 
 import os
 from pathlib import Path
+from celery.schedules import crontab
+from kombu import Queue
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.middleware.QueryCountMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -141,7 +144,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.backends.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -152,6 +155,10 @@ REST_FRAMEWORK = {
     ] + ([] if os.environ.get('DEBUG', 'True') == 'True' else []),
 }
 
+# Authenticated JSON reads (offers, balance, activation status) skip the DRF
+# request/response cycle when possible, see config/fastpath.py
+FAST_PATH_ENABLED = os.environ.get('FAST_PATH_ENABLED', 'True') == 'True'
+
 # JWT settings
 from datetime import timedelta
 
@@ -161,11 +168,50 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
 }
+# Users resolved from access tokens are cached, and dropped on every change
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', '300'))  # seconds
 
 # Redis settings
 REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
 REDIS_PORT = os.environ.get('REDIS_PORT', '6379')
 REDIS_DB = os.environ.get('REDIS_DB', '0')
+# Shared connection pool of each process (config/redis_client.py)
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', '50'))
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', '5'))  # seconds waiting for a free connection
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', '5'))  # seconds
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get('REDIS_SOCKET_CONNECT_TIMEOUT', '2'))  # seconds
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', '30'))  # seconds
+
+# Cache settings: a shared Redis cache in its own database, fronted by a small
+# per-process LRU tier for hot keys ('default'), or used directly ('shared') for
+# keys that must be consistent across workers at once
+REDIS_CACHE_DB = os.environ.get('REDIS_CACHE_DB', '1')
+CACHE_L1_TIMEOUT = float(os.environ.get('CACHE_L1_TIMEOUT', '5'))  # seconds, 0 disables the local tier
+CACHE_L1_MAX_ENTRIES = int(os.environ.get('CACHE_L1_MAX_ENTRIES', '1000'))
+CACHE_REDIS_OPTIONS = {
+    'max_connections': REDIS_MAX_CONNECTIONS,
+    'socket_timeout': REDIS_SOCKET_TIMEOUT,
+    'socket_connect_timeout': REDIS_SOCKET_CONNECT_TIMEOUT,
+    'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'config.cache.TwoTierCache',
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_CACHE_DB}',
+        'KEY_PREFIX': 'offers_api',
+        'OPTIONS': {
+            'L1_TIMEOUT': CACHE_L1_TIMEOUT,
+            'L1_MAX_ENTRIES': CACHE_L1_MAX_ENTRIES,
+            **CACHE_REDIS_OPTIONS,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_CACHE_DB}',
+        'KEY_PREFIX': 'offers_api',
+        'OPTIONS': CACHE_REDIS_OPTIONS,
+    },
+}
 
 # Celery settings
 CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
@@ -174,14 +220,179 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Each queue has its own workers (see docker-compose.yml), so a long notification
+# or maintenance run never holds the workers of user-facing activations:
+# - activation: process_activation, latency sensitive
+# - notifications: activation notices and mail batches of the expiring offers run
+# - maintenance: scheduled scans and sweeps
+# - webhooks: deliveries, so slow receivers never hold activation workers
+CELERY_TASK_QUEUES = (
+    Queue('activation'),
+    Queue('notifications'),
+    Queue('maintenance'),
+    Queue('webhooks'),
+)
+CELERY_TASK_DEFAULT_QUEUE = 'activation'
+CELERY_TASK_ROUTES = {
+    'activation.tasks.process_activation': {'queue': 'activation', 'priority': 0},
+    'activation.tasks.send_expiry_notifications': {'queue': 'notifications'},
+    'activation.notifications.recover_notification_batches': {'queue': 'maintenance'},
+    'activation.notifications.*': {'queue': 'notifications'},
+    'activation.tasks.check_expiring_offers': {'queue': 'maintenance'},
+    'activation.tasks.purge_idempotency_keys': {'queue': 'maintenance'},
+    'offers.tasks.*': {'queue': 'maintenance'},
+    'activation.webhooks.recover_webhook_batches': {'queue': 'maintenance'},
+    'activation.webhooks.*': {'queue': 'webhooks'},
+}
+# Priorities 0 (first) to 9 within a queue; batch activations yield to single ones
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+ACTIVATION_BATCH_PRIORITY = int(os.environ.get('ACTIVATION_BATCH_PRIORITY', '6'))
+# Workers reserve one task at a time, a long task never holds prefetched ones back
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.environ.get('CELERY_WORKER_PREFETCH_MULTIPLIER', '1'))
+CELERY_BEAT_SCHEDULE = {
+    'deactivate-expired-offers': {
+        'task': 'offers.tasks.deactivate_expired_offers',
+        'schedule': int(os.environ.get('EXPIRY_SWEEP_INTERVAL', '300')),  # seconds
+    },
+    'check-expiring-offers': {
+        'task': 'activation.tasks.check_expiring_offers',
+        'schedule': crontab(hour=int(os.environ.get('EXPIRY_NOTICE_HOUR', '8')), minute=0),
+    },
+    'purge-idempotency-keys': {
+        'task': 'activation.tasks.purge_idempotency_keys',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'recover-notification-batches': {
+        'task': 'activation.notifications.recover_notification_batches',
+        'schedule': int(os.environ.get('NOTIFICATION_RECOVERY_INTERVAL', '60')),  # seconds
+    },
+    'recover-webhook-batches': {
+        'task': 'activation.webhooks.recover_webhook_batches',
+        'schedule': int(os.environ.get('WEBHOOK_RECOVERY_INTERVAL', '60')),  # seconds
+    },
+}
 
 # Email settings (for notifications)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@offersapi.com'
+# Activation notices are queued in Redis and sent by activation.notifications.deliver_notifications,
+# NOTIFICATION_BATCH_SIZE messages per mail connection
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', '100'))
+NOTIFICATION_BATCH_WINDOW = int(os.environ.get('NOTIFICATION_BATCH_WINDOW', '1'))  # seconds
+# Batches stay claimed until sent; those of a crashed worker are queued again after the timeout
+NOTIFICATION_BATCH_TIMEOUT = int(os.environ.get('NOTIFICATION_BATCH_TIMEOUT', '300'))  # seconds
+NOTIFICATION_RETRY_DELAY = int(os.environ.get('NOTIFICATION_RETRY_DELAY', '30'))  # seconds after a failed batch
+# SMS channel: activation.sms.ConsoleSMSBackend logs the messages, set a provider backend in production
+SMS_BACKEND = os.environ.get('SMS_BACKEND', 'activation.sms.ConsoleSMSBackend')
 
 # External system settings
 EXTERNAL_ACTIVATION_URL = os.environ.get('EXTERNAL_ACTIVATION_URL', 'http://localhost:8000/api/v1/partner/activate/')
 PARTNER_API_KEY = os.environ.get('PARTNER_API_KEY', 'partner-api-key')
+PARTNER_SYSTEM_TIMEOUT = int(os.environ.get('PARTNER_SYSTEM_TIMEOUT', '30'))  # seconds
+PARTNER_CONNECT_TIMEOUT = float(os.environ.get('PARTNER_CONNECT_TIMEOUT', '3.05'))  # seconds
+PARTNER_READ_TIMEOUT = float(os.environ.get('PARTNER_READ_TIMEOUT', PARTNER_SYSTEM_TIMEOUT))  # seconds
+PARTNER_POOL_CONNECTIONS = int(os.environ.get('PARTNER_POOL_CONNECTIONS', '4'))  # distinct partner hosts
+PARTNER_POOL_MAXSIZE = int(os.environ.get('PARTNER_POOL_MAXSIZE', '10'))  # keep-alive connections per host
+# 'celery' runs one blocking partner call per Celery task, 'async' hands activations
+# to the asyncio worker (manage.py run_async_activation_worker)
+PARTNER_EXECUTION_MODE = os.environ.get('PARTNER_EXECUTION_MODE', 'celery')
+PARTNER_ASYNC_CONCURRENCY = int(os.environ.get('PARTNER_ASYNC_CONCURRENCY', '200'))  # partner calls in flight per worker
+# 'each' validates every reference with its own call, 'batch' lets the async worker
+# validate concurrent references with one bulk call (Celery workers, which activate
+# one transaction at a time, validate each reference), 'signed' trusts references whose
+# activation response carries a valid PARTNER_SIGNING_SECRET signature
+PARTNER_VALIDATION_MODE = os.environ.get('PARTNER_VALIDATION_MODE', 'each')
+PARTNER_SIGNING_SECRET = os.environ.get('PARTNER_SIGNING_SECRET', '')
+PARTNER_VALIDATION_BATCH_SIZE = int(os.environ.get('PARTNER_VALIDATION_BATCH_SIZE', '100'))
+PARTNER_VALIDATION_BATCH_WINDOW = float(os.environ.get('PARTNER_VALIDATION_BATCH_WINDOW', '0.005'))  # seconds
+PARTNER_BULK_VALIDATION_MAX = int(os.environ.get('PARTNER_BULK_VALIDATION_MAX', '500'))
+# Circuit breaker: opens when PARTNER_BREAKER_ERROR_RATE of the calls in a window
+# failed or took longer than PARTNER_SLOW_CALL_THRESHOLD, then probes after the cooldown
+PARTNER_BREAKER_WINDOW = int(os.environ.get('PARTNER_BREAKER_WINDOW', '30'))  # seconds
+PARTNER_BREAKER_MIN_CALLS = int(os.environ.get('PARTNER_BREAKER_MIN_CALLS', '20'))
+PARTNER_BREAKER_ERROR_RATE = float(os.environ.get('PARTNER_BREAKER_ERROR_RATE', '0.5'))
+PARTNER_BREAKER_COOLDOWN = int(os.environ.get('PARTNER_BREAKER_COOLDOWN', '30'))  # seconds
+PARTNER_SLOW_CALL_THRESHOLD = float(os.environ.get('PARTNER_SLOW_CALL_THRESHOLD', '5.0'))  # seconds
+# Adaptive (AIMD) limit on partner calls in flight across all workers
+PARTNER_LIMITER_INITIAL = int(os.environ.get('PARTNER_LIMITER_INITIAL', '20'))
+PARTNER_LIMITER_MIN = int(os.environ.get('PARTNER_LIMITER_MIN', '1'))
+PARTNER_LIMITER_MAX = int(os.environ.get('PARTNER_LIMITER_MAX', '200'))
+PARTNER_LIMITER_DECREASE = float(os.environ.get('PARTNER_LIMITER_DECREASE', '0.5'))
+# Activations that cannot call the partner system are deferred, then failed and refunded
+PARTNER_DEFER_COUNTDOWN = int(os.environ.get('PARTNER_DEFER_COUNTDOWN', '5'))  # seconds
+PARTNER_MAX_DEFERRALS = int(os.environ.get('PARTNER_MAX_DEFERRALS', '20'))
+# Transient partner failures are retried with full-jitter exponential backoff, while
+# retries stay under PARTNER_RETRY_BUDGET_RATIO of the first attempts in each window
+PARTNER_RETRY_MAX = int(os.environ.get('PARTNER_RETRY_MAX', '3'))
+PARTNER_RETRY_BACKOFF_BASE = float(os.environ.get('PARTNER_RETRY_BACKOFF_BASE', '1.0'))  # seconds
+PARTNER_RETRY_BACKOFF_CAP = float(os.environ.get('PARTNER_RETRY_BACKOFF_CAP', '60'))  # seconds
+PARTNER_RETRY_BUDGET_RATIO = float(os.environ.get('PARTNER_RETRY_BUDGET_RATIO', '0.1'))
+PARTNER_RETRY_BUDGET_MIN = int(os.environ.get('PARTNER_RETRY_BUDGET_MIN', '10'))  # retries per window
+PARTNER_RETRY_BUDGET_WINDOW = int(os.environ.get('PARTNER_RETRY_BUDGET_WINDOW', '60'))  # seconds
+
+# Activation settings
+ACTIVATION_BATCH_MAX_ITEMS = int(os.environ.get('ACTIVATION_BATCH_MAX_ITEMS', '1000'))
+ACTIVATION_ASYNC_QUEUE = os.environ.get('ACTIVATION_ASYNC_QUEUE', 'activation:async_queue')
+# Ids held by an async worker whose heartbeat expired go back to the queue
+ACTIVATION_ASYNC_HEARTBEAT_INTERVAL = int(os.environ.get('ACTIVATION_ASYNC_HEARTBEAT_INTERVAL', '10'))  # seconds
+ACTIVATION_ASYNC_HEARTBEAT_TTL = int(os.environ.get('ACTIVATION_ASYNC_HEARTBEAT_TTL', '30'))  # seconds
+# A PROCESSING transaction not updated for this long lost its worker and may be claimed again
+ACTIVATION_PROCESSING_LEASE = int(os.environ.get('ACTIVATION_PROCESSING_LEASE', '900'))  # seconds
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', '86400'))  # seconds a response is replayed
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', '30'))  # seconds
+# Transaction status hashes in Redis expire once idle, then the status endpoint reads the database
+ACTIVATION_STATUS_TTL = int(os.environ.get('ACTIVATION_STATUS_TTL', '86400'))  # seconds, pending and processing
+ACTIVATION_FINAL_STATUS_TTL = int(os.environ.get('ACTIVATION_FINAL_STATUS_TTL', '3600'))  # seconds, success and failure
+
+# Pending activations are written to the outbox table with their transaction and
+# dispatched to Redis and Celery by manage.py run_outbox_relay
+OUTBOX_RELAY_BATCH_SIZE = int(os.environ.get('OUTBOX_RELAY_BATCH_SIZE', '200'))  # events per relay transaction
+OUTBOX_RELAY_POLL_INTERVAL = float(os.environ.get('OUTBOX_RELAY_POLL_INTERVAL', '1'))  # seconds, when no NOTIFY arrives
+OUTBOX_RELAY_ERROR_BACKOFF = float(os.environ.get('OUTBOX_RELAY_ERROR_BACKOFF', '2'))  # seconds
+
+# Expiring offer notices: users are scanned in keyset ranges of user ids and
+# notified in batches, with a checkpoint to resume a crashed run
+EXPIRY_NOTICE_DAYS = int(os.environ.get('EXPIRY_NOTICE_DAYS', '3'))
+EXPIRY_SCAN_RANGE = int(os.environ.get('EXPIRY_SCAN_RANGE', '10000'))  # user ids per range
+EXPIRY_SCAN_CHUNK_SIZE = int(os.environ.get('EXPIRY_SCAN_CHUNK_SIZE', '2000'))  # rows fetched at a time
+EXPIRY_NOTIFY_BATCH_SIZE = int(os.environ.get('EXPIRY_NOTIFY_BATCH_SIZE', '500'))  # users per task
+EXPIRY_CHECKPOINT_TTL = int(os.environ.get('EXPIRY_CHECKPOINT_TTL', '172800'))  # seconds
+
+# Status streams end before the gunicorn timeout; EventSource clients then reconnect
+ACTIVATION_STREAM_TIMEOUT = int(os.environ.get('ACTIVATION_STREAM_TIMEOUT', '25'))  # seconds
+ACTIVATION_STREAM_KEEPALIVE = int(os.environ.get('ACTIVATION_STREAM_KEEPALIVE', '10'))  # seconds
+ACTIVATION_STREAM_RETRY_MS = int(os.environ.get('ACTIVATION_STREAM_RETRY_MS', '1000'))
+# Each open stream holds a Redis connection of its own pool; over the limit clients poll instead
+ACTIVATION_STREAM_MAX_CONNECTIONS = int(os.environ.get('ACTIVATION_STREAM_MAX_CONNECTIONS', '100'))  # streams per process
+
+# Activation webhooks: completions are batched per endpoint for WEBHOOK_BATCH_WINDOW seconds
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', '50'))  # events per POST
+WEBHOOK_BATCH_WINDOW = int(os.environ.get('WEBHOOK_BATCH_WINDOW', '2'))  # seconds
+WEBHOOK_TIMEOUT = int(os.environ.get('WEBHOOK_TIMEOUT', '5'))  # seconds
+WEBHOOK_MAX_CONCURRENCY = int(os.environ.get('WEBHOOK_MAX_CONCURRENCY', '2'))  # POSTs in flight per endpoint
+WEBHOOK_DEFER_COUNTDOWN = int(os.environ.get('WEBHOOK_DEFER_COUNTDOWN', '1'))  # seconds
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '8'))
+WEBHOOK_RETRY_BACKOFF_BASE = float(os.environ.get('WEBHOOK_RETRY_BACKOFF_BASE', '2'))  # seconds
+WEBHOOK_RETRY_BACKOFF_CAP = float(os.environ.get('WEBHOOK_RETRY_BACKOFF_CAP', '600'))  # seconds
+WEBHOOK_DEAD_LETTER_MAX = int(os.environ.get('WEBHOOK_DEAD_LETTER_MAX', '1000'))  # events kept per endpoint
+
+# Offer catalog cache, invalidated on every offer change
+OFFER_CATALOG_CACHE_TTL = int(os.environ.get('OFFER_CATALOG_CACHE_TTL', '3600'))  # seconds
+
+# Expired user offers are deactivated by offers.tasks.deactivate_expired_offers in
+# batches of EXPIRY_SWEEP_BATCH_SIZE rows, pausing between batches
+EXPIRY_SWEEP_BATCH_SIZE = int(os.environ.get('EXPIRY_SWEEP_BATCH_SIZE', '1000'))
+EXPIRY_SWEEP_PAUSE = float(os.environ.get('EXPIRY_SWEEP_PAUSE', '0.05'))  # seconds
+EXPIRY_SWEEP_MAX_DURATION = int(os.environ.get('EXPIRY_SWEEP_MAX_DURATION', '240'))  # seconds per run
+
+# Transaction history and subscriptions pagination (?page_size= up to the maximum)
+ACCOUNT_PAGE_SIZE = int(os.environ.get('ACCOUNT_PAGE_SIZE', '50'))
+ACCOUNT_MAX_PAGE_SIZE = int(os.environ.get('ACCOUNT_MAX_PAGE_SIZE', '500'))
 
 # Logging configuration
 LOGGING = {
@@ -250,5 +461,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'config': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
@@ -0,0 +1,220 @@
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LocalTier:
+    """
+    Bounded in-process store evicting the least recently used entry.
+    Values are kept pickled so callers never share a mutable object.
+    """
+
+    def __init__(self, timeout, max_entries):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        """
+        Args:
+            key (str): The full cache key
+            value: The value to keep
+            timeout (float): Lifetime of the entry in Redis, None for no expiry.
+                The local entry never outlives it nor the tier timeout.
+        """
+        timeout = self.timeout if timeout is None else min(self.timeout, timeout)
+        if timeout <= 0:
+            self.delete(key)
+            return
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache(BaseCache):
+    """
+    Django cache backend serving hot keys from process memory (L1) in front
+    of the shared Redis cache (L2).
+
+    Writes go through both tiers, so this process always reads its own writes.
+    Other processes may serve their local copy for up to L1_TIMEOUT seconds
+    after a change: keys that must be consistent across workers at once
+    belong in the 'shared' cache alias instead.
+
+    OPTIONS:
+        L1_TIMEOUT (float): Lifetime of a local entry in seconds, 0 disables L1
+        L1_MAX_ENTRIES (int): Number of local entries kept per process
+        Any other option is passed on to the Redis backend.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = dict(params.get('OPTIONS', {}))
+        l1_timeout = options.pop('L1_TIMEOUT', 5)
+        l1_max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        self.l1 = LocalTier(l1_timeout, l1_max_entries) if l1_timeout > 0 else None
+        self.l2 = RedisCache(server, {**params, 'OPTIONS': options})
+        self.counters = Counter()
+
+    def _l1_timeout(self, timeout):
+        expires_at = self.get_backend_timeout(timeout)
+        return None if expires_at is None else expires_at - time.time()
+
+    def _l1_get(self, key):
+        if self.l1 is None:
+            return MISSING
+        value = self.l1.get(key)
+        self.counters['l1_misses' if value is MISSING else 'l1_hits'] += 1
+        return value
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if self.l1 is not None:
+            self.l1.set(key, value, self._l1_timeout(timeout))
+
+    def _l1_delete(self, key):
+        if self.l1 is not None:
+            self.l1.delete(key)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._l1_get(local_key)
+        if value is not MISSING:
+            return value
+        value = self.l2.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.counters['l2_misses'] += 1
+            return default
+        self.counters['l2_hits'] += 1
+        # The remaining Redis TTL is unknown here, L1_TIMEOUT bounds the copy
+        self._l1_set(local_key, value, None)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_set(local_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1_set(local_key, value, timeout)
+        else:
+            self._l1_delete(local_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        try:
+            value = self.l2.incr(key, delta, version=version)
+        except ValueError:
+            self._l1_delete(local_key)
+            raise
+        self._l1_set(local_key, value, None)
+        return value
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self.l1 is not None and self.l1.get(local_key) is not MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote_keys = []
+        for key in keys:
+            value = self._l1_get(self.make_and_validate_key(key, version=version))
+            if value is MISSING:
+                remote_keys.append(key)
+            else:
+                found[key] = value
+        if remote_keys:
+            remote = self.l2.get_many(remote_keys, version=version)
+            self.counters['l2_hits'] += len(remote)
+            self.counters['l2_misses'] += len(remote_keys) - len(remote)
+            for key, value in remote.items():
+                self._l1_set(self.make_and_validate_key(key, version=version), value, None)
+            found.update(remote)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            self._l1_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._l1_delete(self.make_and_validate_key(key, version=version))
+        self.l2.delete_many(keys, version=version)
+
+    def clear(self):
+        if self.l1 is not None:
+            self.l1.clear()
+        return self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def get_stats(self):
+        """
+        Hit and miss counters of this process, per tier.
+
+        Returns:
+            dict: Hits, misses and hit rate of L1 and L2, and the L1 size
+        """
+        stats = {}
+        for tier in ('l1', 'l2'):
+            hits = self.counters[f'{tier}_hits']
+            misses = self.counters[f'{tier}_misses']
+            stats[tier] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+            }
+        stats['l1']['entries'] = len(self.l1) if self.l1 is not None else 0
+        stats['l1']['max_entries'] = self.l1.max_entries if self.l1 is not None else 0
+        return stats
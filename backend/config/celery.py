@@ -1,5 +1,7 @@
 import os
+import logging
 from celery import Celery
+from celery.signals import task_prerun, task_postrun
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.base')
@@ -18,4 +20,38 @@ app.autodiscover_tasks()
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
\ No newline at end of file
+    print(f'Request: {self.request!r}')
+
+
+logger = logging.getLogger('config')
+
+# Query counters of the tasks running in this process, by task id
+task_query_counters = {}
+
+
+@task_prerun.connect
+def start_task_query_count(task_id=None, task=None, **kwargs):
+    """
+    Count the database queries run by each task, like QueryCountMiddleware
+    does for requests.
+    """
+    from django.db import connection
+    from config.middleware import QueryCounter
+
+    counter = QueryCounter()
+    wrapper = connection.execute_wrapper(counter)
+    wrapper.__enter__()
+    task_query_counters[task_id] = (counter, wrapper)
+
+
+@task_postrun.connect
+def report_task_query_count(task_id=None, task=None, **kwargs):
+    entry = task_query_counters.pop(task_id, None)
+    if entry is None:
+        return
+    counter, wrapper = entry
+    wrapper.__exit__(None, None, None)
+    logger.info(
+        f"Task {task.name} ran {counter.count} queries "
+        f"in {counter.duration * 1000:.2f}ms"
+    )
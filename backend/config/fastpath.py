@@ -0,0 +1,117 @@
+from functools import wraps
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder produces the same bytes
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def dumps(data):
+    """
+    Encode data exactly as DRF's JSONRenderer does with the default settings:
+    compact, UTF-8, no NaN, and U+2028/U+2029 escaped.
+
+    Data must only hold dicts, lists, strings, integers, booleans and None
+    (what serializers return for the fields of this API): floats are not
+    guaranteed to be formatted identically by orjson.
+
+    Args:
+        data: The payload to encode
+
+    Returns:
+        bytes: The JSON body
+    """
+    if orjson is not None:
+        content = orjson.dumps(data)
+    else:
+        content = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+def authenticate(request):
+    """
+    Authenticate a plain Django request with the DRF authentication classes.
+
+    Returns:
+        User: The authenticated user, None when authentication fails or
+        no credentials were given
+    """
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except APIException:
+            return None
+        if result is not None:
+            user = result[0]
+            return user if user.is_authenticated else None
+    return None
+
+
+def check_policies(view, request, user):
+    """
+    Run the permission and throttle classes of a DRF view, so the fast path
+    enforces the same policies as the view it shortcuts.
+
+    Returns:
+        bool: True if the request is allowed
+    """
+    api_view = view.cls()
+    # DRF policies read the user from the request
+    request.user = user
+    for permission in api_view.get_permissions():
+        if not permission.has_permission(request, api_view):
+            return False
+    for throttle in api_view.get_throttles():
+        if not throttle.allow_request(request, api_view):
+            return False
+    return True
+
+
+def fast_path(fast_view):
+    """
+    Serve an authenticated JSON read without the DRF request/response cycle.
+
+    The decorated DRF view stays the reference implementation: it handles
+    every request the fast view does not (other methods, clients not
+    accepting JSON, failed authentication, permissions or throttles, or
+    fast_view returning None, e.g. for a 404), so errors keep their DRF
+    responses. fast_view must return
+    the same bytes the DRF view renders. Disabled by FAST_PATH_ENABLED.
+
+    Args:
+        fast_view (callable): fast_view(request, user, *args, **kwargs)
+            returning the JSON body as bytes, or None to fall back
+
+    Returns:
+        callable: Decorator for the DRF view
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if (
+                not settings.FAST_PATH_ENABLED
+                or request.method != 'GET'
+                or not request.accepts('application/json')
+            ):
+                return view(request, *args, **kwargs)
+            user = authenticate(request)
+            if user is None or not check_policies(view, request, user):
+                return view(request, *args, **kwargs)
+            content = fast_view(request, user, *args, **kwargs)
+            if content is None:
+                return view(request, *args, **kwargs)
+            return HttpResponse(content, content_type='application/json')
+
+        wrapped.drf_view = view
+        return wrapped
+    return decorator
@@ -0,0 +1,46 @@
+from django.db import connection
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting the queries run on a connection.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class QueryCountMiddleware:
+    """
+    Report the number of database queries executed for each request.
+
+    The count and the time spent in the database are returned in the
+    X-DB-Query-Count and X-DB-Query-Time response headers and logged.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        response['X-DB-Query-Count'] = str(counter.count)
+        response['X-DB-Query-Time'] = f"{counter.duration * 1000:.2f}ms"
+        logger.info(
+            f"{request.method} {request.path} ran {counter.count} queries "
+            f"in {counter.duration * 1000:.2f}ms"
+        )
+        return response
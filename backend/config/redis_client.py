@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from django.conf import settings
+import logging
+import os
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# One connection pool per response decoding, shared by every module of the process
+_pools = {}
+
+
+def connection_kwargs():
+    """
+    Connection settings shared by the sync and asyncio clients.
+    """
+    return {
+        'host': settings.REDIS_HOST,
+        'port': int(settings.REDIS_PORT),
+        'db': int(settings.REDIS_DB),
+        'socket_timeout': settings.REDIS_SOCKET_TIMEOUT,
+        'socket_connect_timeout': settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        'socket_keepalive': True,
+        'health_check_interval': settings.REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+def get_pool(decode_responses=True):
+    """
+    Get the connection pool of the process.
+    
+    The pool is bounded to REDIS_MAX_CONNECTIONS: once they are all in use,
+    callers wait up to REDIS_POOL_TIMEOUT seconds for one to be released
+    instead of opening more connections.
+    
+    Args:
+        decode_responses (bool): False for the pool returning raw bytes
+    """
+    pool = _pools.get(decode_responses)
+    if pool is None:
+        pool = redis.BlockingConnectionPool(
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            decode_responses=decode_responses,
+            **connection_kwargs()
+        )
+        _pools[decode_responses] = pool
+    return pool
+
+
+def get_stream_pool():
+    """
+    Get the connection pool of the status streams of the process.
+    
+    Each open stream holds a pub/sub connection, so streams get their own pool,
+    bounded to ACTIVATION_STREAM_MAX_CONNECTIONS, and never starve the shared
+    one. Once it is full, opening a stream fails right away instead of waiting.
+    """
+    pool = _pools.get('stream')
+    if pool is None:
+        pool = redis.BlockingConnectionPool(
+            max_connections=settings.ACTIVATION_STREAM_MAX_CONNECTIONS,
+            timeout=0,
+            decode_responses=True,
+            **connection_kwargs()
+        )
+        _pools['stream'] = pool
+    return pool
+
+
+def get_client(decode_responses=True):
+    """
+    Returns:
+        redis.Redis: A client on the shared pool of the process
+    """
+    return redis.Redis(connection_pool=get_pool(decode_responses))
+
+
+def get_stream_client():
+    """
+    Returns:
+        redis.Redis: A client on the status stream pool of the process
+    """
+    return redis.Redis(connection_pool=get_stream_pool())
+
+
+def create_async_client():
+    """
+    Returns:
+        redis.asyncio.Redis: A client with its own pool, for one event loop
+    """
+    return aioredis.Redis(
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        decode_responses=True,
+        **connection_kwargs()
+    )
+
+
+def reset_pools():
+    """
+    Drop the connections inherited from the parent process after a fork
+    (gunicorn and Celery prefork workers). The sockets are left open for the
+    parent, the child opens its own on first use.
+    """
+    for pool in _pools.values():
+        pool.reset()
+
+
+os.register_at_fork(after_in_child=reset_pools)
+
+
+@contextmanager
+def pipeline(client=None, transaction=False):
+    """
+    Queue commands and send them in a single round trip when the block exits.
+    The replies are available as `pipe.results` afterwards.
+    
+    Usage:
+        with pipeline() as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, ttl)
+        hset_reply, expire_reply = pipe.results
+    """
+    pipe = (client or redis_client).pipeline(transaction=transaction)
+    pipe.results = []
+    yield pipe
+    pipe.results = pipe.execute()
+
+
+def get_pool_stats():
+    """
+    Utilization of the connection pools of this process, for dashboards.
+    
+    Returns:
+        dict: Connections created, in use and idle against the limit, per pool
+    """
+    stats = {'pid': os.getpid()}
+    for name, pool in _pools.items():
+        created = len(pool._connections)
+        idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+        in_use = created - idle
+        stats[{True: 'text', False: 'bytes'}.get(name, name)] = {
+            'max_connections': pool.max_connections,
+            'created': created,
+            'in_use': in_use,
+            'idle': idle,
+            'utilization': round(in_use / pool.max_connections, 3),
+        }
+    return stats
+
+
+redis_client = get_client()
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class OffersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'offers'
\ No newline at end of file
+    name = 'offers'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import cache
+from .models import Offer
+from .serializers import OfferSerializer
+from config.fastpath import dumps
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Responses are stored as rendered JSON bytes in the two-tier cache, so hot
+# reads are served from process memory. Other processes see a version bump
+# within CACHE_L1_TIMEOUT seconds.
+VERSION_KEY = 'offers:catalog:version'
+
+
+def get_version():
+    """
+    Returns:
+        int: The current version of the catalog, bumped on every offer change
+    """
+    return cache.get(VERSION_KEY, 0)
+
+
+def bump_version():
+    """
+    Invalidate every cached catalog entry at once. Entries of older versions
+    are never read again and expire after OFFER_CATALOG_CACHE_TTL.
+    """
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        # First change ever, or the key was evicted: any new number will do
+        cache.add(VERSION_KEY, 0, timeout=None)
+        version = cache.incr(VERSION_KEY)
+    logger.info(f"Offer catalog cache version bumped to {version}")
+
+
+def get_offer_list_json():
+    """
+    Get the serialized list of offers.
+    
+    Returns:
+        bytes: The JSON body of the offers list
+    """
+    key = f"offers:catalog:v{get_version()}:list"
+    content = cache.get(key)
+    if content is None:
+        content = render(OfferSerializer(Offer.objects.all(), many=True).data)
+        cache.set(key, content, settings.OFFER_CATALOG_CACHE_TTL)
+    return content
+
+
+def get_offer_json(offer_id):
+    """
+    Get a serialized offer.
+    
+    Args:
+        offer_id (int): The id of the offer
+        
+    Returns:
+        bytes: The JSON body of the offer, None if it does not exist
+    """
+    key = f"offers:catalog:v{get_version()}:offer:{offer_id}"
+    content = cache.get(key)
+    if content is None:
+        offer = Offer.objects.filter(pk=offer_id).first()
+        if offer is None:
+            return None
+        content = render(OfferSerializer(offer).data)
+        cache.set(key, content, settings.OFFER_CATALOG_CACHE_TTL)
+    return content
+
+
+def render(data):
+    return dumps(data)
@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from account.models import Account
+from account.views import get_balance
+from activation.tasks import status_store
+from activation.views import activation_status
+from offers.models import Offer
+from offers.views import list_offers, offer_detail
+import logging
+import time
+import uuid
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the fast path of the read endpoints against their DRF views and check both return the same bytes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Number of requests per endpoint and path (default: 2000)'
+        )
+        parser.add_argument(
+            '--offers',
+            type=int,
+            default=20,
+            help='Number of offers in the catalog (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        for name in ('activation', 'account', 'offers', 'authentication', 'config'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        transaction_id = f'bench-{uuid.uuid4()}'
+        try:
+            with transaction.atomic():
+                user, offer = self.seed(options['offers'], transaction_id)
+                token = str(RefreshToken.for_user(user).access_token)
+                endpoints = [
+                    ('list_offers', list_offers, '/api/v1/offers/', {}),
+                    ('offer_detail', offer_detail, f'/api/v1/offers/{offer.id}/', {'offer_id': offer.id}),
+                    ('get_balance', get_balance, '/api/v1/account/balance/', {}),
+                    ('activation_status', activation_status, f'/api/v1/activation/status/{transaction_id}/',
+                     {'transaction_id': transaction_id}),
+                ]
+                for name, view, path, kwargs in endpoints:
+                    self.compare(name, view, path, kwargs, token, options['requests'])
+                transaction.set_rollback(True)
+        finally:
+            status_store.client.delete(status_store.key(transaction_id))
+
+    def seed(self, offers, transaction_id):
+        user = User.objects.create_user(username=f'bench_{uuid.uuid4().hex[:8]}', password='bench')
+        Account.objects.create(user=user, balance=100)
+        created = [
+            Offer.objects.create(name=f'Bench offer {i}', description='Benchmark offer', price=10, duration_days=30)
+            for i in range(offers)
+        ]
+        status_store.transition(transaction_id, {'status': 'PROCESSING', 'updated_at': 'now'})
+        return user, created[0]
+
+    def compare(self, name, view, path, kwargs, token, count):
+        factory = RequestFactory()
+
+        def call(target):
+            request = factory.get(path, HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_ACCEPT='application/json')
+            response = target(request, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+        fast = call(view)
+        drf = call(view.drf_view)
+        if fast.status_code != 200 or fast.content != drf.content:
+            raise CommandError(f'{name}: fast path and DRF responses differ')
+
+        rates = {}
+        for label, target in (('drf', view.drf_view), ('fast', view)):
+            start = time.perf_counter()
+            for _ in range(count):
+                call(target)
+            rates[label] = count / (time.perf_counter() - start)
+
+        self.stdout.write(
+            f"{name:<18} DRF {rates['drf']:>8.0f} req/s   fast path {rates['fast']:>8.0f} req/s   "
+            + self.style.SUCCESS(f"{rates['fast'] / rates['drf']:.2f}x")
+        )
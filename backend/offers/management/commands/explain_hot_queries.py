@@ -0,0 +1,161 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import timedelta
+from offers.models import Offer, UserOffer
+from account.models import Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN ANALYZE on the hot UserOffer and Transaction lookups against '
+        'a seeded dataset and fail if one of them scans a whole table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100000,
+            help='Number of users to seed (default: 100000)'
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=2000000,
+            help='Number of user offers and of transactions to seed (default: 2000000)'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded rows instead of rolling them back'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans are only checked on PostgreSQL')
+
+        with transaction.atomic():
+            user = self.seed(options['users'], options['rows'])
+            failures = self.explain_queries(user)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"Sequential scan in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index'))
+
+    def seed(self, users, rows):
+        """
+        Insert the dataset with set-based INSERT ... SELECT statements and
+        refresh the planner statistics.
+
+        Returns:
+            User: A user in the middle of the seeded range
+        """
+        self.stdout.write(f'Seeding {users} users, {rows} user offers and {rows} transactions...')
+        offers = [
+            Offer.objects.create(name=f'Explain offer {i}', description='', price=10, duration_days=30)
+            for i in range(10)
+        ]
+        first_offer = offers[0].id
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {User._meta.db_table}
+                    (password, is_superuser, username, first_name, last_name, email, is_staff, is_active, date_joined)
+                SELECT '!', false, 'explain_' || g, '', '', '', false, true, now()
+                FROM generate_series(1, %s) g
+                RETURNING id
+                """,
+                [users]
+            )
+            user_ids = [row[0] for row in cursor.fetchall()]
+            first_user = min(user_ids)
+
+            cursor.execute(
+                f"""
+                INSERT INTO {UserOffer._meta.db_table}
+                    (user_id, offer_id, activation_date, expiration_date, is_active, transaction_id)
+                SELECT %s + g %% %s, %s + g %% 10,
+                    now() - (g %% 365) * interval '1 day',
+                    now() + ((g %% 730) - 365) * interval '1 day',
+                    g %% 3 = 0, 'explain-offer-' || g
+                FROM generate_series(1, %s) g
+                """,
+                [first_user, users, first_offer, rows]
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {Transaction._meta.db_table}
+                    (user_id, offer_id, transaction_id, amount, status, created_at, updated_at)
+                SELECT %s + g %% %s, %s + g %% 10, 'explain-transaction-' || g, 10,
+                    (ARRAY['PENDING', 'PROCESSING', 'SUCCESS', 'FAILED'])[1 + g %% 4],
+                    now() - (g %% 525600) * interval '1 minute', now()
+                FROM generate_series(1, %s) g
+                """,
+                [first_user, users, first_offer, rows]
+            )
+            for model in (User, UserOffer, Transaction):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+        return User.objects.get(pk=first_user + users // 2)
+
+    def hot_queries(self, user):
+        """
+        The lookups made by the API views and the periodic tasks, as they build them.
+        """
+        now = timezone.now()
+        threshold_date = now + timedelta(days=3)
+        page_size = settings.ACCOUNT_PAGE_SIZE + 1
+        return {
+            'get_subscriptions': UserOffer.objects.filter(
+                user=user,
+                is_active=True
+            ).select_related('offer').order_by('-activation_date', '-id')[:page_size],
+            'expiring_offers': UserOffer.objects.filter(
+                user=user,
+                is_active=True,
+                expiration_date__lte=threshold_date,
+                expiration_date__gte=now
+            ).select_related('offer'),
+            'check_expiring_offers': UserOffer.objects.filter(
+                is_active=True,
+                expiration_date__lte=threshold_date,
+                expiration_date__gte=now,
+                user_id__gt=user.id,
+                user_id__lte=user.id + settings.EXPIRY_SCAN_RANGE
+            ).order_by('user_id', 'expiration_date').values_list(
+                'user_id', 'user__email', 'offer__name', 'expiration_date'
+            ),
+            'transaction_status': Transaction.objects.filter(
+                user=user
+            ).order_by('-created_at', '-id')[:page_size],
+            'transaction_status_by_status': Transaction.objects.filter(
+                user=user,
+                status='SUCCESS'
+            ).order_by('-created_at', '-id')[:page_size],
+        }
+
+    def explain_queries(self, user):
+        """
+        Returns:
+            list: Names of the queries whose plan scans a hot table sequentially
+        """
+        hot_tables = (UserOffer._meta.db_table, Transaction._meta.db_table)
+        failures = []
+        for name, queryset in self.hot_queries(user).items():
+            plan = queryset.explain(analyze=True)
+            seq_scans = [
+                line.strip() for line in plan.splitlines()
+                if any(f'Seq Scan on {table}' in line for table in hot_tables)
+            ]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if seq_scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'Sequential scan: {"; ".join(seq_scans)}'))
+        return failures
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:01
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking the tables against writes
+    atomic = False
+
+    dependencies = [
+        ('offers', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='useroffer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'expiration_date'], name='useroffer_user_active_exp_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='useroffer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expiration_date'], name='useroffer_active_exp_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:03
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the index without locking the table against writes
+    atomic = False
+
+    dependencies = [
+        ('offers', '0002_useroffer_useroffer_user_active_exp_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='useroffer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', '-activation_date', '-id'], name='useroffer_user_active_date_idx'),
+        ),
+    ]
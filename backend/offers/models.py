@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 
 
@@ -25,5 +26,27 @@ class UserOffer(models.Model):
     is_active = models.BooleanField(default=True)
     transaction_id = models.CharField(max_length=100, unique=True)
 
+    class Meta:
+        indexes = [
+            # Active subscriptions and expiring offers of a user
+            models.Index(
+                fields=['user', 'expiration_date'],
+                condition=Q(is_active=True),
+                name='useroffer_user_active_exp_idx'
+            ),
+            # Active subscriptions of a user, most recently activated first
+            models.Index(
+                fields=['user', '-activation_date', '-id'],
+                condition=Q(is_active=True),
+                name='useroffer_user_active_date_idx'
+            ),
+            # Expiring offers of all users (check_expiring_offers)
+            models.Index(
+                fields=['expiration_date'],
+                condition=Q(is_active=True),
+                name='useroffer_active_exp_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.offer.name}"
\ No newline at end of file
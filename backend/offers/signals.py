@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Offer
+from . import cache
+
+
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def invalidate_offer_catalog(sender, instance, **kwargs):
+    """
+    Invalidate the offer catalog cache when an offer changes.
+    
+    The version is bumped right away and again once the change is committed,
+    so a request that cached the old rows in between is not served for long.
+    Queryset update() and bulk operations do not send signals and must call
+    cache.bump_version() themselves.
+    """
+    cache.bump_version()
+    transaction.on_commit(cache.bump_version)
@@ -0,0 +1,96 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import UserOffer
+from config.redis_client import redis_client
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+SWEEPER_STATS_KEY = 'offers:expiry_sweeper'
+
+
+def expired_offers(now):
+    return UserOffer.objects.filter(is_active=True, expiration_date__lt=now)
+
+
+def get_sweeper_lag(now=None):
+    """
+    Returns:
+        float: Seconds since the oldest active offer that should have been
+        deactivated expired, 0 when there is none
+    """
+    now = now or timezone.now()
+    oldest = expired_offers(now).order_by('expiration_date').values_list('expiration_date', flat=True).first()
+    return (now - oldest).total_seconds() if oldest else 0.0
+
+
+def deactivate_expired_batch(now):
+    """
+    Deactivate up to EXPIRY_SWEEP_BATCH_SIZE expired offers with a single
+    UPDATE ... WHERE id IN (SELECT ... LIMIT n FOR UPDATE SKIP LOCKED).
+    Rows locked by a concurrent activation or renewal are left for the
+    next batch instead of being waited on.
+
+    Returns:
+        int: Number of offers deactivated
+    """
+    with transaction.atomic():
+        batch = expired_offers(now).order_by('expiration_date').values('id')[:settings.EXPIRY_SWEEP_BATCH_SIZE]
+        return UserOffer.objects.filter(
+            id__in=batch.select_for_update(skip_locked=True)
+        ).update(is_active=False)
+
+
+@shared_task
+def deactivate_expired_offers():
+    """
+    Deactivate the user offers whose expiration date has passed, in bounded
+    batches separated by EXPIRY_SWEEP_PAUSE seconds so activations are not
+    starved of locks. A run stops after EXPIRY_SWEEP_MAX_DURATION seconds;
+    the next scheduled run picks up the rest.
+
+    Returns:
+        dict: Offers deactivated, rows/sec and the remaining lag, also kept
+        in Redis for the metrics endpoint
+    """
+    now = timezone.now()
+    lag_before = get_sweeper_lag(now)
+    start = time.monotonic()
+    deactivated = 0
+    batches = 0
+
+    while time.monotonic() - start < settings.EXPIRY_SWEEP_MAX_DURATION:
+        count = deactivate_expired_batch(now)
+        deactivated += count
+        batches += 1
+        if count < settings.EXPIRY_SWEEP_BATCH_SIZE:
+            break
+        time.sleep(settings.EXPIRY_SWEEP_PAUSE)
+
+    duration = time.monotonic() - start
+    stats = {
+        'finished_at': str(timezone.now()),
+        'deactivated': deactivated,
+        'batches': batches,
+        'duration': round(duration, 3),
+        'rows_per_sec': round(deactivated / duration, 1) if duration else 0.0,
+        'lag_before': round(lag_before, 1),
+        'lag_after': round(get_sweeper_lag(), 1),
+    }
+    redis_client.hset(SWEEPER_STATS_KEY, mapping=stats)
+    logger.info(
+        f"Deactivated {deactivated} expired user offers in {batches} batches "
+        f"({stats['rows_per_sec']} rows/sec), lag {stats['lag_before']}s -> {stats['lag_after']}s"
+    )
+    return stats
+
+
+def get_sweeper_stats():
+    """
+    Returns:
+        dict: Statistics of the last sweeper run, empty before the first one
+    """
+    return redis_client.hgetall(SWEEPER_STATS_KEY)
@@ -1,54 +1,53 @@
-from django.shortcuts import render
+from django.http import HttpResponse
 from django.utils import timezone
-from django.db.models import Q
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import Offer, UserOffer
-from .serializers import OfferSerializer, UserOfferSerializer
-from account.models import Account, Transaction
-from activation.tasks import process_activation
-from django.core.cache import cache
+from .serializers import UserOfferSerializer
+from .cache import get_offer_list_json, get_offer_json
+from account.models import Account
+from activation.services import start_activation
+from activation.idempotency import idempotent
+from config.fastpath import fast_path
 import logging
-import uuid
 
 logger = logging.getLogger(__name__)
 
 
+def fast_list_offers(request, user):
+    return get_offer_list_json()
+
+
+def fast_offer_detail(request, user, offer_id):
+    return get_offer_json(offer_id)
+
+
+@fast_path(fast_list_offers)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_offers(request):
     """
     List all available offers.
     """
-    cache_key = 'offers_list'
-    offers_data = cache.get(cache_key)
-    
-    if not offers_data:
-        offers = Offer.objects.all()
-        serializer = OfferSerializer(offers, many=True)
-        offers_data = serializer.data
-        cache.set(cache_key, offers_data, 300)  # Cache for 5 minutes
-    
-    return Response(offers_data)
+    return HttpResponse(get_offer_list_json(), content_type='application/json')
 
 
+@fast_path(fast_offer_detail)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def offer_detail(request, offer_id):
     """
     Get details of a specific offer.
     """
-    try:
-        offer = Offer.objects.get(pk=offer_id)
-        serializer = OfferSerializer(offer)
-        return Response(serializer.data)
-    except Offer.DoesNotExist:
+    content = get_offer_json(offer_id)
+    if content is None:
         return Response(
             {'error': 'Offer not found'}, 
             status=status.HTTP_404_NOT_FOUND
         )
+    return HttpResponse(content, content_type='application/json')
 
 
 @api_view(['POST'])
@@ -74,44 +73,11 @@ def activate_offer(request):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Check user's account balance
-    try:
-        account = Account.objects.get(user=user)
-        if account.balance < offer.price:
-            return Response(
-                {'error': 'Insufficient balance'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-    except Account.DoesNotExist:
-        return Response(
-            {'error': 'Account not found'}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
-    # Deduct amount from user's account
-    account.balance -= offer.price
-    account.save()
-    
-    # Create transaction record
-    transaction = Transaction.objects.create(
-        user=user,
-        offer=offer,
-        amount=offer.price,
-        transaction_id=str(uuid.uuid4()),
-        status='PENDING'
-    )
-    
-    # Create user offer record
-    user_offer = UserOffer.objects.create(
-        user=user,
-        offer=offer,
-        transaction_id=transaction,  # Use the transaction_id directly from transaction object
-        is_active=False,  # Will be activated by Celery task
-        expiration_date=timezone.now() + timezone.timedelta(days=offer.duration_days)
-    )
-    
-    # Process activation asynchronously
-    process_activation.delay(transaction.transaction_id)
+    # Debit, transaction and pending user offer are written atomically;
+    # activation is processed asynchronously once committed
+    transaction = start_activation(user, offer)
+    if transaction is None:
+        return insufficient_balance_response(user)
     
     return Response({
         'message': 'Offer activation in progress',
@@ -140,6 +106,7 @@ def expiring_offers(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def renew_offer(request):
     """
     Renew an expiring offer for the authenticated user.
@@ -161,48 +128,28 @@ def renew_offer(request):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Check user's account balance
-    try:
-        account = Account.objects.get(user=user)
-        if account.balance < offer.price:
-            return Response(
-                {'error': 'Insufficient balance'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-    except Account.DoesNotExist:
-        return Response(
-            {'error': 'Account not found'}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
-    # Deduct amount from user's account
-    account.balance -= offer.price
-    account.save()
-    
-    # Create transaction record
-    transaction = Transaction.objects.create(
-        user=user,
-        offer=offer,
-        amount=offer.price,
-        transaction_id=str(uuid.uuid4()),
-        status='PENDING'
-    )
-    
-    # Update or create user offer record
-    user_offer, created = UserOffer.objects.update_or_create(
-        user=user,
-        offer=offer,
-        defaults={
-            'transaction_id': transaction.transaction_id,
-            'is_active': False,
-            'expiration_date': timezone.now() + timezone.timedelta(days=offer.duration_days)
-        }
-    )
-    
-    # Process activation asynchronously
-    process_activation.delay(transaction.transaction_id)
+    # Debit, transaction and renewed user offer are written atomically;
+    # activation is processed asynchronously once committed
+    transaction = start_activation(user, offer, renew=True)
+    if transaction is None:
+        return insufficient_balance_response(user)
     
     return Response({
         'message': 'Offer renewal in progress',
         'transaction_id': transaction.transaction_id
-    }, status=status.HTTP_202_ACCEPTED)
\ No newline at end of file
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def insufficient_balance_response(user):
+    """
+    Build the error response for a debit that could not be applied.
+    """
+    if not Account.objects.filter(user=user).exists():
+        return Response(
+            {'error': 'Account not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(
+        {'error': 'Insufficient balance'}, 
+        status=status.HTTP_400_BAD_REQUEST
+    )
\ No newline at end of file
@@ -0,0 +1,11 @@
+from rest_framework import serializers
+from django.conf import settings
+
+
+class BulkValidationSerializer(serializers.Serializer):
+    """Serializer for a bulk validation request"""
+    references = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=settings.PARTNER_BULK_VALIDATION_MAX
+    )
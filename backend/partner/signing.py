@@ -0,0 +1,35 @@
+from django.conf import settings
+from decimal import Decimal
+import hashlib
+import hmac
+
+
+def activation_signature(reference, user_id, offer_id, amount):
+    """
+    Compute the HMAC-SHA256 signature of an activation response.
+
+    The signature binds the partner reference to the activation request it
+    answers, so that a caller holding the shared secret can trust the
+    reference without a validation round trip.
+
+    Returns:
+        str: The hex digest, or None when no signing secret is configured
+    """
+    if not settings.PARTNER_SIGNING_SECRET:
+        return None
+    amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    message = f"{reference}:{user_id}:{offer_id}:{amount}".encode()
+    return hmac.new(settings.PARTNER_SIGNING_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_activation_signature(signature, reference, user_id, offer_id, amount):
+    """
+    Check the signature of an activation response.
+
+    Returns:
+        bool: True if the signature matches the reference and request data
+    """
+    expected = activation_signature(reference, user_id, offer_id, amount)
+    if not expected or not signature:
+        return False
+    return hmac.compare_digest(expected, signature)
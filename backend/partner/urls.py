@@ -3,5 +3,6 @@ from . import views
 
 urlpatterns = [
     path('activate/', views.activate_offer, name='partner_activate'),
+    path('validate/bulk/', views.validate_transactions_bulk, name='partner_validate_bulk'),
     path('validate/<str:reference>/', views.validate_transaction, name='partner_validate'),
 ]
\ No newline at end of file
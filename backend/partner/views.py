@@ -4,6 +4,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.views.decorators.csrf import csrf_exempt
 from .models import PartnerTransaction
+from .serializers import BulkValidationSerializer
+from .signing import activation_signature
 import uuid
 import logging
 
@@ -49,13 +51,17 @@ def activate_offer(request):
         
         logger.info(f"Created partner transaction {transaction_id} with reference {reference}")
         
-        # Return reference for tracking
-        return Response({
+        # Return reference for tracking, signed so the caller can skip validation
+        response_data = {
             'reference': reference,
             'transaction_id': transaction_id,
             'status': 'PENDING',
             'message': 'Activation request received'
-        }, status=status.HTTP_201_CREATED)
+        }
+        signature = activation_signature(reference, user_id, offer_id, amount)
+        if signature:
+            response_data['signature'] = signature
+        return Response(response_data, status=status.HTTP_201_CREATED)
         
     except Exception as e:
         logger.error(f"Error in partner activation: {str(e)}")
@@ -100,4 +106,30 @@ def validate_transaction(request, reference):
         return Response(
             {'error': 'Internal server error'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def validate_transactions_bulk(request):
+    """
+    Partner API endpoint to validate many transactions by reference at once.
+    """
+    serializer = BulkValidationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    references = serializer.validated_data['references']
+    
+    try:
+        found = set(
+            PartnerTransaction.objects.filter(reference__in=references).values_list('reference', flat=True)
+        )
+        return Response({
+            'results': {reference: reference in found for reference in references}
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Error validating {len(references)} transactions: {str(e)}")
+        return Response(
+            {'error': 'Internal server error'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -2,6 +2,7 @@ import pytest
 from rest_framework import status
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 
 
 @pytest.mark.django_db
@@ -14,7 +15,7 @@ class TestAccountViews:
         response = client.get(url)
         
         assert response.status_code == status.HTTP_200_OK
-        assert float(response.data['balance']) == 75.50
+        assert float(response.json()['balance']) == 75.50
 
     def test_get_balance_no_account(self, authenticated_client):
         client, user = authenticated_client
@@ -87,4 +88,208 @@ class TestAccountViews:
         
         assert response.status_code == status.HTTP_200_OK
         assert response.data['transaction_id'] == transaction.transaction_id
-        assert response.data['status'] == 'PENDING'
\ No newline at end of file
+        assert response.data['status'] == 'PENDING'
+
+@pytest.mark.django_db
+class TestFastPath:
+    def test_balance_matches_drf_view(self, settings, authenticated_client, create_account):
+        client, user = authenticated_client
+        create_account(user, balance=1234.5)
+        
+        fast = client.get('/api/v1/account/balance/')
+        settings.FAST_PATH_ENABLED = False
+        drf = client.get('/api/v1/account/balance/')
+        
+        assert not hasattr(fast, 'data')
+        assert fast['Content-Type'] == drf['Content-Type'] == 'application/json'
+        assert fast.content == drf.content
+
+    def test_errors_fall_back_to_drf(self, authenticated_client):
+        from rest_framework.test import APIClient
+        
+        response = APIClient().get('/api/v1/account/balance/', HTTP_AUTHORIZATION='Bearer invalid')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.data['code'] == 'token_not_valid'
+        
+        client, user = authenticated_client
+        response = client.get('/api/v1/account/balance/', HTTP_ACCEPT='text/html')
+        assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+
+    def test_encoder_matches_drf_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+        from config.fastpath import dumps
+        
+        data = {'name': 'Offre été \u2028 ligne', 'amount': '10.00', 'id': 3, 'active': True, 'items': [None, {'a': 'b'}]}
+        assert dumps(data) == JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+class TestBalanceServices:
+    def test_debit_balance_success(self, create_user, create_account):
+        from account.services import debit_balance
+        
+        user = create_user()
+        account = create_account(user, balance=50.00)
+        
+        assert debit_balance(user, Decimal('20.00')) is True
+        
+        account.refresh_from_db()
+        assert account.balance == Decimal('30.00')
+
+    def test_debit_balance_insufficient(self, create_user, create_account):
+        from account.services import debit_balance
+        
+        user = create_user()
+        account = create_account(user, balance=5.00)
+        
+        assert debit_balance(user, Decimal('20.00')) is False
+        
+        account.refresh_from_db()
+        assert account.balance == Decimal('5.00')
+
+    def test_debit_balance_no_account(self, create_user):
+        from account.services import debit_balance
+        
+        user = create_user()
+        
+        assert debit_balance(user, Decimal('1.00')) is False
+
+    def test_credit_balance(self, create_user, create_account):
+        from account.services import credit_balance
+        
+        user = create_user()
+        account = create_account(user, balance=5.00)
+        
+        credit_balance(user, Decimal('20.00'))
+        
+        account.refresh_from_db()
+        assert account.balance == Decimal('25.00')
+
+    def test_credit_balance_creates_account(self, create_user):
+        from account.models import Account
+        from account.services import credit_balance
+        
+        user = create_user()
+        
+        credit_balance(user, Decimal('20.00'))
+        
+        assert Account.objects.get(user=user).balance == Decimal('20.00')
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    def create_transactions(self, user, offer, count):
+        from account.models import Transaction
+        
+        created_at = timezone.now()
+        transactions = Transaction.objects.bulk_create([
+            Transaction(user=user, offer=offer, transaction_id=f'page-{user.id}-{i}', amount=offer.price,
+                        status='SUCCESS' if i % 2 else 'PENDING')
+            for i in range(count)
+        ])
+        # Rows sharing a timestamp are ordered by id
+        Transaction.objects.filter(user=user).update(created_at=created_at)
+        return transactions
+
+    def test_transactions_paginated_by_cursor(self, authenticated_client, create_offer):
+        client, user = authenticated_client
+        transactions = self.create_transactions(user, create_offer(), 5)
+        
+        seen = []
+        url = '/api/v1/account/transactions/?page_size=2'
+        while url:
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data) <= 2
+            seen += [item['transaction_id'] for item in response.data]
+            url = response.headers.get('Link', '').partition('<')[2].partition('>')[0]
+            if url:
+                assert response['X-Next-Cursor'] in url
+        
+        assert seen == [transaction.transaction_id for transaction in reversed(transactions)]
+
+    def test_cursor_keeps_status_filter(self, authenticated_client, create_offer):
+        client, user = authenticated_client
+        self.create_transactions(user, create_offer(), 6)
+        
+        first = client.get('/api/v1/account/transactions/?status=SUCCESS&page_size=2')
+        second = client.get(f"/api/v1/account/transactions/?status=SUCCESS&page_size=2&cursor={first['X-Next-Cursor']}")
+        
+        assert len(first.data) == len(second.data) + 1 == 2
+        assert all(item['status'] == 'SUCCESS' for item in first.data + second.data)
+        assert 'X-Next-Cursor' not in second
+
+    def test_invalid_cursor(self, authenticated_client):
+        client, user = authenticated_client
+        
+        response = client.get('/api/v1/account/transactions/?cursor=not-a-cursor')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'cursor' in response.data
+
+    def test_subscriptions_paginated(self, settings, authenticated_client, create_offer):
+        from offers.models import UserOffer
+        
+        settings.ACCOUNT_PAGE_SIZE = 2
+        client, user = authenticated_client
+        offer = create_offer()
+        for i in range(3):
+            UserOffer.objects.create(
+                user=user,
+                offer=offer,
+                expiration_date=timezone.now() + timedelta(days=30),
+                transaction_id=f'subscription-{user.id}-{i}',
+                is_active=True
+            )
+        
+        first = client.get('/api/v1/account/subscriptions/')
+        second = client.get(f"/api/v1/account/subscriptions/?cursor={first['X-Next-Cursor']}")
+        
+        assert [len(first.data), len(second.data)] == [2, 1]
+        assert [item['transaction_id'] for item in first.data + second.data] == [
+            f'subscription-{user.id}-{i}' for i in (2, 1, 0)
+        ]
+
+
+@pytest.mark.django_db
+class TestAccountQueryCounts:
+    """
+    Listing endpoints run a fixed number of queries whatever the number of
+    rows: the authenticated user, then the rows with their offer joined.
+    """
+    def test_transactions_list(self, authenticated_client, create_offer, django_assert_num_queries):
+        from account.models import Transaction
+        
+        client, user = authenticated_client
+        Transaction.objects.bulk_create([
+            Transaction(user=user, offer=create_offer(name=f'Offer {i}'), transaction_id=f'count-{user.id}-{i}', amount=10)
+            for i in range(10)
+        ])
+        
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/account/transactions/')
+        assert len(response.data) == 10
+
+    def test_transaction_detail(self, authenticated_client, create_offer, django_assert_num_queries):
+        from account.models import Transaction
+        
+        client, user = authenticated_client
+        transaction = Transaction.objects.create(user=user, offer=create_offer(), transaction_id=f'count-{user.id}', amount=10)
+        
+        with django_assert_num_queries(2):
+            response = client.get(f'/api/v1/account/transactions/{transaction.transaction_id}/')
+        assert response.data['offer_details']['id'] == transaction.offer_id
+
+    def test_subscriptions(self, authenticated_client, create_offer, django_assert_num_queries):
+        from offers.models import UserOffer
+        
+        client, user = authenticated_client
+        UserOffer.objects.bulk_create([
+            UserOffer(user=user, offer=create_offer(name=f'Offer {i}'), expiration_date=timezone.now() + timedelta(days=30),
+                      transaction_id=f'count-{user.id}-{i}', is_active=True)
+            for i in range(10)
+        ])
+        
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/account/subscriptions/')
+        assert len(response.data) == 10
@@ -1,13 +1,15 @@
 import pytest
 from rest_framework import status
 from unittest.mock import patch
+import uuid
 
 
 @pytest.mark.django_db
 class TestActivationViews:
-    @patch('activation.views.process_activation.delay')
+    @patch('activation.outbox.process_activation.apply_async')
     def test_activate_offer_success(self, mock_process_activation, authenticated_client, create_offer, create_account):
-        mock_process_activation.return_value = None
+        from activation.outbox import relay_batch
+        
         
         client, user = authenticated_client
         account = create_account(user, balance=50.00)
@@ -19,6 +21,7 @@ class TestActivationViews:
         }
         
         response = client.post(url, data, format='json')
+        relay_batch()
         
         assert response.status_code == status.HTTP_202_ACCEPTED
         assert 'transaction_id' in response.data
@@ -73,7 +76,6 @@ class TestActivationViews:
 
     def test_activation_status(self, authenticated_client, create_offer):
         from account.models import Transaction
-        from activation.views import uuid
         
         client, user = authenticated_client
         offer = create_offer()
@@ -94,4 +96,1385 @@ class TestActivationViews:
         
         assert response.status_code == status.HTTP_200_OK
         assert response.data['transaction_id'] == transaction_id
-        assert response.data['status'] == 'PROCESSING'
\ No newline at end of file
+        assert response.data['status'] == 'PROCESSING'
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_activate_offer_dispatched_by_outbox_relay(self, mock_process_activation, authenticated_client, create_offer, create_account):
+        from activation.models import OutboxEvent
+        from activation.outbox import relay_batch
+        from activation.tasks import status_store
+        
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        
+        response = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json')
+        transaction_id = response.data['transaction_id']
+        status_store.client.delete(status_store.key(transaction_id))
+        
+        # The request only writes the database, the relay dispatches
+        mock_process_activation.assert_not_called()
+        assert list(OutboxEvent.objects.values_list('transaction_id', flat=True)) == [transaction_id]
+        
+        assert relay_batch() == 1
+        assert mock_process_activation.call_args.args == ((transaction_id,),)
+        assert status_store.get(transaction_id)['status'] == 'PENDING'
+        assert not OutboxEvent.objects.exists()
+        assert relay_batch() == 0
+        status_store.client.delete(status_store.key(transaction_id))
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_relay_keeps_events_when_dispatch_fails(self, mock_process_activation, authenticated_client, create_offer, create_account):
+        from activation.models import OutboxEvent
+        from activation.outbox import relay_batch
+        
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        client.post('/api/v1/activation/', {'offer_id': create_offer(price=20.00).id}, format='json')
+        mock_process_activation.side_effect = ConnectionError('broker unavailable')
+        
+        with pytest.raises(ConnectionError):
+            relay_batch()
+        
+        assert OutboxEvent.objects.count() == 1
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_activate_offer_reports_query_count(self, mock_process_activation, authenticated_client, create_offer, create_account):
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        
+        response = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json')
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        # User, offer, debit, transaction, user offer, outbox event and relay
+        # notification, plus the savepoint and release issued because the test
+        # itself runs inside a transaction
+        assert int(response['X-DB-Query-Count']) <= 9
+
+
+@pytest.mark.django_db
+class TestActivationService:
+    def test_start_activation_rolls_back_debit(self, create_user, create_offer, create_account):
+        from decimal import Decimal
+        from django.db import IntegrityError
+        from account.models import Transaction
+        from activation.models import OutboxEvent
+        from activation.services import start_activation
+        
+        user = create_user()
+        account = create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        
+        with patch('activation.services.UserOffer.objects.create', side_effect=IntegrityError):
+            with pytest.raises(IntegrityError):
+                start_activation(user, offer)
+        
+        account.refresh_from_db()
+        assert account.balance == Decimal('50.00')
+        assert not Transaction.objects.filter(user=user).exists()
+        assert not OutboxEvent.objects.exists()
+
+
+@pytest.mark.django_db
+class TestBatchActivation:
+    @pytest.fixture
+    def admin_client(self, create_user):
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import RefreshToken
+        
+        admin = create_user(username='provisioner')
+        admin.is_staff = True
+        admin.save()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(admin).access_token}')
+        return client
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_batch_activation(self, mock_process_activation, settings, admin_client, create_user, create_offer, create_account):
+        from decimal import Decimal
+        from account.models import Account, Transaction
+        from activation.outbox import relay_batch
+        from offers.models import UserOffer
+        
+        first = create_user(username='first')
+        second = create_user(username='second')
+        create_account(first, balance=50.00)
+        create_account(second, balance=15.00)
+        offer = create_offer(price=20.00)
+        
+        data = {'items': [
+            {'user_id': first.id, 'offer_id': offer.id},
+            {'user_id': first.id, 'offer_id': offer.id},
+            {'user_id': first.id, 'offer_id': offer.id},
+            {'user_id': second.id, 'offer_id': offer.id},
+            {'user_id': second.id, 'offer_id': 999},
+        ]}
+        
+        response = admin_client.post('/api/v1/activation/batch/', data, format='json')
+        relay_batch()
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['accepted'] == 2
+        assert response.data['rejected'] == 3
+        results = response.data['results']
+        assert 'transaction_id' in results[0] and 'transaction_id' in results[1]
+        assert results[2]['error'] == 'Insufficient balance'
+        assert results[3]['error'] == 'Insufficient balance'
+        assert results[4]['error'] == 'Offer not found'
+        
+        assert Account.objects.get(user=first).balance == Decimal('10.00')
+        assert Account.objects.get(user=second).balance == Decimal('15.00')
+        assert Transaction.objects.filter(status='PENDING').count() == 2
+        assert UserOffer.objects.filter(is_active=False).count() == 2
+        
+        # Accepted items are dispatched behind single activations
+        assert mock_process_activation.call_count == 2
+        assert {call.kwargs['priority'] for call in mock_process_activation.call_args_list} == {settings.ACTIVATION_BATCH_PRIORITY}
+
+    def test_batch_activation_requires_admin(self, authenticated_client):
+        client, user = authenticated_client
+        
+        response = client.post('/api/v1/activation/batch/', {'items': []}, format='json')
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_batch_activation_invalid_items(self, admin_client):
+        response = admin_client.post('/api/v1/activation/batch/', {'items': []}, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'items' in response.data
+
+
+class TestPartnerClient:
+    @pytest.fixture
+    def stub_partner(self):
+        from activation import partner_client
+        from activation.stub_partner import start_stub_partner
+        
+        partner_client.close_session()
+        server = start_stub_partner()
+        yield server
+        server.shutdown()
+        partner_client.close_session()
+
+    def test_connections_are_reused(self, stub_partner):
+        from activation import partner_client
+        
+        for _ in range(5):
+            response = partner_client.post(f"{stub_partner.base_url}/activate/", json={})
+            assert response.status_code == 201
+        
+        stats = partner_client.get_pool_stats()
+        assert stats['requests'] == 5
+        assert stats['connections_opened'] == 1
+
+    def test_requests_are_counted_across_threads(self, stub_partner):
+        from concurrent.futures import ThreadPoolExecutor
+        from activation import partner_client
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: partner_client.get(f"{stub_partner.base_url}/validate/REF-1/"), range(40)))
+        
+        assert partner_client.get_pool_stats()['requests'] == 40
+
+    def test_activate_offer_with_partner(self, stub_partner):
+        from types import SimpleNamespace
+        from activation import tasks
+        from activation.stub_partner import use_stub_partner
+        
+        transaction = SimpleNamespace(
+            transaction_id='test-transaction',
+            user=SimpleNamespace(id=1),
+            offer=SimpleNamespace(id=1),
+            amount=10
+        )
+        with use_stub_partner(stub_partner):
+            result = tasks.activate_offer_with_partner(transaction)
+        
+        assert result['success'] is True
+        assert result['reference'].startswith('REF-')
+
+
+    def test_async_activate_offer_with_partner(self, stub_partner):
+        import asyncio
+        from types import SimpleNamespace
+        from activation.async_worker import create_partner_session, async_activate_offer_with_partner
+        from activation.stub_partner import use_stub_partner
+        
+        async def activate_many():
+            async with create_partner_session() as client:
+                return await asyncio.gather(*(
+                    async_activate_offer_with_partner(client, SimpleNamespace(
+                        transaction_id=f'test-transaction-{index}',
+                        user=SimpleNamespace(id=1),
+                        offer=SimpleNamespace(id=1),
+                        amount=10
+                    ))
+                    for index in range(20)
+                ))
+        
+        with use_stub_partner(stub_partner):
+            results = asyncio.run(activate_many())
+        
+        assert all(result['success'] for result in results)
+
+
+    def test_signed_activation_skips_validation(self, settings, stub_partner):
+        from types import SimpleNamespace
+        from activation import tasks
+        from activation.stub_partner import use_stub_partner
+        
+        settings.PARTNER_SIGNING_SECRET = 'test-secret'
+        settings.PARTNER_VALIDATION_MODE = 'signed'
+        transaction = SimpleNamespace(
+            transaction_id='test-transaction',
+            user=SimpleNamespace(id=1),
+            offer=SimpleNamespace(id=1),
+            amount=10
+        )
+        
+        with use_stub_partner(stub_partner), patch.object(tasks, 'validate_partner_transaction') as mock_validate:
+            result = tasks.activate_offer_with_partner(transaction)
+        
+        assert result['success'] is True
+        mock_validate.assert_not_called()
+
+    def test_batched_validation(self, settings, stub_partner):
+        import asyncio
+        from types import SimpleNamespace
+        from activation import async_worker
+        from activation.stub_partner import use_stub_partner
+        
+        settings.PARTNER_VALIDATION_MODE = 'batch'
+        
+        async def activate_many():
+            async with async_worker.create_partner_session() as client:
+                batcher = async_worker.ReferenceValidationBatcher(client, max_size=5)
+                return await asyncio.gather(*(
+                    async_worker.async_activate_offer_with_partner(client, SimpleNamespace(
+                        transaction_id=f'test-transaction-{index}',
+                        user=SimpleNamespace(id=1),
+                        offer=SimpleNamespace(id=1),
+                        amount=10
+                    ), batcher)
+                    for index in range(10)
+                ))
+        
+        bulk_validate = async_worker.async_validate_partner_transactions
+        with use_stub_partner(stub_partner), \
+                patch.object(async_worker, 'async_validate_partner_transactions', side_effect=bulk_validate) as mock_bulk, \
+                patch.object(async_worker, 'async_validate_partner_transaction') as mock_single:
+            results = asyncio.run(activate_many())
+        
+        assert all(result['success'] for result in results)
+        mock_single.assert_not_called()
+        assert 2 <= mock_bulk.call_count < 10
+
+
+@pytest.mark.django_db
+class TestAsyncExecutionMode:
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_dispatch_to_async_queue(self, mock_process_activation, settings, authenticated_client, create_offer, create_account):
+        from activation.outbox import relay_batch
+        from activation.tasks import redis_client
+        
+        settings.PARTNER_EXECUTION_MODE = 'async'
+        settings.ACTIVATION_ASYNC_QUEUE = 'test:activation:async_queue'
+        redis_client.delete(settings.ACTIVATION_ASYNC_QUEUE)
+        
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        
+        response = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json')
+        relay_batch()
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        mock_process_activation.assert_not_called()
+        assert redis_client.lrange(settings.ACTIVATION_ASYNC_QUEUE, 0, -1) == [response.data['transaction_id']]
+        redis_client.delete(settings.ACTIVATION_ASYNC_QUEUE)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncWorker:
+    @pytest.fixture
+    def stub_partner(self):
+        from activation.stub_partner import start_stub_partner, use_stub_partner
+        
+        server = start_stub_partner()
+        with use_stub_partner(server):
+            yield server
+        server.shutdown()
+
+    @pytest.fixture
+    def queue_client(self):
+        import fakeredis
+        
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        with patch('activation.async_worker.create_async_client', return_value=client):
+            yield client
+
+    def run_worker(self, worker, queue_client, transaction_ids):
+        import asyncio
+        from asgiref.sync import sync_to_async
+        from django.db import connections
+        from account.models import Transaction
+        
+        async def run_until_done():
+            run = asyncio.create_task(worker.run())
+            pending = Transaction.objects.filter(transaction_id__in=transaction_ids).exclude(status='SUCCESS')
+            for _ in range(200):
+                if not await sync_to_async(pending.exists)():
+                    break
+                await asyncio.sleep(0.05)
+            worker.stop()
+            await asyncio.wait_for(run, timeout=5)
+            await sync_to_async(connections.close_all)()
+        
+        with patch('activation.notifications.deliver_notifications.apply_async'):
+            asyncio.run(run_until_done())
+
+    def test_worker_processes_queued_activations(self, settings, stub_partner, queue_client, create_user, create_offer, create_account):
+        import asyncio
+        from account.models import Transaction
+        from activation.async_worker import AsyncActivationWorker
+        from activation.services import start_activation
+        from offers.models import UserOffer
+        
+        user = create_user()
+        create_account(user, balance=50.00)
+        offer = create_offer(price=10.00)
+        transaction_ids = [start_activation(user, offer).transaction_id for _ in range(3)]
+        worker = AsyncActivationWorker(concurrency=2, queue='test:activation:async_queue')
+        asyncio.run(queue_client.rpush(worker.queue, *transaction_ids))
+        
+        self.run_worker(worker, queue_client, transaction_ids)
+        
+        assert set(Transaction.objects.filter(transaction_id__in=transaction_ids).values_list('status', flat=True)) == {'SUCCESS'}
+        assert UserOffer.objects.filter(transaction_id__in=transaction_ids, is_active=True).count() == 3
+        # Completed activations leave the processing list, the stopped worker unregisters
+        assert asyncio.run(queue_client.llen(worker.processing)) == 0
+        assert asyncio.run(queue_client.smembers(worker.workers_key)) == set()
+
+    def test_activations_of_dead_worker_are_recovered(self, settings, stub_partner, queue_client, create_user, create_offer, create_account):
+        import asyncio
+        from account.models import Transaction
+        from activation.async_worker import AsyncActivationWorker
+        from activation.services import start_activation
+        
+        user = create_user()
+        create_account(user, balance=50.00)
+        offer = create_offer(price=10.00)
+        transaction_ids = [start_activation(user, offer).transaction_id for _ in range(3)]
+        worker = AsyncActivationWorker(concurrency=2, queue='test:activation:async_queue', worker_id='worker-1')
+        
+        async def crash():
+            # worker-1 died holding one id; worker-2 died holding the others
+            await queue_client.rpush(worker.processing_key('worker-1'), transaction_ids[0])
+            await queue_client.rpush(worker.processing_key('worker-2'), *transaction_ids[1:])
+            await queue_client.sadd(worker.workers_key, 'worker-1', 'worker-2')
+        
+        asyncio.run(crash())
+        self.run_worker(worker, queue_client, transaction_ids)
+        
+        assert set(Transaction.objects.filter(transaction_id__in=transaction_ids).values_list('status', flat=True)) == {'SUCCESS'}
+        assert asyncio.run(queue_client.exists(worker.processing_key('worker-2'), worker.queue)) == 0
+
+
+    def test_heartbeat_outlives_busy_slots(self, settings, queue_client):
+        import asyncio
+        from activation.async_worker import AsyncActivationWorker
+        
+        settings.ACTIVATION_ASYNC_HEARTBEAT_INTERVAL = 0.1
+        settings.ACTIVATION_ASYNC_HEARTBEAT_TTL = 1
+        worker = AsyncActivationWorker(concurrency=1, queue='test:activation:async_queue', worker_id='worker-1')
+        
+        async def slow_activation(client, transaction_id, batcher=None):
+            await asyncio.sleep(2)
+        
+        async def run_while_busy():
+            await queue_client.rpush(worker.queue, 'slow-1')
+            run = asyncio.create_task(worker.run())
+            await asyncio.sleep(1.5)
+            # The only slot is still busy, past the heartbeat TTL
+            alive = await queue_client.exists(worker.heartbeat_key('worker-1'))
+            held = await queue_client.lrange(worker.processing, 0, -1)
+            worker.stop()
+            await asyncio.wait_for(run, timeout=5)
+            return alive, held
+        
+        with patch('activation.async_worker.process_activation_async', side_effect=slow_activation):
+            alive, held = asyncio.run(run_while_busy())
+        
+        assert alive and held == ['slow-1']
+
+    def test_partner_wait_is_capped(self, settings):
+        import asyncio
+        from types import SimpleNamespace
+        from activation.async_worker import guarded_partner_call
+        
+        settings.PARTNER_MAX_DEFERRALS = 2
+        settings.PARTNER_DEFER_COUNTDOWN = 0
+        with patch('activation.async_worker.acquire_partner_slot', return_value=None) as mock_acquire, \
+                patch('activation.async_worker.async_activate_offer_with_partner') as mock_activate:
+            result = asyncio.run(guarded_partner_call(None, SimpleNamespace(transaction_id='deferred-1')))
+        
+        assert result == {'success': False, 'error': 'Partner activation system unavailable'}
+        assert mock_acquire.call_count == 3
+        mock_activate.assert_not_called()
+
+class TestPartnerProtection:
+    @pytest.fixture
+    def breaker(self, settings):
+        from activation.circuit_breaker import CircuitBreaker
+        from activation.tasks import redis_client
+        
+        settings.PARTNER_BREAKER_MIN_CALLS = 4
+        settings.PARTNER_BREAKER_ERROR_RATE = 0.5
+        breaker = CircuitBreaker(redis_client, 'test')
+        breaker.close()
+        redis_client.delete(breaker.window_key(), breaker.key('trips'))
+        yield breaker
+        breaker.close()
+        redis_client.delete(breaker.window_key(), breaker.key('trips'))
+
+    @pytest.fixture
+    def limiter(self, settings):
+        from activation.circuit_breaker import AdaptiveConcurrencyLimiter
+        from activation.tasks import redis_client
+        
+        settings.PARTNER_LIMITER_INITIAL = 2
+        limiter = AdaptiveConcurrencyLimiter(redis_client, 'test')
+        redis_client.delete(limiter.limit_key, limiter.in_flight_key)
+        yield limiter
+        redis_client.delete(limiter.limit_key, limiter.in_flight_key)
+
+    def test_breaker_trips_and_recovers(self, breaker):
+        for healthy in (True, False, True, False):
+            assert breaker.allow_request()
+            breaker.record(healthy)
+        
+        assert breaker.get_state()['state'] == 'open'
+        assert not breaker.allow_request()
+        
+        # Once the cooldown is over a single probe is let through
+        breaker.client.delete(breaker.key('open'))
+        probe = breaker.allow_request()
+        assert probe
+        assert not breaker.allow_request()
+        breaker.record(True, probe)
+        
+        state = breaker.get_state()
+        assert state['state'] == 'closed'
+        assert state['trips'] == 1
+
+    def test_breaker_reopens_on_failed_probe(self, breaker):
+        breaker.trip('test')
+        breaker.client.delete(breaker.key('open'))
+        
+        probe = breaker.allow_request()
+        breaker.record(False, probe)
+        
+        assert breaker.get_state()['state'] == 'open'
+
+    def test_breaker_ignores_calls_in_flight_when_opened(self, breaker):
+        permit = breaker.allow_request()
+        breaker.trip('test')
+        
+        breaker.record(True, permit)
+        assert breaker.get_state()['state'] == 'open'
+        
+        # Nor can they close the circuit while a probe is running
+        breaker.client.delete(breaker.key('open'))
+        probe = breaker.allow_request()
+        breaker.record(True, permit)
+        assert breaker.get_state()['state'] == 'half_open'
+        breaker.record(True, probe)
+        assert breaker.get_state()['state'] == 'closed'
+
+    def test_limiter_bounds_calls_in_flight(self, limiter):
+        first = limiter.acquire()
+        second = limiter.acquire()
+        assert first and second
+        assert limiter.acquire() is None
+        
+        limiter.release(first, True)
+        assert limiter.get_state() == {'limit': 2.5, 'in_flight': 1}
+        
+        limiter.release(second, False)
+        assert limiter.get_state() == {'limit': 1.25, 'in_flight': 0}
+        assert limiter.acquire()
+        assert limiter.acquire() is None
+
+    def test_limiter_reclaims_expired_leases(self, limiter):
+        leaked = limiter.acquire()
+        limiter.acquire()
+        assert limiter.acquire() is None
+        
+        # A worker crashed holding a slot: its lease expires
+        limiter.leases.client.zadd(limiter.in_flight_key, {leaked: 0})
+        lease = limiter.acquire()
+        assert lease
+        
+        # Releasing twice, or after expiry, never frees more than was taken
+        limiter.release(leaked)
+        limiter.release(lease)
+        limiter.release(lease)
+        assert limiter.get_state()['in_flight'] == 1
+        assert limiter.acquire()
+        assert limiter.acquire() is None
+
+    def test_lease_outlives_slowest_call(self, settings, limiter):
+        # Activation POST and validation GET, both timing out
+        slowest_call = 2 * (settings.PARTNER_CONNECT_TIMEOUT + settings.PARTNER_READ_TIMEOUT)
+        assert limiter.leases.ttl > slowest_call
+
+    @pytest.mark.django_db
+    def test_activation_refunded_when_partner_stays_unavailable(self, settings, create_user, create_offer, create_account):
+        from decimal import Decimal
+        from account.models import Account
+        from activation.services import start_activation
+        from activation.tasks import process_activation
+        
+        user = create_user()
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        transaction = start_activation(user, offer)
+        
+        with patch('activation.tasks.acquire_partner_slot', return_value=None), \
+                patch('activation.tasks.activate_offer_with_partner') as mock_partner:
+            process_activation.apply(args=[transaction.transaction_id], kwargs={'deferrals': settings.PARTNER_MAX_DEFERRALS})
+        
+        mock_partner.assert_not_called()
+        transaction.refresh_from_db()
+        assert transaction.status == 'FAILED'
+        assert Account.objects.get(user=user).balance == Decimal('50.00')
+
+    @pytest.mark.django_db
+    def test_duplicate_task_does_not_undo_success(self, settings, create_user, create_offer, create_account):
+        from decimal import Decimal
+        from account.models import Account
+        from activation.services import start_activation
+        from activation.tasks import process_activation
+        
+        user = create_user()
+        create_account(user, balance=50.00)
+        transaction = start_activation(user, create_offer(price=20.00))
+        transaction.status = 'SUCCESS'
+        transaction.save()
+        
+        # A duplicate delivery giving up on the partner after its deferrals
+        with patch('activation.tasks.acquire_partner_slot', return_value=None), \
+                patch('activation.tasks.enqueue_notification') as mock_notify, \
+                patch('activation.tasks.enqueue_activation_event') as mock_webhook:
+            process_activation.apply(args=[transaction.transaction_id], kwargs={'deferrals': settings.PARTNER_MAX_DEFERRALS})
+        
+        transaction.refresh_from_db()
+        assert transaction.status == 'SUCCESS'
+        assert Account.objects.get(user=user).balance == Decimal('30.00')
+        mock_notify.assert_not_called()
+        mock_webhook.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_duplicate_dispatch_is_processed_once(self, create_user, create_offer, create_account):
+        from decimal import Decimal
+        from account.models import Account
+        from activation.services import start_activation
+        from activation.tasks import process_activation, begin_activation
+        
+        user = create_user()
+        create_account(user, balance=50.00)
+        transaction = start_activation(user, create_offer(price=20.00))
+        
+        # The first delivery claimed the transaction and is calling the partner
+        assert begin_activation(transaction.transaction_id) is not None
+        with patch('activation.tasks.acquire_partner_slot', return_value={'permit': True, 'lease': None}), \
+                patch('activation.tasks.release_partner_slot'), \
+                patch('activation.tasks.activate_offer_with_partner', return_value={'success': False, 'error': 'Rejected'}) as mock_partner, \
+                patch('activation.tasks.enqueue_notification') as mock_notify:
+            process_activation.apply(args=[transaction.transaction_id])
+            mock_partner.assert_not_called()
+            
+            # Once it completes, a late duplicate neither calls the partner nor refunds again
+            process_activation.apply(args=[transaction.transaction_id], kwargs={'attempt': 2})
+            process_activation.apply(args=[transaction.transaction_id])
+        
+        transaction.refresh_from_db()
+        assert transaction.status == 'FAILED'
+        assert mock_partner.call_count == 1
+        mock_notify.assert_called_once()
+        assert Account.objects.get(user=user).balance == Decimal('50.00')
+
+    @pytest.mark.django_db
+    def test_metrics_requires_admin(self, settings, authenticated_client):
+        client, user = authenticated_client
+        
+        response = client.get('/api/v1/activation/metrics/')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        
+        user.is_staff = True
+        user.save()
+        response = client.get('/api/v1/activation/metrics/')
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data['partner']) == {'circuit', 'limiter', 'retry_budget', 'pool'}
+        assert 'connection_reuse_ratio' in response.data['partner']['pool']
+        assert response.data['redis']['text']['max_connections'] == settings.REDIS_MAX_CONNECTIONS
+        assert response.data['cache']['l1']['max_entries'] == settings.CACHE_L1_MAX_ENTRIES
+
+    def test_shared_pool_pipeline(self):
+        from config.redis_client import pipeline, redis_client, get_pool_stats
+        
+        with pipeline() as pipe:
+            pipe.set('test:pipeline', 1, ex=10)
+            pipe.get('test:pipeline')
+        
+        assert pipe.results == [True, '1']
+        stats = get_pool_stats()['text']
+        assert stats['in_use'] == 0
+        assert 1 <= stats['created'] <= stats['max_connections']
+        redis_client.delete('test:pipeline')
+
+
+class TestActivationRetries:
+    @pytest.fixture
+    def budget(self, settings):
+        from activation.retry import RetryBudget
+        from activation.tasks import redis_client
+        
+        settings.PARTNER_RETRY_BUDGET_MIN = 2
+        settings.PARTNER_RETRY_BUDGET_RATIO = 0.1
+        budget = RetryBudget(redis_client, 'test')
+        redis_client.delete(budget.window_key())
+        yield budget
+        redis_client.delete(budget.window_key())
+
+    @pytest.fixture
+    def pending_transaction(self, create_user, create_offer, create_account):
+        from activation.services import start_activation
+        
+        user = create_user()
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        return start_activation(user, offer)
+
+    @pytest.fixture
+    def partner_slot(self):
+        with patch('activation.tasks.acquire_partner_slot', return_value=True), \
+                patch('activation.tasks.release_partner_slot'):
+            yield
+
+    def test_backoff_is_jittered_and_capped(self, settings):
+        from activation.retry import backoff_delay
+        
+        settings.PARTNER_RETRY_BACKOFF_BASE = 1.0
+        settings.PARTNER_RETRY_BACKOFF_CAP = 10.0
+        
+        delays = [backoff_delay(2) for _ in range(100)]
+        assert all(0 <= delay <= 4.0 for delay in delays)
+        assert len(set(delays)) > 1
+        assert all(backoff_delay(10) <= 10.0 for _ in range(100))
+
+    def test_retry_budget_is_a_share_of_attempts(self, budget):
+        assert budget.try_spend()
+        assert budget.try_spend()
+        assert not budget.try_spend()
+        
+        for _ in range(30):
+            budget.record_attempt()
+        assert budget.try_spend()
+        assert not budget.try_spend()
+        assert budget.get_state() == {'window_attempts': 30, 'window_retries': 3}
+
+    @pytest.mark.django_db
+    def test_transient_failure_is_retried(self, pending_transaction, partner_slot):
+        from activation.tasks import process_activation
+        
+        results = [
+            {'success': False, 'error': 'Timeout calling partner activation system', 'partner_unavailable': True},
+            {'success': True, 'reference': 'REF-1', 'data': {}},
+        ]
+        with patch('activation.tasks.activate_offer_with_partner', side_effect=results) as mock_partner, \
+                patch('activation.tasks.backoff_delay', return_value=0) as mock_backoff:
+            process_activation.apply(args=[pending_transaction.transaction_id])
+        
+        assert mock_partner.call_count == 2
+        mock_backoff.assert_called_once_with(1)
+        pending_transaction.refresh_from_db()
+        assert pending_transaction.status == 'SUCCESS'
+
+    @pytest.mark.django_db
+    def test_permanent_failure_is_not_retried(self, pending_transaction, partner_slot):
+        from decimal import Decimal
+        from account.models import Account
+        from activation.tasks import process_activation
+        
+        result = {'success': False, 'error': 'Partner system error: 400 - Missing required fields'}
+        with patch('activation.tasks.activate_offer_with_partner', return_value=result) as mock_partner:
+            process_activation.apply(args=[pending_transaction.transaction_id])
+        
+        mock_partner.assert_called_once()
+        pending_transaction.refresh_from_db()
+        assert pending_transaction.status == 'FAILED'
+        assert Account.objects.get(user=pending_transaction.user).balance == Decimal('50.00')
+
+    @pytest.mark.django_db
+    def test_no_retry_without_budget(self, pending_transaction, partner_slot):
+        from activation.tasks import process_activation
+        
+        result = {'success': False, 'error': 'Partner system error: 503 - Unknown error', 'partner_unavailable': True}
+        with patch('activation.tasks.activate_offer_with_partner', return_value=result) as mock_partner, \
+                patch('activation.tasks.partner_retry_budget.try_spend', return_value=False):
+            process_activation.apply(args=[pending_transaction.transaction_id])
+        
+        mock_partner.assert_called_once()
+        pending_transaction.refresh_from_db()
+        assert pending_transaction.status == 'FAILED'
+
+
+@pytest.mark.django_db
+class TestIdempotencyKey:
+    @pytest.fixture
+    def idempotency_key(self):
+        import uuid
+        return str(uuid.uuid4())
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_retry_replays_response(self, mock_process_activation, authenticated_client, create_offer, create_account, idempotency_key):
+        from decimal import Decimal
+        from account.models import Account, Transaction
+        from activation.outbox import relay_batch
+        
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        
+        first = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        second = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        relay_batch()
+        
+        assert first.status_code == second.status_code == status.HTTP_202_ACCEPTED
+        assert second.data == first.data
+        assert second['Idempotent-Replayed'] == 'true'
+        assert Transaction.objects.filter(user=user).count() == 1
+        assert Account.objects.get(user=user).balance == Decimal('30.00')
+        mock_process_activation.assert_called_once()
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_replay_falls_back_to_database(self, mock_process_activation, authenticated_client, create_offer, create_account, idempotency_key):
+        from activation.tasks import redis_client
+        from account.models import Transaction
+        
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        
+        first = client.post('/api/v1/offers/renew/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        redis_client.delete(f"idempotency:{user.id}:/api/v1/offers/renew/:{idempotency_key}")
+        second = client.post('/api/v1/offers/renew/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        
+        assert first.status_code == status.HTTP_202_ACCEPTED
+        assert second.data == first.data
+        assert Transaction.objects.filter(user=user).count() == 1
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_key_reused_with_other_body(self, mock_process_activation, authenticated_client, create_offer, create_account, idempotency_key):
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        other_offer = create_offer(name='Other offer', price=10.00)
+        
+        client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        response = client.post('/api/v1/activation/', {'offer_id': other_offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_response_stored_while_waiting_for_lock(self, mock_process_activation, authenticated_client, create_offer, create_account, idempotency_key):
+        from decimal import Decimal
+        from account.models import Account, Transaction
+        from activation import idempotency
+        
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        first = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        
+        # The retry looked before the first request stored its response
+        lookup = idempotency.get_stored_response
+        lookups = []
+        
+        def stale_first_lookup(*args):
+            lookups.append(args)
+            return None if len(lookups) == 1 else lookup(*args)
+        
+        with patch.object(idempotency, 'get_stored_response', side_effect=stale_first_lookup):
+            second = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        
+        assert second.data == first.data
+        assert Transaction.objects.filter(user=user).count() == 1
+        assert Account.objects.get(user=user).balance == Decimal('30.00')
+
+    def test_request_in_progress(self, authenticated_client, create_offer, idempotency_key):
+        from activation.tasks import redis_client
+        
+        client, user = authenticated_client
+        offer = create_offer(price=20.00)
+        lock_key = f"idempotency:{user.id}:/api/v1/activation/:{idempotency_key}:lock"
+        redis_client.set(lock_key, 1, ex=30)
+        
+        response = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        
+        assert response.status_code == status.HTTP_409_CONFLICT
+        redis_client.delete(lock_key)
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_expired_lock_of_other_request_is_kept(self, mock_process_activation, authenticated_client, create_offer, create_account, idempotency_key):
+        from activation.services import start_activation
+        from activation.tasks import redis_client
+        
+        client, user = authenticated_client
+        create_account(user, balance=50.00)
+        offer = create_offer(price=20.00)
+        lock_key = f"idempotency:{user.id}:/api/v1/activation/:{idempotency_key}:lock"
+        
+        def slow_activation(*args, **kwargs):
+            # The lock expired while the view ran and a retry took it
+            redis_client.set(lock_key, 'retry-token', ex=30)
+            return start_activation(*args, **kwargs)
+        
+        with patch('activation.views.start_activation', side_effect=slow_activation):
+            response = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert redis_client.get(lock_key) == 'retry-token'
+        redis_client.delete(lock_key)
+
+    @patch('activation.outbox.process_activation.apply_async')
+    def test_errors_are_not_replayed(self, mock_process_activation, authenticated_client, create_offer, create_account, idempotency_key):
+        from account.models import Account
+        
+        client, user = authenticated_client
+        create_account(user, balance=10.00)
+        offer = create_offer(price=20.00)
+        
+        first = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        Account.objects.filter(user=user).update(balance=50.00)
+        second = client.post('/api/v1/activation/', {'offer_id': offer.id}, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+        
+        assert first.status_code == status.HTTP_400_BAD_REQUEST
+        assert second.status_code == status.HTTP_202_ACCEPTED
+
+
+@pytest.mark.django_db
+class TestActivationQueryCounts:
+    @pytest.fixture
+    def pending_transaction(self, create_user, create_offer, create_account):
+        from activation.services import start_activation
+        
+        user = create_user()
+        create_account(user, balance=50.00)
+        return start_activation(user, create_offer(price=20.00))
+
+    @pytest.fixture
+    def partner_slot(self):
+        with patch('activation.tasks.acquire_partner_slot', return_value=True), \
+                patch('activation.tasks.release_partner_slot'):
+            yield
+
+    def test_successful_activation(self, pending_transaction, partner_slot, django_assert_num_queries):
+        from activation.tasks import process_activation
+        
+        result = {'success': True, 'reference': 'REF-1', 'data': {}}
+        with patch('activation.tasks.activate_offer_with_partner', return_value=result), \
+                django_assert_num_queries(5):
+            # Load with user and offer, PROCESSING, SUCCESS, activate the user offer, webhook endpoints
+            process_activation.apply(args=[pending_transaction.transaction_id])
+
+    def test_failed_activation(self, pending_transaction, partner_slot, django_assert_num_queries):
+        from activation.tasks import process_activation
+        
+        result = {'success': False, 'error': 'Partner system error: 400 - Missing required fields'}
+        with patch('activation.tasks.activate_offer_with_partner', return_value=result), \
+                django_assert_num_queries(5):
+            # Load with user and offer, PROCESSING, FAILED, refund, webhook endpoints
+            process_activation.apply(args=[pending_transaction.transaction_id])
+
+    def test_duplicate_dispatch_is_ignored(self, pending_transaction, partner_slot, django_assert_num_queries):
+        from activation.tasks import process_activation
+        
+        pending_transaction.status = 'SUCCESS'
+        pending_transaction.save()
+        # The conditional claim, then the load telling a completed transaction from a missing one
+        with patch('activation.tasks.activate_offer_with_partner') as mock_partner, \
+                django_assert_num_queries(2):
+            process_activation.apply(args=[pending_transaction.transaction_id])
+        mock_partner.assert_not_called()
+
+    def test_status_from_database(self, authenticated_client, create_offer, django_assert_num_queries):
+        from account.models import Transaction
+        from activation.tasks import redis_client
+        
+        client, user = authenticated_client
+        transaction = Transaction.objects.create(user=user, offer=create_offer(), transaction_id=f'status-{user.id}', amount=10)
+        redis_client.delete(f"transaction:{transaction.transaction_id}")
+        
+        with django_assert_num_queries(2):
+            response = client.get(f'/api/v1/activation/status/{transaction.transaction_id}/')
+        assert response.data['offer_details']['id'] == transaction.offer_id
+
+
+class TestCeleryRouting:
+    def route(self, task_name, **options):
+        from config.celery import app
+        
+        return app.amqp.router.route(options, task_name)
+
+    def test_tasks_routed_to_dedicated_queues(self):
+        assert self.route('activation.tasks.process_activation')['queue'].name == 'activation'
+        assert self.route('activation.tasks.send_expiry_notifications')['queue'].name == 'notifications'
+        assert self.route('activation.notifications.deliver_notifications')['queue'].name == 'notifications'
+        assert self.route('activation.tasks.check_expiring_offers')['queue'].name == 'maintenance'
+        assert self.route('offers.tasks.deactivate_expired_offers')['queue'].name == 'maintenance'
+        assert self.route('activation.webhooks.deliver_webhooks')['queue'].name == 'webhooks'
+
+    def test_batch_activations_yield_to_single_ones(self, settings):
+        assert self.route('activation.tasks.process_activation')['priority'] == 0
+        assert self.route('activation.tasks.process_activation', priority=settings.ACTIVATION_BATCH_PRIORITY)['priority'] > 0
+
+    def test_beat_schedule_tasks_exist(self):
+        from config.celery import app
+        
+        app.loader.import_default_modules()
+        for entry in app.conf.beat_schedule.values():
+            assert entry['task'] in app.tasks
+            assert self.route(entry['task'])['queue'].name == 'maintenance'
+
+
+class TestStatusStateMachine:
+    @pytest.fixture
+    def store(self):
+        from activation.tasks import status_store
+        
+        transaction_id = f'state-{uuid.uuid4()}'
+        yield status_store, transaction_id
+        status_store.client.delete(status_store.key(transaction_id))
+
+    def test_final_status_is_never_overwritten(self, store):
+        status_store, transaction_id = store
+        
+        assert status_store.transition(transaction_id, {'status': 'PENDING'})
+        assert status_store.transition(transaction_id, {'status': 'PROCESSING'})
+        assert status_store.transition(transaction_id, {'status': 'SUCCESS', 'reference': 'REF-1'})
+        # A late retry or failure handler must not undo the success
+        assert not status_store.transition(transaction_id, {'status': 'FAILED', 'error_message': 'late'})
+        assert not status_store.transition(transaction_id, {'status': 'PROCESSING'})
+        
+        assert status_store.get(transaction_id) == {'status': 'SUCCESS', 'reference': 'REF-1'}
+
+    def test_transitions_set_ttl(self, settings, store):
+        status_store, transaction_id = store
+        
+        status_store.transition(transaction_id, {'status': 'PENDING'})
+        assert 0 < status_store.client.ttl(status_store.key(transaction_id)) <= settings.ACTIVATION_STATUS_TTL
+        status_store.transition(transaction_id, {'status': 'FAILED'})
+        assert 0 < status_store.client.ttl(status_store.key(transaction_id)) <= settings.ACTIVATION_FINAL_STATUS_TTL
+
+    def test_pipelined_transitions(self, store):
+        from config.redis_client import pipeline
+        
+        status_store, transaction_id = store
+        with pipeline() as pipe:
+            status_store.transition(transaction_id, {'status': 'FAILED'}, pipe=pipe)
+            status_store.transition(transaction_id, {'status': 'SUCCESS'}, pipe=pipe)
+        
+        assert pipe.results == [[1, ''], [0, 'FAILED']]
+
+    @pytest.mark.django_db
+    def test_status_fast_path_matches_drf_view(self, settings, store, authenticated_client):
+        status_store, transaction_id = store
+        client, user = authenticated_client
+        status_store.transition(transaction_id, {'status': 'SUCCESS', 'user_id': str(user.id), 'reference': 'Réf\u2028'})
+        
+        fast = client.get(f'/api/v1/activation/status/{transaction_id}/')
+        settings.FAST_PATH_ENABLED = False
+        drf = client.get(f'/api/v1/activation/status/{transaction_id}/')
+        
+        assert fast.status_code == status.HTTP_200_OK
+        assert fast.content == drf.content
+
+    @pytest.mark.django_db
+    def test_status_of_other_user_is_not_served(self, settings, store, authenticated_client):
+        status_store, transaction_id = store
+        client, user = authenticated_client
+        status_store.transition(transaction_id, {'status': 'SUCCESS', 'user_id': str(user.id + 1)})
+        
+        fast = client.get(f'/api/v1/activation/status/{transaction_id}/')
+        settings.FAST_PATH_ENABLED = False
+        drf = client.get(f'/api/v1/activation/status/{transaction_id}/')
+        
+        assert fast.status_code == drf.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.django_db
+    def test_status_fast_path_applies_throttles(self, store, authenticated_client):
+        from rest_framework.throttling import BaseThrottle
+        from activation.views import activation_status
+        
+        class DenyAll(BaseThrottle):
+            def allow_request(self, request, view):
+                return False
+        
+        status_store, transaction_id = store
+        client, user = authenticated_client
+        status_store.transition(transaction_id, {'status': 'SUCCESS', 'user_id': str(user.id)})
+        
+        with patch.object(activation_status.drf_view.cls, 'throttle_classes', [DenyAll]):
+            response = client.get(f'/api/v1/activation/status/{transaction_id}/')
+        
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+@pytest.mark.django_db
+class TestActivationStatusStream:
+    def read_events(self, response):
+        import json
+        
+        events = []
+        for chunk in response.streaming_content:
+            for block in chunk.decode().split('\n\n'):
+                lines = dict(line.split(': ', 1) for line in block.splitlines() if line.startswith(('event', 'data')))
+                if lines.get('event') == 'status':
+                    events.append(json.loads(lines['data']))
+        return events
+
+    def create_transaction(self, user, offer, status='PENDING'):
+        from account.models import Transaction
+        from activation.tasks import publish_status, status_store
+        
+        transaction = Transaction.objects.create(user=user, offer=offer, transaction_id=f'stream-{user.id}', amount=10)
+        # Final statuses of earlier runs are never overwritten
+        status_store.client.delete(status_store.key(transaction.transaction_id))
+        publish_status(transaction.transaction_id, {'status': status, 'updated_at': 'now'})
+        return transaction
+
+    def test_final_status_ends_stream(self, authenticated_client, create_offer):
+        client, user = authenticated_client
+        transaction = self.create_transaction(user, create_offer(), status='SUCCESS')
+        
+        response = client.get(f'/api/v1/activation/status/{transaction.transaction_id}/stream/', HTTP_ACCEPT='text/event-stream')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'text/event-stream'
+        assert [event['status'] for event in self.read_events(response)] == ['SUCCESS']
+
+    def test_transitions_are_pushed(self, settings, authenticated_client, create_offer):
+        import threading
+        from activation.tasks import publish_status
+        
+        settings.ACTIVATION_STREAM_KEEPALIVE = 1
+        client, user = authenticated_client
+        transaction = self.create_transaction(user, create_offer())
+        
+        response = client.get(f'/api/v1/activation/status/{transaction.transaction_id}/stream/', HTTP_ACCEPT='text/event-stream')
+        
+        def worker():
+            publish_status(transaction.transaction_id, {'status': 'PROCESSING', 'updated_at': 'now'})
+            publish_status(transaction.transaction_id, {'status': 'SUCCESS', 'updated_at': 'now', 'reference': 'REF-1'})
+        threading.Timer(0.2, worker).start()
+        
+        events = self.read_events(response)
+        assert [event['status'] for event in events] == ['PENDING', 'PROCESSING', 'SUCCESS']
+        assert events[-1]['reference'] == 'REF-1'
+
+    def test_stream_of_other_user(self, authenticated_client, create_user, create_offer):
+        client, user = authenticated_client
+        transaction = self.create_transaction(create_user(username='other'), create_offer())
+        
+        response = client.get(f'/api/v1/activation/status/{transaction.transaction_id}/stream/', HTTP_ACCEPT='text/event-stream')
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_streams_over_the_limit_are_refused(self, authenticated_client, create_offer):
+        import redis
+        from activation.tasks import publish_status
+        from config.redis_client import connection_kwargs, redis_client
+        
+        client, user = authenticated_client
+        transaction = self.create_transaction(user, create_offer())
+        url = f'/api/v1/activation/status/{transaction.transaction_id}/stream/'
+        pool = redis.BlockingConnectionPool(max_connections=1, timeout=0, decode_responses=True, **connection_kwargs())
+        
+        with patch('activation.views.get_stream_client', return_value=redis.Redis(connection_pool=pool)):
+            opened = client.get(url, HTTP_ACCEPT='text/event-stream')
+            refused = client.get(url, HTTP_ACCEPT='text/event-stream')
+            # The shared pool is not used by streams
+            assert redis_client.ping()
+            
+            assert opened.status_code == status.HTTP_200_OK
+            assert refused.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert refused['Retry-After'] == '1'
+            
+            # Once the stream ends its connection goes back to the pool
+            publish_status(transaction.transaction_id, {'status': 'SUCCESS', 'updated_at': 'now'})
+            assert self.read_events(opened)[-1]['status'] == 'SUCCESS'
+            assert client.get(url, HTTP_ACCEPT='text/event-stream').status_code == status.HTTP_200_OK
+        pool.disconnect()
+
+
+@pytest.mark.django_db
+class TestWebhooks:
+    @pytest.fixture(autouse=True)
+    def public_dns(self):
+        with patch('activation.webhooks.resolve_host', return_value={'93.184.216.34'}) as mock_resolve:
+            yield mock_resolve
+
+    @pytest.fixture
+    def endpoint(self, create_user):
+        from activation.models import WebhookEndpoint
+        from activation import webhooks
+        
+        endpoint = WebhookEndpoint.objects.create(user=create_user(), url='https://hooks.example.com/activations', secret='s3cret')
+        keys = [key(endpoint.id) for key in (webhooks.scheduled_key, webhooks.in_flight_key, webhooks.dead_letter_key)]
+        webhooks.drop_endpoint_events(endpoint.id)
+        webhooks.redis_client.delete(*keys)
+        yield endpoint
+        webhooks.drop_endpoint_events(endpoint.id)
+        webhooks.redis_client.delete(*keys)
+
+    def complete(self, endpoint, create_offer, count):
+        from django.utils import timezone
+        from account.models import Transaction
+        from activation.webhooks import enqueue_activation_event
+        
+        offer = create_offer()
+        for i in range(count):
+            transaction = Transaction.objects.create(
+                user=endpoint.user, offer=offer, transaction_id=f'hook-{endpoint.id}-{i}', amount=10,
+                status='SUCCESS', completed_at=timezone.now()
+            )
+            enqueue_activation_event(transaction, {'success': True, 'reference': f'REF-{i}'})
+
+    def test_register_and_delete_endpoint(self, authenticated_client, create_user):
+        from activation.models import WebhookEndpoint
+        
+        client, user = authenticated_client
+        response = client.post('/api/v1/activation/webhooks/', {'url': 'https://hooks.example.com/in'}, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data['secret']) == 64
+        listed = client.get('/api/v1/activation/webhooks/').data
+        assert [item['id'] for item in listed] == [response.data['id']]
+        assert 'secret' not in listed[0]
+        
+        other = WebhookEndpoint.objects.create(user=create_user(username='other'), url='https://other.example.com', secret='x')
+        assert client.delete(f'/api/v1/activation/webhooks/{other.id}/').status_code == status.HTTP_404_NOT_FOUND
+        assert client.delete(f"/api/v1/activation/webhooks/{response.data['id']}/").status_code == status.HTTP_204_NO_CONTENT
+
+    def test_internal_urls_are_rejected(self, authenticated_client, public_dns):
+        client, user = authenticated_client
+        
+        response = client.post('/api/v1/activation/webhooks/', {'url': 'http://hooks.example.com/in'}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        for address in ('127.0.0.1', '10.0.0.5', '169.254.169.254', '::1'):
+            public_dns.return_value = {address}
+            response = client.post('/api/v1/activation/webhooks/', {'url': 'https://redis.internal/in'}, format='json')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST, address
+
+    @patch('activation.webhooks.retry_webhook_batch.apply_async')
+    @patch('activation.webhooks.requests.post')
+    def test_rebound_host_is_not_posted_to(self, mock_post, mock_retry, public_dns, endpoint):
+        from activation.webhooks import send_webhook_batch, dead_letter_key, redis_client
+        
+        batch_id = self.claim(endpoint, {'id': 'event-1'})
+        # The host resolved to a public address at registration
+        public_dns.return_value = {'169.254.169.254'}
+        
+        assert not send_webhook_batch(endpoint, batch_id)
+        mock_post.assert_not_called()
+        mock_retry.assert_not_called()
+        assert redis_client.llen(dead_letter_key(endpoint.id)) == 1
+
+    @patch('activation.webhooks.deliver_webhooks.apply_async')
+    @patch('activation.webhooks.requests.post')
+    def test_completions_are_batched_and_signed(self, mock_post, mock_deliver, settings, endpoint, create_offer):
+        import json
+        from activation.webhooks import deliver_webhooks, webhook_signature
+        
+        settings.WEBHOOK_BATCH_SIZE = 2
+        mock_post.return_value.status_code = 200
+        self.complete(endpoint, create_offer, 3)
+        
+        # One delivery is scheduled for the whole burst
+        mock_deliver.assert_called_once_with((endpoint.id,), countdown=settings.WEBHOOK_BATCH_WINDOW)
+        deliver_webhooks(endpoint.id)
+        
+        batches = [json.loads(call.kwargs['data'])['events'] for call in mock_post.call_args_list]
+        assert [len(batch) for batch in batches] == [2, 1]
+        assert [event['data']['reference'] for batch in batches for event in batch] == ['REF-0', 'REF-1', 'REF-2']
+        assert batches[0][0]['type'] == 'activation.success'
+        
+        call = mock_post.call_args_list[0]
+        timestamp, signature = [part.split('=', 1)[1] for part in call.kwargs['headers']['X-Webhook-Signature'].split(',')]
+        assert signature == webhook_signature('s3cret', timestamp, call.kwargs['data'])
+
+    def claim(self, endpoint, *events):
+        import json
+        from activation.webhooks import claim_batch, queue_key, redis_client
+        
+        redis_client.rpush(queue_key(endpoint.id), *[json.dumps(event) for event in events])
+        return claim_batch(endpoint.id)
+
+    @patch('activation.webhooks.retry_webhook_batch.apply_async')
+    @patch('activation.webhooks.requests.post')
+    def test_failed_batch_is_retried_then_dead_lettered(self, mock_post, mock_retry, settings, endpoint):
+        from activation.webhooks import send_webhook_batch, processing_key, batches_key, dead_letter_key, redis_client
+        
+        settings.WEBHOOK_MAX_ATTEMPTS = 2
+        mock_post.return_value.status_code = 503
+        batch_id = self.claim(endpoint, {'id': 'event-1'})
+        
+        assert not send_webhook_batch(endpoint, batch_id)
+        assert mock_retry.call_args.args[0] == (endpoint.id, batch_id, 2)
+        # The events stay claimed until the retry
+        assert redis_client.llen(processing_key(endpoint.id, batch_id)) == 1
+        
+        assert not send_webhook_batch(endpoint, batch_id, attempt=2)
+        mock_retry.assert_called_once()
+        assert redis_client.llen(dead_letter_key(endpoint.id)) == 1
+        assert not redis_client.exists(processing_key(endpoint.id, batch_id))
+        assert redis_client.zcard(batches_key(endpoint.id)) == 0
+
+    @patch('activation.webhooks.retry_webhook_batch.apply_async')
+    @patch('activation.webhooks.requests.post')
+    def test_busy_endpoint_defers_batch(self, mock_post, mock_retry, settings, endpoint):
+        from activation.webhooks import send_webhook_batch, endpoint_leases
+        
+        leases = endpoint_leases(endpoint.id)
+        for _ in range(settings.WEBHOOK_MAX_CONCURRENCY):
+            assert leases.acquire(settings.WEBHOOK_MAX_CONCURRENCY)
+        batch_id = self.claim(endpoint, {'id': 'event-1'})
+        
+        assert not send_webhook_batch(endpoint, batch_id)
+        
+        mock_post.assert_not_called()
+        mock_retry.assert_called_once_with((endpoint.id, batch_id, 1), countdown=settings.WEBHOOK_DEFER_COUNTDOWN)
+
+    @patch('activation.webhooks.deliver_webhooks.apply_async')
+    @patch('activation.webhooks.requests.post')
+    def test_batch_of_crashed_worker_is_redelivered(self, mock_post, mock_deliver, endpoint):
+        import json
+        from activation.webhooks import recover_webhook_batches, deliver_webhooks, batches_key, queue_key, redis_client
+        
+        mock_post.return_value.status_code = 200
+        # The worker crashes after claiming the batch
+        batch_id = self.claim(endpoint, {'id': 'event-1'}, {'id': 'event-2'})
+        redis_client.rpush(queue_key(endpoint.id), json.dumps({'id': 'event-3'}))
+        
+        recover_webhook_batches()
+        mock_deliver.assert_not_called()
+        
+        redis_client.zadd(batches_key(endpoint.id), {batch_id: 0})
+        recover_webhook_batches()
+        mock_deliver.assert_called_once()
+        deliver_webhooks(endpoint.id)
+        
+        events = [event['id'] for call in mock_post.call_args_list for event in json.loads(call.kwargs['data'])['events']]
+        assert events == ['event-1', 'event-2', 'event-3']
+        assert redis_client.zcard(batches_key(endpoint.id)) == 0
+
+
+@pytest.mark.django_db
+class TestNotifications:
+    @pytest.fixture(autouse=True)
+    def queue(self, settings):
+        from activation import notifications
+        
+        settings.SMS_BACKEND = 'activation.sms.LocMemSMSBackend'
+        notifications.notification_queue.drop()
+        notifications.redis_client.delete(notifications.SCHEDULED_KEY)
+        with patch('activation.notifications.deliver_notifications.apply_async') as mock_deliver:
+            yield mock_deliver
+        notifications.notification_queue.drop()
+        notifications.redis_client.delete(notifications.SCHEDULED_KEY)
+
+    def test_completion_queues_notification(self, queue, settings, create_user, create_offer, create_account, mailoutbox):
+        from activation.services import start_activation
+        from activation.tasks import process_activation
+        from activation.notifications import deliver_notifications
+        
+        user = create_user()
+        create_account(user, balance=50.00)
+        transaction = start_activation(user, create_offer(price=20.00))
+        with patch('activation.tasks.acquire_partner_slot', return_value=True), \
+                patch('activation.tasks.release_partner_slot'), \
+                patch('activation.tasks.activate_offer_with_partner', return_value={'success': True, 'reference': 'REF-1'}):
+            process_activation.apply(args=[transaction.transaction_id])
+        
+        # The worker does not wait on the mail server
+        assert mailoutbox == []
+        queue.assert_called_once_with(countdown=settings.NOTIFICATION_BATCH_WINDOW)
+        
+        assert deliver_notifications()['sent'] == 1
+        assert mailoutbox[0].to == [user.email]
+        assert 'REF-1' in mailoutbox[0].body
+
+    def test_batches_share_one_connection(self, queue, settings, mailoutbox):
+        from django.core.mail import get_connection
+        from activation.notifications import enqueue_notification, deliver_notifications
+        
+        settings.NOTIFICATION_BATCH_SIZE = 2
+        for i in range(5):
+            enqueue_notification(f'user{i}@example.com', 'Subject', f'Body {i}')
+        
+        # One delivery is scheduled for the whole burst
+        queue.assert_called_once()
+        with patch('activation.notifications.get_connection', wraps=get_connection) as mock_connection:
+            stats = deliver_notifications()
+        
+        assert mock_connection.call_count == 3
+        assert stats['sent'] == 5 and stats['failed'] == 0
+        assert [message.body for message in mailoutbox] == [f'Body {i}' for i in range(5)]
+
+    def test_sms_channel(self, mailoutbox):
+        from activation.notifications import enqueue_notification, deliver_notifications
+        from activation.sms import LocMemSMSBackend
+        
+        LocMemSMSBackend.outbox = []
+        enqueue_notification('sms@example.com', 'Subject', 'By email and SMS', phone='+261340000000')
+        enqueue_notification('mail@example.com', 'Subject', 'By email only')
+        
+        assert deliver_notifications()['sent'] == 3
+        assert LocMemSMSBackend.outbox == [('+261340000000', 'By email and SMS')]
+        assert len(mailoutbox) == 2
+
+    def test_batch_of_crashed_worker_is_sent(self, queue, settings, mailoutbox):
+        from activation.notifications import enqueue_notification, deliver_notifications, recover_notification_batches, notification_queue
+        
+        for i in range(3):
+            enqueue_notification(f'user{i}@example.com', 'Subject', f'Body {i}')
+        # A worker claimed the batch and died before sending it
+        batch_id = notification_queue.claim(2, settings.NOTIFICATION_BATCH_TIMEOUT)
+        
+        recover_notification_batches()
+        assert deliver_notifications()['sent'] == 1
+        
+        notification_queue.hold(batch_id, 0)
+        queue.reset_mock()
+        recover_notification_batches()
+        queue.assert_called_once_with()
+        assert deliver_notifications()['sent'] == 2
+        assert [message.body for message in mailoutbox] == ['Body 2', 'Body 0', 'Body 1']
+
+    def test_failed_batch_is_kept(self, queue, settings, mailoutbox):
+        from activation.notifications import enqueue_notification, deliver_notifications, get_notification_stats
+        
+        enqueue_notification('user@example.com', 'Subject', 'Body')
+        queue.reset_mock()
+        with patch('activation.notifications.send_email_batch', return_value=0):
+            assert deliver_notifications()['sent'] == 0
+        
+        queue.assert_called_once_with(countdown=settings.NOTIFICATION_RETRY_DELAY)
+        assert mailoutbox == []
+        assert deliver_notifications()['sent'] == 1
+        assert get_notification_stats()['batches_in_flight'] == 0
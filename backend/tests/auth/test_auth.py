@@ -79,4 +79,51 @@ class TestAuthViews:
         }, format='json')
         
         assert response.status_code == 200
-        assert response.data['message'] == 'Successfully logged out'
\ No newline at end of file
+        assert response.data['message'] == 'Successfully logged out'
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    def setup_method(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='cacheduser',
+            password='testpass123',
+            email='cached@example.com'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_user_resolved_without_queries(self, django_assert_num_queries):
+        """Test the user is loaded once, then served from the cache."""
+        with django_assert_num_queries(1):
+            self.client.get('/api/v1/auth/profile/')
+        
+        with django_assert_num_queries(0):
+            response = self.client.get('/api/v1/auth/profile/')
+        assert response.status_code == 200
+        assert response.data['username'] == 'cacheduser'
+        assert response.data['date_joined'] == self.user.date_joined
+
+    def test_user_change_invalidates_cache(self):
+        """Test changes to the user are seen on the next request."""
+        self.client.get('/api/v1/auth/profile/')
+        
+        self.user.email = 'changed@example.com'
+        self.user.save()
+        response = self.client.get('/api/v1/auth/profile/')
+        assert response.data['email'] == 'changed@example.com'
+        
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/v1/auth/profile/')
+        assert response.status_code == 401
+
+    def test_logout_invalidates_cache(self, django_assert_num_queries):
+        """Test logout drops the cached user record."""
+        self.client.get('/api/v1/auth/profile/')
+        response = self.client.post('/api/v1/auth/logout/', {
+            'refresh': str(RefreshToken.for_user(self.user))
+        }, format='json')
+        assert response.status_code == 200
+        
+        with django_assert_num_queries(1):
+            self.client.get('/api/v1/auth/profile/')
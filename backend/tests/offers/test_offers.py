@@ -1,4 +1,6 @@
 import pytest
+import uuid
+from unittest.mock import patch
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -42,7 +44,7 @@ class TestOfferViews:
         
         response = self.client.get('/api/v1/offers/')
         assert response.status_code == 200
-        assert len(response.data) >= 1
+        assert len(response.json()) >= 1
 
     def test_offer_detail(self):
         """Test getting specific offer details."""
@@ -55,7 +57,7 @@ class TestOfferViews:
         
         response = self.client.get(f'/api/v1/offers/{self.offer.id}/')
         assert response.status_code == 200
-        assert response.data['name'] == 'Test Offer'
+        assert response.json()['name'] == 'Test Offer'
 
     def test_offer_detail_not_found(self):
         """Test getting non-existent offer."""
@@ -118,4 +120,239 @@ class TestOfferViews:
         }, format='json')
         
         assert response.status_code == 400
-        assert response.data['error'] == 'Insufficient balance'
\ No newline at end of file
+        assert response.data['error'] == 'Insufficient balance'
+
+@pytest.mark.django_db
+class TestOfferCatalogCache:
+    def test_cached_offer_served_without_queries(self, django_assert_num_queries):
+        from offers.cache import get_offer_json, get_offer_list_json
+        
+        offer = Offer.objects.create(name='Cached Offer', description='Cached', price=5.0, duration_days=7)
+        get_offer_json(offer.id)
+        get_offer_list_json()
+        
+        with django_assert_num_queries(0):
+            assert b'Cached Offer' in get_offer_json(offer.id)
+            assert b'Cached Offer' in get_offer_list_json()
+
+    def test_offer_change_invalidates_cache(self):
+        import json
+        from offers.cache import get_offer_json, get_offer_list_json
+        
+        offer = Offer.objects.create(name='Old Name', description='Cached', price=5.0, duration_days=7)
+        get_offer_json(offer.id)
+        get_offer_list_json()
+        
+        offer.name = 'New Name'
+        offer.save()
+        assert json.loads(get_offer_json(offer.id))['name'] == 'New Name'
+        assert 'New Name' in [item['name'] for item in json.loads(get_offer_list_json())]
+        
+        offer_id = offer.id
+        offer.delete()
+        assert get_offer_json(offer_id) is None
+        assert offer_id not in [item['id'] for item in json.loads(get_offer_list_json())]
+
+    def test_hot_keys_served_from_local_tier(self):
+        from django.core.cache import cache
+        from offers.cache import get_offer_list_json
+        
+        Offer.objects.create(name='Hot Offer', description='Cached', price=5.0, duration_days=7)
+        get_offer_list_json()
+        before = cache.get_stats()
+        
+        assert b'Hot Offer' in get_offer_list_json()
+        after = cache.get_stats()
+        # Version and list both come from process memory
+        assert after['l1']['hits'] - before['l1']['hits'] == 2
+        assert after['l2']['hits'] + after['l2']['misses'] == before['l2']['hits'] + before['l2']['misses']
+
+    def test_local_tier_is_bounded_and_short_lived(self):
+        import time
+        from django.conf import settings
+        from config.cache import TwoTierCache
+        
+        two_tier = TwoTierCache(settings.CACHES['default']['LOCATION'], {
+            'KEY_PREFIX': 'test_two_tier',
+            'OPTIONS': {'L1_TIMEOUT': 0.2, 'L1_MAX_ENTRIES': 2},
+        })
+        shared = TwoTierCache(settings.CACHES['default']['LOCATION'], {
+            'KEY_PREFIX': 'test_two_tier',
+            'OPTIONS': {'L1_TIMEOUT': 0},
+        })
+        two_tier.set_many({'a': 1, 'b': 2, 'c': 3}, timeout=10)
+        assert two_tier.get_stats()['l1']['entries'] == 2
+        assert two_tier.get('a') == 1  # evicted locally, read back from Redis
+        assert two_tier.get_stats()['l2']['hits'] == 1
+        
+        # Another process changing the key is seen once the local copy expires
+        shared.set('a', 10, timeout=10)
+        assert two_tier.get('a') == 1
+        time.sleep(0.25)
+        assert two_tier.get('a') == 10
+        two_tier.delete_many(['a', 'b', 'c'])
+        assert shared.get('a') is None
+
+
+@pytest.mark.django_db
+class TestOfferFastPath:
+    def test_offers_match_drf_views(self, settings, authenticated_client, create_offer):
+        client, user = authenticated_client
+        offer = create_offer(name='Fast Offer')
+        
+        fast = [client.get('/api/v1/offers/'), client.get(f'/api/v1/offers/{offer.id}/')]
+        settings.FAST_PATH_ENABLED = False
+        drf = [client.get('/api/v1/offers/'), client.get(f'/api/v1/offers/{offer.id}/')]
+        
+        assert [response.content for response in fast] == [response.content for response in drf]
+
+    def test_missing_offer_falls_back_to_drf(self, authenticated_client):
+        client, user = authenticated_client
+        
+        response = client.get('/api/v1/offers/999999/')
+        assert response.status_code == 404
+        assert response.data == {'error': 'Offer not found'}
+
+
+@pytest.mark.django_db
+class TestOfferQueryCounts:
+    def test_expiring_offers(self, authenticated_client, create_offer, django_assert_num_queries):
+        from django.utils import timezone
+        from datetime import timedelta
+        from offers.models import UserOffer
+        
+        client, user = authenticated_client
+        UserOffer.objects.bulk_create([
+            UserOffer(user=user, offer=create_offer(name=f'Offer {i}'), expiration_date=timezone.now() + timedelta(days=1),
+                      transaction_id=f'expiring-{user.id}-{i}', is_active=True)
+            for i in range(10)
+        ])
+        
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/offers/expiring/')
+        assert len(response.data) == 10
+
+    def test_check_expiring_offers(self, create_user, create_offer, django_assert_num_queries):
+        from django.utils import timezone
+        from datetime import timedelta
+        from offers.models import UserOffer
+        from activation.tasks import check_expiring_offers
+        
+        UserOffer.objects.bulk_create([
+            UserOffer(user=create_user(username=f'expiring{i}'), offer=create_offer(name=f'Offer {i}'),
+                      expiration_date=timezone.now() + timedelta(days=1), transaction_id=f'check-expiring-{i}', is_active=True)
+            for i in range(10)
+        ])
+        
+        with patch('activation.tasks.send_expiry_notifications.delay') as delay, \
+                django_assert_num_queries(2):
+            # Last user id, then one query per range of users
+            check_expiring_offers(run_id=f'test-{uuid.uuid4()}')
+        assert sum(len(call.args[0]) for call in delay.call_args_list) == 10
+
+
+@pytest.mark.django_db
+class TestExpiringOfferNotifications:
+    @pytest.fixture
+    def run_id(self):
+        from config.redis_client import redis_client
+        from activation.tasks import expiry_checkpoint_key
+        
+        run_id = f'test-{uuid.uuid4()}'
+        yield run_id
+        redis_client.delete(expiry_checkpoint_key(run_id))
+
+    def create_expiring(self, user, offer, days=1):
+        from django.utils import timezone
+        from datetime import timedelta
+        from offers.models import UserOffer
+        
+        return UserOffer.objects.create(user=user, offer=offer, expiration_date=timezone.now() + timedelta(days=days),
+                                        transaction_id=f'expiring-{uuid.uuid4()}', is_active=True)
+
+    def test_offers_grouped_per_user(self, settings, run_id, create_user, create_offer):
+        from django.core import mail
+        from activation.tasks import check_expiring_offers, send_expiry_notifications
+        
+        settings.EXPIRY_NOTIFY_BATCH_SIZE = 2
+        users = [create_user(username=f'grouped{i}', email=f'grouped{i}@example.com') for i in range(3)]
+        self.create_expiring(users[0], create_offer(name='Basic'))
+        self.create_expiring(users[0], create_offer(name='Premium'), days=2)
+        self.create_expiring(users[1], create_offer(name='Data'))
+        self.create_expiring(users[2], create_offer(name='Voice'))
+        self.create_expiring(users[2], create_offer(name='Later'), days=10)
+        
+        with patch('activation.tasks.send_expiry_notifications.delay') as delay:
+            assert check_expiring_offers(run_id=run_id) == 'Notified 3 users about expiring offers'
+        batches = [call.args[0] for call in delay.call_args_list]
+        assert [len(batch) for batch in batches] == [2, 1]
+        
+        for batch in batches:
+            send_expiry_notifications(batch)
+        assert len(mail.outbox) == 3
+        assert mail.outbox[0].to == ['grouped0@example.com']
+        assert 'Basic' in mail.outbox[0].body and 'Premium' in mail.outbox[0].body
+        assert 'Later' not in mail.outbox[2].body
+
+    def test_run_resumes_from_checkpoint(self, settings, run_id, create_user, create_offer):
+        from config.redis_client import redis_client
+        from activation.tasks import check_expiring_offers, expiry_checkpoint_key
+        
+        users = [create_user(username=f'resumed{i}') for i in range(3)]
+        for user in users:
+            self.create_expiring(user, create_offer())
+        
+        # A run that crashed after handing over the first user
+        settings.EXPIRY_NOTIFY_BATCH_SIZE = 1
+        with patch('activation.tasks.send_expiry_notifications.delay', side_effect=[None, RuntimeError]):
+            with pytest.raises(RuntimeError):
+                check_expiring_offers(run_id=run_id)
+        settings.EXPIRY_NOTIFY_BATCH_SIZE = 500
+        assert redis_client.hget(expiry_checkpoint_key(run_id), 'cursor') == str(users[0].id)
+        
+        with patch('activation.tasks.send_expiry_notifications.delay') as delay:
+            check_expiring_offers(run_id=run_id)
+            assert [len(call.args[0]) for call in delay.call_args_list] == [2]
+            
+            # A completed run is not repeated
+            assert check_expiring_offers(run_id=run_id) == f'Expiring offers run {run_id} already completed'
+            assert delay.call_count == 1
+
+
+@pytest.mark.django_db
+class TestExpiredOfferSweeper:
+    def test_expired_offers_deactivated_in_batches(self, settings, create_user, create_offer):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        from datetime import timedelta
+        from offers.models import UserOffer
+        from offers.tasks import deactivate_expired_offers, get_sweeper_stats
+        
+        settings.EXPIRY_SWEEP_BATCH_SIZE = 2
+        settings.EXPIRY_SWEEP_PAUSE = 0
+        user = create_user()
+        offer = create_offer()
+        now = timezone.now()
+        UserOffer.objects.bulk_create([
+            UserOffer(user=user, offer=offer, expiration_date=now - timedelta(hours=i + 1),
+                      transaction_id=f'sweep-expired-{i}', is_active=True)
+            for i in range(5)
+        ] + [
+            UserOffer(user=user, offer=offer, expiration_date=now + timedelta(days=1),
+                      transaction_id='sweep-current', is_active=True)
+        ])
+        
+        with CaptureQueriesContext(connection) as queries:
+            stats = deactivate_expired_offers()
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        # One set-based UPDATE per batch (2 + 2 + 1), never waiting on locked rows
+        assert len(updates) == 3
+        assert all('FOR UPDATE SKIP LOCKED' in sql for sql in updates)
+        
+        assert stats['deactivated'] == 5
+        assert stats['batches'] == 3
+        assert stats['lag_before'] >= 5 * 3600
+        assert stats['lag_after'] == 0
+        assert list(UserOffer.objects.filter(is_active=True).values_list('transaction_id', flat=True)) == ['sweep-current']
+        assert int(get_sweeper_stats()['deactivated']) == 5
@@ -94,4 +94,62 @@ class TestPartnerAPI:
         assert response.status_code == status.HTTP_404_NOT_FOUND
         assert response.data['reference'] == reference
         assert response.data['is_valid'] is False
-        assert response.data['error'] == 'Transaction not found'
\ No newline at end of file
+        assert response.data['error'] == 'Transaction not found'
+
+
+@pytest.mark.django_db
+class TestPartnerBulkValidation:
+    def test_validate_transactions_bulk(self, authenticated_client, create_offer):
+        client, user = authenticated_client
+        offer = create_offer()
+        PartnerTransaction.objects.create(
+            transaction_id='test-transaction-id',
+            user=user,
+            offer=offer,
+            amount=10.00,
+            reference='REF-KNOWN',
+            status='PENDING'
+        )
+        
+        response = client.post('/api/v1/partner/validate/bulk/', {
+            'references': ['REF-KNOWN', 'REF-UNKNOWN']
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == {'REF-KNOWN': True, 'REF-UNKNOWN': False}
+
+    def test_validate_transactions_bulk_requires_list(self, authenticated_client):
+        client, user = authenticated_client
+        
+        response = client.post('/api/v1/partner/validate/bulk/', {'references': 'REF-KNOWN'}, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_validate_transactions_bulk_rejects_invalid_references(self, authenticated_client):
+        client, user = authenticated_client
+        
+        response = client.post('/api/v1/partner/validate/bulk/', {'references': ['REF-KNOWN', {'ref': 1}, None]}, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data['references']) == {1, 2}
+
+    def test_activate_offer_signed(self, settings, authenticated_client, create_offer):
+        from partner.signing import verify_activation_signature
+        
+        settings.PARTNER_SIGNING_SECRET = 'test-secret'
+        client, user = authenticated_client
+        offer = create_offer()
+        
+        response = client.post('/api/v1/partner/activate/', {
+            'user_id': user.id,
+            'offer_id': offer.id,
+            'amount': 10.0
+        }, format='json')
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert verify_activation_signature(
+            response.data['signature'], response.data['reference'], user.id, offer.id, 10.0
+        )
+        assert not verify_activation_signature(
+            response.data['signature'], response.data['reference'], user.id, offer.id, 20.0
+        )